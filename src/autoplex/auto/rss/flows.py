@@ -161,6 +161,14 @@ class RssMaker(Maker):
                 Exponent for the kernel (default 4.0).
             energy_label: str
                 Label for the energy data (default 'energy').
+            cur_memory_budget: float | None
+                Maximum memory in GB for the CUR kernel matrix. Larger kernels are
+                streamed in row blocks (default None).
+            descriptor_cache_dir: str | None
+                Directory of a persistent SOAP descriptor cache shared between
+                RSS iterations (default None, no caching).
+            descriptor_cache_size: float
+                Maximum size of the descriptor cache in GB (default 10.0).
         random_seed: int | None
             A seed to ensure reproducibility of CUR selection. Default is None.
         include_isolated_atom: bool
@@ -0,0 +1,890 @@
+"""Columnar in-memory datasets of atomic structures."""
+
+import json
+import os
+import shutil
+from collections.abc import Iterable, Iterator
+from pathlib import Path
+from uuid import uuid4
+
+import ase.io
+import numpy as np
+from ase import Atoms
+from ase.calculators.singlepoint import SinglePointCalculator
+from ase.io.extxyz import per_atom_properties
+
+DATABASE_FORMAT = "autoplex-atoms-dataset"
+DATABASE_VERSION = 1
+
+
+class AtomsDataset:
+    """
+    A set of structures stored as columnar NumPy arrays.
+
+    The per-atom data (atomic numbers, positions, forces and any other per-atom
+    array) of all frames is concatenated into one array per key, with 'offsets'
+    marking the frame boundaries. The per-frame data (cells, periodic boundary
+    conditions, energies, virials and any other info key) is stored as one column
+    per key. Calculator results, e.g. the 'energy' and 'forces' read from an extxyz
+    file, are stored like info keys and arrays and restored as a single-point
+    calculator when a frame is converted back to an Atoms object.
+
+    Frames are only converted to Atoms objects on access, so a dataset can be read
+    once and then filtered, split and written by several processing steps.
+
+    Parameters
+    ----------
+    numbers: np.ndarray
+        Atomic numbers of all atoms, shape (n_atoms_total,).
+    positions: np.ndarray
+        Positions of all atoms, shape (n_atoms_total, 3).
+    offsets: np.ndarray
+        Index of the first atom of each frame and the total number of atoms,
+        shape (n_frames + 1,).
+    cells: np.ndarray
+        Cell of each frame, shape (n_frames, 3, 3).
+    pbc: np.ndarray
+        Periodic boundary conditions of each frame, shape (n_frames, 3).
+    arrays: dict[str, np.ndarray] | None
+        Other per-atom arrays, each of length n_atoms_total.
+    array_frames: dict[str, np.ndarray] | None
+        For each per-atom array, a boolean mask of the frames that have it.
+        Defaults to all frames.
+    info: dict[str, list] | None
+        Per-frame info values, one list of length n_frames per key. Frames without
+        the key hold None.
+    calc_keys: Iterable[str] | None
+        Keys of 'info' and 'arrays' that are calculator results.
+    """
+
+    def __init__(
+        self,
+        numbers: np.ndarray,
+        positions: np.ndarray,
+        offsets: np.ndarray,
+        cells: np.ndarray,
+        pbc: np.ndarray,
+        arrays: dict[str, np.ndarray] | None = None,
+        array_frames: dict[str, np.ndarray] | None = None,
+        info: dict[str, list] | None = None,
+        calc_keys: Iterable[str] | None = None,
+    ):
+        self.numbers = np.asarray(numbers, dtype=int)
+        self.positions = np.asarray(positions, dtype=float).reshape(-1, 3)
+        self.offsets = np.asarray(offsets, dtype=int)
+        self.cells = np.asarray(cells, dtype=float).reshape(-1, 3, 3)
+        self.pbc = np.asarray(pbc, dtype=bool).reshape(-1, 3)
+        self.arrays = arrays or {}
+        self.array_frames = {
+            key: np.ones(len(self), dtype=bool) for key in self.arrays
+        } | (array_frames or {})
+        self.info = info or {}
+        self.calc_keys = set(calc_keys or ())
+
+    @classmethod
+    def from_atoms(cls, atoms: Iterable[Atoms]) -> "AtomsDataset":
+        """
+        Pack structures into a dataset in a single pass.
+
+        Parameters
+        ----------
+        atoms: Iterable[Atoms]
+            The structures, e.g. a list or a generator such as 'ase.io.iread'.
+
+        Returns
+        -------
+        AtomsDataset
+            The packed structures.
+        """
+        numbers, positions, cells, pbc, n_atoms = [], [], [], [], []
+        frame_arrays: dict[str, list] = {}
+        frame_info: dict[str, list] = {}
+        calc_keys = set()
+
+        for n_frame, atom in enumerate(atoms):
+            numbers.append(atom.get_atomic_numbers())
+            positions.append(atom.get_positions())
+            cells.append(atom.cell.array)
+            pbc.append(atom.pbc)
+            n_atoms.append(len(atom))
+
+            per_atom = {
+                key: value
+                for key, value in atom.arrays.items()
+                if key not in ("numbers", "positions")
+            }
+            per_frame = dict(atom.info)
+            if atom.calc is not None:
+                for key, value in atom.calc.results.items():
+                    calc_keys.add(key)
+                    if key in per_atom_properties:
+                        per_atom[key] = value
+                    else:
+                        per_frame[key] = value
+
+            for key, value in per_atom.items():
+                frame_arrays.setdefault(key, [None] * n_frame).append(value)
+            for key, value in per_frame.items():
+                frame_info.setdefault(key, [None] * n_frame).append(value)
+            # keys missing from this frame
+            for column in (*frame_arrays.values(), *frame_info.values()):
+                if len(column) == n_frame:
+                    column.append(None)
+
+        arrays, array_frames = {}, {}
+        for key, column in frame_arrays.items():
+            template = np.asarray(next(value for value in column if value is not None))
+            array_frames[key] = np.array([value is not None for value in column])
+            arrays[key] = np.concatenate(
+                [
+                    (
+                        np.asarray(value)
+                        if value is not None
+                        else np.zeros((n, *template.shape[1:]), dtype=template.dtype)
+                    )
+                    for value, n in zip(column, n_atoms)
+                ]
+            )
+
+        return cls(
+            numbers=np.concatenate(numbers) if numbers else np.zeros(0, dtype=int),
+            positions=np.concatenate(positions) if positions else np.zeros((0, 3)),
+            offsets=np.concatenate([[0], np.cumsum(n_atoms, dtype=int)]),
+            cells=np.array(cells),
+            pbc=np.array(pbc),
+            arrays=arrays,
+            array_frames=array_frames,
+            info=frame_info,
+            calc_keys=calc_keys,
+        )
+
+    @classmethod
+    def from_extxyz(cls, filename: str | Path) -> "AtomsDataset":
+        """
+        Read an extxyz file into a dataset, streaming over the frames once.
+
+        Parameters
+        ----------
+        filename: str | Path
+            Path to the extxyz file.
+
+        Returns
+        -------
+        AtomsDataset
+            All frames of the file.
+        """
+        return cls.from_atoms(ase.io.iread(filename, index=":", format="extxyz"))
+
+    @classmethod
+    def concatenate(cls, datasets: Iterable["AtomsDataset"]) -> "AtomsDataset":
+        """
+        Join several datasets into one, in order.
+
+        Parameters
+        ----------
+        datasets: Iterable["AtomsDataset"]
+            The datasets to join.
+
+        Returns
+        -------
+        AtomsDataset
+            The frames of all datasets.
+        """
+        datasets = list(datasets)
+        n_frames = [len(dataset) for dataset in datasets]
+        arrays, array_frames = {}, {}
+        for key in {key for dataset in datasets for key in dataset.arrays}:
+            template = next(
+                dataset.arrays[key] for dataset in datasets if key in dataset.arrays
+            )
+            arrays[key] = np.concatenate(
+                [
+                    dataset.arrays.get(
+                        key,
+                        np.zeros(
+                            (len(dataset.numbers), *template.shape[1:]),
+                            dtype=template.dtype,
+                        ),
+                    )
+                    for dataset in datasets
+                ]
+            )
+            array_frames[key] = np.concatenate(
+                [
+                    dataset.array_frames.get(key, np.zeros(len(dataset), dtype=bool))
+                    for dataset in datasets
+                ]
+            )
+        info = {
+            key: [
+                value
+                for dataset, n in zip(datasets, n_frames)
+                for value in dataset.info.get(key, [None] * n)
+            ]
+            for key in {key for dataset in datasets for key in dataset.info}
+        }
+
+        return cls(
+            numbers=np.concatenate([dataset.numbers for dataset in datasets]),
+            positions=np.concatenate([dataset.positions for dataset in datasets]),
+            offsets=np.concatenate(
+                [[0], np.cumsum([n for dataset in datasets for n in dataset.n_atoms])]
+            ),
+            cells=np.concatenate([dataset.cells for dataset in datasets]),
+            pbc=np.concatenate([dataset.pbc for dataset in datasets]),
+            arrays=arrays,
+            array_frames=array_frames,
+            info=info,
+            calc_keys=set().union(*(dataset.calc_keys for dataset in datasets)),
+        )
+
+    def __len__(self) -> int:
+        """Return the number of frames."""
+        return len(self.offsets) - 1
+
+    def __iter__(self) -> Iterator[Atoms]:
+        """Iterate over the frames as Atoms objects."""
+        return (self.get_atoms(i) for i in range(len(self)))
+
+    def __getitem__(self, index):
+        """Return a frame as Atoms object, or a sub-dataset for slices and masks."""
+        if isinstance(index, (int, np.integer)):
+            return self.get_atoms(int(index))
+        return self.select(index)
+
+    @property
+    def n_atoms(self) -> np.ndarray:
+        """Number of atoms of each frame."""
+        return np.diff(self.offsets)
+
+    @property
+    def volumes(self) -> np.ndarray:
+        """Cell volume of each frame."""
+        return np.abs(np.linalg.det(self.cells))
+
+    def get_atoms(self, index: int) -> Atoms:
+        """
+        Build the Atoms object of a single frame.
+
+        Parameters
+        ----------
+        index: int
+            Index of the frame.
+
+        Returns
+        -------
+        Atoms
+            A new Atoms object holding copies of the frame data.
+        """
+        if index < 0:
+            index += len(self)
+        atom_slice = slice(self.offsets[index], self.offsets[index + 1])
+        atoms = Atoms(
+            numbers=self.numbers[atom_slice],
+            positions=self.positions[atom_slice],
+            cell=self.cells[index],
+            pbc=self.pbc[index],
+        )
+
+        results = {}
+        for key, values in self.arrays.items():
+            if not self.array_frames[key][index]:
+                continue
+            if key in self.calc_keys:
+                results[key] = values[atom_slice].copy()
+            else:
+                atoms.new_array(key, values[atom_slice].copy())
+        for key, values in self.info.items():
+            if values[index] is None:
+                continue
+            value = values[index]
+            value = value.copy() if isinstance(value, np.ndarray) else value
+            if key in self.calc_keys:
+                results[key] = value
+            else:
+                atoms.info[key] = value
+        if results:
+            atoms.calc = SinglePointCalculator(atoms, **results)
+
+        return atoms
+
+    def to_atoms(self) -> list[Atoms]:
+        """Return all frames as a list of Atoms objects."""
+        return list(self)
+
+    def select(self, index) -> "AtomsDataset":
+        """
+        Return a dataset with a subset of the frames.
+
+        Parameters
+        ----------
+        index: slice | np.ndarray | list
+            A slice, a boolean mask over the frames or frame indices. The frames
+            are returned in the order of the indices.
+
+        Returns
+        -------
+        AtomsDataset
+            The selected frames.
+        """
+        frames = np.arange(len(self))[index]
+        n_atoms = self.n_atoms[frames]
+        offsets = np.concatenate([[0], np.cumsum(n_atoms, dtype=int)])
+        # atom indices of the selected frames, in frame order
+        atom_index = np.repeat(
+            self.offsets[frames] - offsets[:-1], n_atoms
+        ) + np.arange(offsets[-1])
+
+        return AtomsDataset(
+            numbers=self.numbers[atom_index],
+            positions=self.positions[atom_index],
+            offsets=offsets,
+            cells=self.cells[frames],
+            pbc=self.pbc[frames],
+            arrays={key: values[atom_index] for key, values in self.arrays.items()},
+            array_frames={
+                key: present[frames] for key, present in self.array_frames.items()
+            },
+            info={
+                key: [values[i] for i in frames] for key, values in self.info.items()
+            },
+            calc_keys=self.calc_keys,
+        )
+
+    def get_info(self, key: str, default=np.nan) -> np.ndarray:
+        """
+        Return an info key of all frames as an array.
+
+        Parameters
+        ----------
+        key: str
+            The info key, e.g. 'REF_energy' or 'config_type'.
+        default:
+            Value for frames without the key.
+
+        Returns
+        -------
+        np.ndarray
+            The values of all frames.
+        """
+        values = self.info.get(key, [None] * len(self))
+        return np.array([default if value is None else value for value in values])
+
+    def frame_max(self, values: np.ndarray) -> np.ndarray:
+        """
+        Reduce a per-atom array to the maximum of each frame.
+
+        Parameters
+        ----------
+        values: np.ndarray
+            Per-atom values of length n_atoms_total. Further axes are reduced too.
+
+        Returns
+        -------
+        np.ndarray
+            The maximum value of each frame.
+        """
+        if len(self) == 0:
+            return np.zeros(0)
+        values = np.asarray(values).reshape(len(self.numbers), -1).max(axis=1)
+        return np.maximum.reduceat(values, self.offsets[:-1])
+
+    def write(self, filename: str | Path, append: bool = False) -> None:
+        """
+        Write the dataset to an extxyz file.
+
+        Parameters
+        ----------
+        filename: str | Path
+            Path to the extxyz file.
+        append: bool
+            If True, append to an existing file.
+        """
+        ase.io.write(filename, self.to_atoms(), format="extxyz", append=append)
+
+    def save(self, directory: str | Path) -> None:
+        """
+        Save the dataset as a binary database directory.
+
+        Every column is stored as a NumPy file that can be read back memory-mapped.
+        A small 'index.json' lists the columns and the number of frames. Info
+        columns that cannot be stacked into one array are kept in the index as JSON.
+        An existing database in the directory is replaced.
+
+        Parameters
+        ----------
+        directory: str | Path
+            Path of the database directory.
+        """
+        directory = Path(directory)
+        tmp_dir = directory.with_name(f"{directory.name}.{uuid4().hex}.tmp")
+        tmp_dir.mkdir(parents=True)
+
+        for name in ("numbers", "positions", "offsets", "cells", "pbc"):
+            np.save(tmp_dir / f"{name}.npy", getattr(self, name))
+
+        index: dict = {
+            "format": DATABASE_FORMAT,
+            "version": DATABASE_VERSION,
+            "n_frames": len(self),
+            "calc_keys": sorted(self.calc_keys),
+            "arrays": list(self.arrays),
+            "info": {},
+        }
+        for i, (key, values) in enumerate(self.arrays.items()):
+            np.save(tmp_dir / f"array_{i}.npy", values)
+            np.save(tmp_dir / f"array_{i}_frames.npy", self.array_frames[key])
+        for i, (key, values) in enumerate(self.info.items()):
+            present = np.array([value is not None for value in values], dtype=bool)
+            present_values = [value for value in values if value is not None]
+            try:
+                stacked = np.array(present_values)
+            except ValueError:
+                stacked = np.array([], dtype=object)
+            # only columns of a single type are stacked, e.g. no mixed str and float
+            if (
+                len({type(value) for value in present_values}) <= 1
+                and stacked.dtype != object
+                and len(stacked) == len(present_values)
+            ):
+                np.save(tmp_dir / f"info_{i}.npy", stacked)
+                np.save(tmp_dir / f"info_{i}_present.npy", present)
+                index["info"][key] = {"file": f"info_{i}"}
+            else:
+                index["info"][key] = {
+                    "values": [
+                        (
+                            value.tolist()
+                            if isinstance(value, (np.ndarray, np.generic))
+                            else value
+                        )
+                        for value in values
+                    ]
+                }
+
+        with open(tmp_dir / "index.json", "w") as file:
+            json.dump(index, file)
+
+        if directory.exists():
+            shutil.rmtree(directory)
+        os.replace(tmp_dir, directory)
+
+    @classmethod
+    def load(cls, directory: str | Path, mmap_mode: str | None = "r") -> "AtomsDataset":
+        """
+        Load a dataset from a binary database directory.
+
+        Parameters
+        ----------
+        directory: str | Path
+            Path of the database directory written by 'save'.
+        mmap_mode: str | None
+            Memory-map mode of the per-atom arrays, see 'numpy.load'. If None, the
+            arrays are read into memory.
+
+        Returns
+        -------
+        AtomsDataset
+            The stored frames.
+        """
+        directory = Path(directory)
+        with open(directory / "index.json") as file:
+            index = json.load(file)
+        if index.get("format") != DATABASE_FORMAT:
+            raise ValueError(f"{directory} is not an autoplex binary database.")
+
+        def load(name: str, mode: str | None = None) -> np.ndarray:
+            return np.load(directory / f"{name}.npy", mmap_mode=mode)
+
+        info = {}
+        for key, column in index["info"].items():
+            if "values" in column:
+                info[key] = column["values"]
+                continue
+            present, stacked = load(f"{column['file']}_present"), load(column["file"])
+            values = iter(stacked.tolist() if stacked.ndim == 1 else list(stacked))
+            info[key] = [next(values) if flag else None for flag in present]
+
+        return cls(
+            numbers=load("numbers", mmap_mode),
+            positions=load("positions", mmap_mode),
+            offsets=load("offsets"),
+            cells=load("cells"),
+            pbc=load("pbc"),
+            arrays={
+                key: load(f"array_{i}", mmap_mode)
+                for i, key in enumerate(index["arrays"])
+            },
+            array_frames={
+                key: load(f"array_{i}_frames") for i, key in enumerate(index["arrays"])
+            },
+            info=info,
+            calc_keys=index["calc_keys"],
+        )
+
+
+def database_dir_name(file_name: str) -> str:
+    """
+    Return the name of the binary database that belongs to an extxyz file.
+
+    Parameters
+    ----------
+    file_name: str
+        Name of the extxyz file, e.g. 'train.extxyz'.
+
+    Returns
+    -------
+    str
+        Name of the database directory, e.g. 'train_db'.
+    """
+    return f"{Path(file_name).stem}_db"
+
+
+def read_dataset(path: str | Path) -> AtomsDataset:
+    """
+    Read a dataset from a binary database directory or an extxyz file.
+
+    Parameters
+    ----------
+    path: str | Path
+        Path to a binary database directory or an extxyz file.
+
+    Returns
+    -------
+    AtomsDataset
+        The stored frames.
+    """
+    return (
+        AtomsDataset.load(path)
+        if os.path.isdir(path)
+        else AtomsDataset.from_extxyz(path)
+    )
+
+
+def read_previous_dataset(directory: str | Path, file_name: str) -> AtomsDataset | None:
+    """
+    Read a dataset of a previous database, preferring the binary copy.
+
+    Parameters
+    ----------
+    directory: str | Path
+        The previous database directory.
+    file_name: str
+        Name of the extxyz file, e.g. 'train.extxyz'.
+
+    Returns
+    -------
+    AtomsDataset | None
+        The stored frames, or None if neither the binary database, a database
+        manifest nor the extxyz file exists.
+    """
+    binary_path = Path(directory) / database_dir_name(file_name)
+    if binary_path.is_dir():
+        return AtomsDataset.load(binary_path)
+    manifest = DatabaseManifest.load(directory)
+    if manifest is not None and Path(file_name).stem in manifest.sets:
+        return manifest.read(Path(file_name).stem)[0]
+    text_path = Path(directory) / file_name
+    if text_path.exists():
+        return AtomsDataset.from_extxyz(text_path)
+    return None
+
+
+def extxyz_to_database(extxyz_file: str | Path, directory: str | Path) -> None:
+    """
+    Convert an extxyz file to a binary database.
+
+    Parameters
+    ----------
+    extxyz_file: str | Path
+        Path to the extxyz file.
+    directory: str | Path
+        Path of the database directory.
+    """
+    AtomsDataset.from_extxyz(extxyz_file).save(directory)
+
+
+def database_to_extxyz(
+    directory: str | Path, extxyz_file: str | Path, append: bool = False
+) -> None:
+    """
+    Convert a binary database to an extxyz file, e.g. as input for the fitting codes.
+
+    Parameters
+    ----------
+    directory: str | Path
+        Path of the database directory.
+    extxyz_file: str | Path
+        Path to the extxyz file.
+    append: bool
+        If True, append to an existing file.
+    """
+    AtomsDataset.load(directory).write(extxyz_file, append=append)
+
+
+def _equal(value, other) -> bool:
+    """Compare two info values or arrays."""
+    try:
+        return bool(np.array_equal(value, other))
+    except (TypeError, ValueError):
+        return value == other
+
+
+def _frame_changed(original: Atoms, modified: Atoms) -> bool:
+    """Check if the info, arrays or calculator results of two frames differ."""
+    for old, new in (
+        (original.info, modified.info),
+        (original.arrays, modified.arrays),
+    ):
+        if old.keys() != new.keys() or not all(
+            _equal(old[key], new[key]) for key in old
+        ):
+            return True
+
+    old_results = original.calc.results if original.calc is not None else None
+    new_results = modified.calc.results if modified.calc is not None else None
+    if old_results is None or new_results is None:
+        return old_results is not new_results
+    return old_results.keys() != new_results.keys() or not all(
+        _equal(old_results[key], new_results[key]) for key in old_results
+    )
+
+
+class DatabaseManifest:
+    """
+    An append-only training database made of binary segments.
+
+    Every iteration stores only its new frames as segments in its own directory and
+    writes a manifest that lists the segments of all previous iterations and its
+    own, in order. A data set of the database, e.g. 'train', is the concatenation of
+    its segments, so no iteration copies or rewrites the frames of earlier ones.
+
+    Regularisation may drop and reorder training frames and changes their info,
+    arrays and calculator results, e.g. the sigma values. This is recorded as a small
+    'view' directory with the order of the kept frames and a binary database of the
+    changed ones, which is applied to the frames that existed when it was recorded.
+    Later iterations thus see the same database as if the regularised file had been
+    rewritten.
+
+    Segments and views are referenced relative to the directory of the manifest, so
+    the database can be moved or read from another job root.
+
+    The merged train and test files are not written by the manifest. Consumers
+    read the data sets through 'read_previous_dataset' or write them with
+    'write_extxyz' when they need a file, e.g. for fitting.
+
+    Parameters
+    ----------
+    directory: str | Path
+        Directory of the iteration that owns the manifest.
+    sets: dict | None
+        The data sets as stored in the manifest file.
+    """
+
+    file_name = "database_manifest.json"
+
+    def __init__(self, directory: str | Path, sets: dict | None = None):
+        self.directory = Path(directory).absolute()
+        self.sets = sets or {}
+
+    @classmethod
+    def load(cls, directory: str | Path) -> "DatabaseManifest | None":
+        """
+        Load the manifest of an iteration.
+
+        Parameters
+        ----------
+        directory: str | Path
+            Directory of the iteration.
+
+        Returns
+        -------
+        DatabaseManifest | None
+            The manifest, or None if the directory has none.
+        """
+        manifest_file = Path(directory) / cls.file_name
+        if not manifest_file.exists():
+            return None
+        with open(manifest_file) as file:
+            return cls(directory, json.load(file)["sets"])
+
+    @classmethod
+    def open(
+        cls, directory: str | Path, pre_database_dir: str | Path | None = None
+    ) -> "DatabaseManifest":
+        """
+        Start the manifest of a new iteration from the previous database.
+
+        A previous database without a manifest, i.e. plain train and test files, is
+        imported once as the first segments.
+
+        Parameters
+        ----------
+        directory: str | Path
+            Directory of the new iteration.
+        pre_database_dir: str | Path | None
+            Directory of the previous iteration, if any.
+
+        Returns
+        -------
+        DatabaseManifest
+            The manifest of the new iteration.
+        """
+        if pre_database_dir is None or not os.path.isdir(pre_database_dir):
+            return cls(directory)
+
+        previous = cls.load(pre_database_dir)
+        if previous is not None:
+            manifest = cls(directory, json.loads(json.dumps(previous.sets)))
+            for entry in manifest.sets.values():
+                for item in [*entry["segments"], entry["view"]]:
+                    if item is not None:
+                        item["path"] = manifest._relative(previous._resolve(item))
+            return manifest
+
+        manifest = cls(directory)
+        for name in ("train", "test"):
+            dataset = read_previous_dataset(pre_database_dir, f"{name}.extxyz")
+            if dataset is not None:
+                manifest.append(name, dataset)
+        return manifest
+
+    def _resolve(self, item: dict) -> Path:
+        """Return the path of a segment or view of the manifest."""
+        return self.directory / item["path"]
+
+    def _relative(self, path: Path) -> str:
+        """Return a path relative to the directory of the manifest."""
+        return os.path.relpath(path, self.directory)
+
+    def append(self, name: str, dataset: AtomsDataset) -> None:
+        """
+        Store new frames of a data set as a segment of this iteration.
+
+        Parameters
+        ----------
+        name: str
+            Name of the data set, e.g. 'train'.
+        dataset: AtomsDataset
+            The new frames.
+        """
+        entry = self.sets.setdefault(name, {"segments": [], "view": None})
+        segment = self.directory / f"{name}_segment_{len(entry['segments'])}_db"
+        dataset.save(segment)
+        entry["segments"].append(
+            {"path": self._relative(segment), "n_frames": len(dataset)}
+        )
+
+    def read(
+        self, name: str, apply_view: bool = True
+    ) -> tuple[AtomsDataset | None, np.ndarray]:
+        """
+        Read a data set with its view applied.
+
+        Parameters
+        ----------
+        name: str
+            Name of the data set, e.g. 'train'.
+        apply_view: bool
+            If False, return the concatenated segments as they were stored.
+
+        Returns
+        -------
+        tuple[AtomsDataset | None, np.ndarray]
+            The frames, or None if the data set has no segments, and the index of
+            each frame in the concatenated segments.
+        """
+        entry = self.sets.get(name)
+        if not entry or not entry["segments"]:
+            return None, np.zeros(0, dtype=int)
+
+        dataset = AtomsDataset.concatenate(
+            AtomsDataset.load(self._resolve(segment)) for segment in entry["segments"]
+        )
+        frame_ids = np.arange(len(dataset))
+        if apply_view and entry["view"] is not None:
+            view_dir = self._resolve(entry["view"])
+            order = np.load(view_dir / "order.npy")
+            n_view = len(order)
+            viewed = dataset.select(order).to_atoms()
+            if (view_dir / "changed_db").is_dir():
+                changed_frames = AtomsDataset.load(view_dir / "changed_db")
+                for i, atoms in zip(np.load(view_dir / "changed.npy"), changed_frames):
+                    viewed[i] = atoms
+            frame_ids = np.concatenate(
+                [order, np.arange(entry["view"]["n_frames"], len(dataset))]
+            )
+            dataset = AtomsDataset.concatenate(
+                [
+                    AtomsDataset.from_atoms(viewed),
+                    dataset.select(frame_ids[n_view:]),
+                ]
+            )
+
+        return dataset, frame_ids
+
+    def set_view(self, name: str, frame_ids: np.ndarray, atoms: list[Atoms]) -> None:
+        """
+        Record which frames of a data set are kept, in which order and with which changes.
+
+        Parameters
+        ----------
+        name: str
+            Name of the data set, e.g. 'train'.
+        frame_ids: np.ndarray
+            Index of each kept frame in the concatenated segments.
+        atoms: list[Atoms]
+            The kept frames with their changed info, arrays and calculator results.
+        """
+        entry = self.sets[name]
+        frame_ids = np.asarray(frame_ids, dtype=int)
+        stored, _ = self.read(name, apply_view=False)
+        changed = np.array(
+            [
+                i
+                for i, (original, modified) in enumerate(
+                    zip(stored.select(frame_ids), atoms)
+                )
+                if _frame_changed(original, modified)
+            ],
+            dtype=int,
+        )
+
+        view_dir = self.directory / f"{name}_view"
+        tmp_dir = view_dir.with_name(f"{view_dir.name}.{uuid4().hex}.tmp")
+        tmp_dir.mkdir(parents=True)
+        np.save(tmp_dir / "order.npy", frame_ids)
+        np.save(tmp_dir / "changed.npy", changed)
+        if len(changed) > 0:
+            AtomsDataset.from_atoms([atoms[i] for i in changed]).save(
+                tmp_dir / "changed_db"
+            )
+        if view_dir.exists():
+            shutil.rmtree(view_dir)
+        os.replace(tmp_dir, view_dir)
+
+        entry["view"] = {
+            "path": self._relative(view_dir),
+            "n_frames": sum(segment["n_frames"] for segment in entry["segments"]),
+        }
+
+    def write_extxyz(self, directory: str | Path) -> None:
+        """
+        Write the merged data sets as extxyz files, e.g. as input for the fitting codes.
+
+        Parameters
+        ----------
+        directory: str | Path
+            Directory of the 'train.extxyz' and 'test.extxyz' files.
+        """
+        for name in self.sets:
+            dataset, _ = self.read(name)
+            if dataset is not None:
+                dataset.write(Path(directory) / f"{name}.extxyz")
+
+    def save(self) -> None:
+        """Write the manifest file of this iteration."""
+        tmp_file = self.directory / f"{self.file_name}.{uuid4().hex}.tmp"
+        with open(tmp_file, "w") as file:
+            json.dump({"sets": self.sets}, file, indent=2)
+        os.replace(tmp_file, self.directory / self.file_name)
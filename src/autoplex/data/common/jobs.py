@@ -22,7 +22,16 @@ from pymatgen.io.ase import AseAtomsAdaptor
 from pymatgen.io.phonopy import get_phonopy_structure, get_pmg_structure
 from pymatgen.io.vasp.outputs import Vasprun
 
+from autoplex.data.common.dataset import (
+    AtomsDataset,
+    DatabaseManifest,
+    database_dir_name,
+    read_dataset,
+    read_previous_dataset,
+)
 from autoplex.data.common.utils import (
+    DescriptorCache,
+    DescriptorEngine,
     ElementCollection,
     boltzhist_cur_dual_iter,
     boltzhist_cur_one_shot,
@@ -372,6 +381,11 @@ def sample_data(
         - 'bolt_max_num': int, Maximum number of Boltzmann selections (default 3000).
         - 'kernel_exp': float, Exponent for the kernel (default 4.0).
         - 'energy_label': str, Label for the energy data (default 'energy').
+        - 'cur_memory_budget': float, Maximum memory in GB for the CUR kernel matrix.
+          Larger kernels are streamed in row blocks (default None, always build the full kernel).
+        - 'descriptor_cache_dir': str, Directory of a persistent SOAP descriptor cache shared
+          between jobs, e.g. across RSS iterations (default None, no caching).
+        - 'descriptor_cache_size': float, Maximum size of the descriptor cache in GB (default 10.0).
 
     dir: str
         Directory containing trajectory files for MD/RSS simulations. Default is None.
@@ -408,6 +422,9 @@ def sample_data(
         "bolt_max_num": 3000,
         "kernel_exp": 4.0,
         "energy_label": "energy",
+        "cur_memory_budget": None,
+        "descriptor_cache_dir": None,
+        "descriptor_cache_size": 10.0,
     }
 
     if bcur_params is not None:
@@ -449,21 +466,26 @@ def sample_data(
             raise TypeError("kernel_exp must be a float")
         if not isinstance(bcur_params["energy_label"], str):
             raise TypeError("energy_label must be a string")
+        if bcur_params["cur_memory_budget"] is not None and not isinstance(
+            bcur_params["cur_memory_budget"], (int, float)
+        ):
+            raise TypeError("cur_memory_budget must be a float or None")
+        if not isinstance(bcur_params["descriptor_cache_size"], (int, float)):
+            raise TypeError("descriptor_cache_size must be a float")
 
         soap_paras = bcur_params["soap_paras"]
         descriptor = create_soap_descriptor(soap_paras, n_species, species_Z)
-
-        if selection_method == "cur":
-            selected_atoms = cur_select(
-                atoms=atoms,
-                selected_descriptor=descriptor,
-                kernel_exp=bcur_params["kernel_exp"],
-                select_nums=num_of_selection,
-                stochastic=True,
-                random_seed=random_seed,
+        descriptor_cache = (
+            DescriptorCache(
+                bcur_params["descriptor_cache_dir"],
+                descriptor,
+                max_size=bcur_params["descriptor_cache_size"],
             )
+            if bcur_params["descriptor_cache_dir"] is not None
+            else None
+        )
 
-        elif selection_method in {"bcur1s", "bcur2i"}:
+        if selection_method in {"bcur1s", "bcur2i"}:
             if isolated_atom_energies is not None:
                 isolated_atom_energies = {
                     int(k): v for k, v in isolated_atom_energies.items()
@@ -471,7 +493,21 @@ def sample_data(
             else:
                 raise ValueError("Please provide the energy of isolated atoms!")
 
-            if selection_method == "bcur1s":
+        # one descriptor pool is shared by all CUR steps of this job
+        with DescriptorEngine(descriptor, cache=descriptor_cache) as descriptor_engine:
+            if selection_method == "cur":
+                selected_atoms = cur_select(
+                    atoms=atoms,
+                    selected_descriptor=descriptor,
+                    kernel_exp=bcur_params["kernel_exp"],
+                    select_nums=num_of_selection,
+                    stochastic=True,
+                    random_seed=random_seed,
+                    memory_budget=bcur_params["cur_memory_budget"],
+                    descriptor_engine=descriptor_engine,
+                )
+
+            elif selection_method == "bcur1s":
                 selected_atoms = boltzhist_cur_one_shot(
                     atoms=atoms,
                     isolated_atom_energies=isolated_atom_energies,
@@ -484,6 +520,8 @@ def sample_data(
                     pressures=pressures,
                     descriptor=descriptor,
                     random_seed=random_seed,
+                    memory_budget=bcur_params["cur_memory_budget"],
+                    descriptor_engine=descriptor_engine,
                 )
             else:
                 selected_atoms = boltzhist_cur_dual_iter(
@@ -498,6 +536,8 @@ def sample_data(
                     pressures=pressures,
                     descriptor=descriptor,
                     random_seed=random_seed,
+                    memory_budget=bcur_params["cur_memory_budget"],
+                    descriptor_engine=descriptor_engine,
                 )
 
         if selected_atoms is None:
@@ -548,6 +588,7 @@ def collect_dft_data(
     vasp_ref_file: str = "vasp_ref.extxyz",
     rss_group: str = "RSS",
     vasp_dirs: dict | None = None,
+    binary_database: bool = False,
 ) -> dict:
     """
     Collect VASP data from specified directories.
@@ -565,13 +606,16 @@ def collect_dft_data(
             List of directories containing VASP data.
         - 'config_type': list
             List of configuration types corresponding to each directory.
+    binary_database : bool
+        If True, store the VASP data as a binary database next to the extxyz file
+        and return its directory as 'vasp_ref_dir'. Default is False.
 
     Returns
     -------
     dict:
         A dictionary containing
 
-        - 'vasp_ref_dir': Directory of the VASP reference file.
+        - 'vasp_ref_dir': Directory of the VASP reference file or binary database.
         - 'isolated_atom_energies': Isolated energy values.
     """
     if vasp_dirs is None:
@@ -658,7 +702,12 @@ def collect_dft_data(
 
     dir_path = Path.cwd()
 
-    vasp_ref_dir = os.path.join(dir_path, vasp_ref_file)
+    if binary_database:
+        vasp_ref_db = database_dir_name(vasp_ref_file)
+        AtomsDataset.from_atoms(atoms).save(vasp_ref_db)
+        vasp_ref_dir = os.path.join(dir_path, vasp_ref_db)
+    else:
+        vasp_ref_dir = os.path.join(dir_path, vasp_ref_file)
 
     return {
         "vasp_ref_dir": vasp_ref_dir,
@@ -724,6 +773,8 @@ def preprocess_data(
     pre_database_dir: str | None = None,
     reg_minmax: list[tuple] | None = None,
     isolated_atom_energies: dict | None = None,
+    binary_database: bool = False,
+    incremental_database: bool = False,
 ) -> Path:
     """
     Preprocesse data to before fiting machine learning models.
@@ -735,7 +786,7 @@ def preprocess_data(
     Parameters
     ----------
     vasp_ref_dir: str
-        Path to the directory containing the reference VASP calculation data.
+        Path to the reference VASP data, an extxyz file or a binary database.
     test_ratio: float
         The proportion of the test set after splitting the data.
         If None, no splitting will be performed.
@@ -767,16 +818,25 @@ def preprocess_data(
         values for regularization.
     isolated_atom_energies: dict
         A dictionary containing isolated energy values for different species.
+    binary_database: bool
+        If True, additionally store the train and test sets as binary databases,
+        which are read instead of the extxyz files in the next iteration.
+    incremental_database: bool
+        If True, store only the new frames of this iteration as binary segments and
+        reference the segments of previous iterations through a manifest, instead of
+        copying and rewriting the previous database. The merged train and test
+        extxyz files are not written, the fitting job writes them when it needs them.
 
     Returns
     -------
     Path
         The current working directory.
     """
+    vasp_ref = read_dataset(vasp_ref_dir)
     atoms = (
-        data_distillation(vasp_ref_dir, force_max, force_label)
+        data_distillation(vasp_ref, force_max, force_label)
         if distillation
-        else read(vasp_ref_dir, index=":")
+        else vasp_ref.to_atoms()
     )
 
     if test_ratio == 0 or test_ratio is None:
@@ -786,22 +846,48 @@ def preprocess_data(
             atoms, test_ratio, energy_label
         )
 
-    if pre_database_dir and os.path.exists(pre_database_dir):
-        files_to_copy = ["train.extxyz", "test.extxyz"]
-        current_working_directory = os.getcwd()
+    has_pre_database = bool(pre_database_dir) and os.path.exists(pre_database_dir)
+    manifest = None
+    pre_train = None
+    if incremental_database:
+        # only the new frames are stored, earlier iterations are referenced
+        manifest = DatabaseManifest.open(
+            Path.cwd(), pre_database_dir if has_pre_database else None
+        )
+        manifest.append("train", AtomsDataset.from_atoms(train_structures))
+        manifest.append("test", AtomsDataset.from_atoms(test_structures))
+        train_dataset, train_frame_ids = manifest.read("train")
+        test_dataset, _ = manifest.read("test")
+    else:
+        if has_pre_database:
+            files_to_copy = ["train.extxyz", "test.extxyz"]
+            current_working_directory = os.getcwd()
+
+            for file_name in files_to_copy:
+                source_file_path = os.path.join(pre_database_dir, file_name)
+                destination_file_path = os.path.join(
+                    current_working_directory, file_name
+                )
+                if os.path.exists(source_file_path):
+                    shutil.copy(source_file_path, destination_file_path)
+                    print(
+                        f"File {file_name} has been copied to {destination_file_path}"
+                    )
 
-        for file_name in files_to_copy:
-            source_file_path = os.path.join(pre_database_dir, file_name)
-            destination_file_path = os.path.join(current_working_directory, file_name)
-            if os.path.exists(source_file_path):
-                shutil.copy(source_file_path, destination_file_path)
-                print(f"File {file_name} has been copied to {destination_file_path}")
+        write("train.extxyz", train_structures, format="extxyz", append=True)
+        write("test.extxyz", test_structures, format="extxyz", append=True)
 
-    write("train.extxyz", train_structures, format="extxyz", append=True)
-    write("test.extxyz", test_structures, format="extxyz", append=True)
+        if has_pre_database and (regularization or binary_database):
+            pre_train = read_previous_dataset(pre_database_dir, "train.extxyz")
 
     if regularization:
-        atoms_reg: list[Atoms] = read("train.extxyz", index=":")
+        # the new frames are still in memory, only the previous database is read
+        atoms_reg: list[Atoms] = (
+            train_dataset.to_atoms()
+            if manifest is not None
+            else (pre_train.to_atoms() if pre_train is not None else [])
+            + list(train_structures)
+        )
 
         if reg_minmax is None:
             reg_minmax = [(0.1, 1), (0.001, 0.1), (0.0316, 0.316), (0.0632, 0.632)]
@@ -815,6 +901,58 @@ def preprocess_data(
             retain_existing_sigma=retain_existing_sigma,
         )
 
-        write("train.extxyz", atom_with_sigma, format="extxyz")
+        if manifest is None:
+            write("train.extxyz", atom_with_sigma, format="extxyz")
+        else:
+            position = {id(at): i for i, at in enumerate(atoms_reg)}
+            manifest.set_view(
+                "train",
+                train_frame_ids[[position[id(at)] for at in atom_with_sigma]],
+                atom_with_sigma,
+            )
+
+    if manifest is not None:
+        manifest.save()
+
+    if binary_database:
+        if manifest is not None:
+            train_db = (
+                AtomsDataset.from_atoms(atom_with_sigma)
+                if regularization
+                else train_dataset
+            )
+            test_db = test_dataset
+        else:
+            pre_test = (
+                read_previous_dataset(pre_database_dir, "test.extxyz")
+                if has_pre_database
+                else None
+            )
+            train_db = (
+                AtomsDataset.from_atoms(atom_with_sigma)
+                if regularization
+                else AtomsDataset.concatenate(
+                    [
+                        dataset
+                        for dataset in (
+                            pre_train,
+                            AtomsDataset.from_atoms(train_structures),
+                        )
+                        if dataset is not None
+                    ]
+                )
+            )
+            test_db = AtomsDataset.concatenate(
+                [
+                    dataset
+                    for dataset in (
+                        pre_test,
+                        AtomsDataset.from_atoms(test_structures),
+                    )
+                    if dataset is not None
+                ]
+            )
+        train_db.save(database_dir_name("train.extxyz"))
+        test_db.save(database_dir_name("test.extxyz"))
 
     return Path.cwd()
@@ -1,14 +1,20 @@
 """Utility functions for training data jobs."""
 
+import fcntl
+import hashlib
+import json
 import logging
 import os
 import random
+import shutil
 import warnings
-from collections.abc import Iterable
-from functools import partial
+from collections.abc import Iterable, Iterator
+from contextlib import contextmanager, suppress
+from copy import deepcopy
 from itertools import chain
 from multiprocessing import Pool
 from pathlib import Path
+from uuid import uuid4
 
 import ase.io
 import matplotlib.pyplot as plt
@@ -19,6 +25,7 @@ from ase.atoms import Atom
 from ase.calculators.singlepoint import SinglePointCalculator
 from ase.io import Trajectory as AseTrajectory
 from ase.io import write
+from ase.neighborlist import neighbor_list
 from ase.units import GPa
 from hiphive.structure_generation import generate_mc_rattled_structures
 from pymatgen.core import Structure
@@ -28,11 +35,14 @@ from scipy.sparse.linalg import LinearOperator, svds
 from sklearn.model_selection import StratifiedShuffleSplit
 from threadpoolctl import threadpool_limits
 
+from autoplex.data.common.dataset import AtomsDataset
 from autoplex.fitting.common.regularization import (
     calculate_hull_nd,
     get_convex_hull,
-    get_e_distance_to_hull,
-    get_e_distance_to_hull_nd,
+    get_e_distances_to_hull,
+    get_e_distances_to_hull_nd,
+    get_stoichiometry_volume_points,
+    get_volume_energy_points,
     label_stoichiometry_volume,
 )
 
@@ -203,16 +213,18 @@ def scale_cell(
     return distorted_cells
 
 
-def check_distances(structure: Structure, min_distance: float = 1.5) -> bool:
+def check_distances(structure: Structure | Atoms, min_distance: float = 1.5) -> bool:
     """
     Take in a pymatgen Structure object and check minimum distances between atoms using minimum image convention.
 
     Useful after distorting cell angles and rattling to check atoms aren't too close.
+    The check uses a neighbour list with a cutoff of min_distance, so only pairs that
+    are too close are ever built.
 
     Parameters
     ----------
-    structure : Structure.
-        Pymatgen structures object.
+    structure : Structure | Atoms.
+        Pymatgen structures or ASE atoms object.
     min_distance: float
         Minimum separation allowed between any two atoms. Default= 1.5A.
 
@@ -221,15 +233,17 @@ def check_distances(structure: Structure, min_distance: float = 1.5) -> bool:
     Response.output.
         "True" if atoms are sufficiently spaced out i.e. all pairwise interatomic distances > min_distance.
     """
-    atoms = AseAtomsAdaptor.get_atoms(structure)
+    atoms = (
+        structure
+        if isinstance(structure, Atoms)
+        else AseAtomsAdaptor.get_atoms(structure)
+    )
 
-    for i in range(len(atoms)):
-        indices = [j for j in range(len(atoms)) if j != i]
-        distances = atoms.get_distances(i, indices, mic=True)
-        for distance in distances:
-            if distance < min_distance:
-                warnings.warn("Atoms too close.", stacklevel=2)
-                return False
+    # periodic images of an atom itself are not checked
+    first, second = neighbor_list("ij", atoms, min_distance)
+    if np.any(first != second):
+        warnings.warn("Atoms too close.", stacklevel=2)
+        return False
     return True
 
 
@@ -279,17 +293,10 @@ def random_vary_angle(
         # make copy of ground state
         atoms_copy = atoms.copy()
 
-        # stretch lattice parameters by 3% before changing angles
+        # stretch lattice parameters by 3% (of the volume) before changing angles
         # helps atoms to not be too close
-        distorted_cells = scale_cell(
-            AseAtomsAdaptor.get_structure(atoms_copy),
-            volume_custom_scale_factors=[1.03],
-        )
-
-        distorted_supercells: Atoms = AseAtomsAdaptor.get_atoms(distorted_cells[0])
-
-        # getting stretched supercell out of array
-        newcell = distorted_supercells.cell.cellpar()
+        newcell = atoms_copy.cell.cellpar()
+        newcell[:3] *= 1.03 ** (1 / 3)
 
         # current angles
         alpha = atoms_copy.cell.cellpar()[3]
@@ -318,7 +325,7 @@ def random_vary_angle(
             atoms_copy.set_cell(newcell, scale_atoms=True)
 
             # if successful structure generated, i.e. atoms are not too close, then break loop
-            if check_distances(AseAtomsAdaptor.get_structure(atoms_copy), min_distance):
+            if check_distances(atoms_copy, min_distance):
                 # store scaled cell
                 distorted_angle_cells.append(AseAtomsAdaptor.get_structure(atoms_copy))
                 generated_structures += 1
@@ -931,6 +938,478 @@ def parallel_calc_descriptor_vec(atom: Atoms, selected_descriptor: str) -> Atoms
     return atom
 
 
+_WORKER_DESCRIPTOR = None
+
+
+def _init_descriptor_worker(selected_descriptor: str) -> None:
+    """Build the quippy descriptor once for the lifetime of a pool worker."""
+    global _WORKER_DESCRIPTOR  # noqa: PLW0603
+    threadpool_limits(limits=1)
+    try:
+        _WORKER_DESCRIPTOR = descriptors.Descriptor(selected_descriptor)
+    except Exception as exc:
+        # raised in the tasks instead, a failing initializer makes the pool
+        # restart its workers forever
+        _WORKER_DESCRIPTOR = exc
+
+
+def _calc_descriptor_batch(atoms_batch: list[Atoms]) -> list[np.ndarray]:
+    """Calculate the descriptor vectors of a batch of structures in a pool worker."""
+    if isinstance(_WORKER_DESCRIPTOR, Exception):
+        raise _WORKER_DESCRIPTOR
+    return [_WORKER_DESCRIPTOR.calc(atom)["data"] for atom in atoms_batch]
+
+
+def structure_hash(atoms: Atoms) -> str:
+    """
+    Return a content hash of a structure.
+
+    The hash is built from the atomic numbers, positions, cell and periodic boundary
+    conditions, so identical frames read from different files share the same hash.
+
+    Parameters
+    ----------
+    atoms: Atoms
+        The structure to hash.
+
+    Returns
+    -------
+    str
+        The hexadecimal digest.
+    """
+    digest = hashlib.sha256()
+    digest.update(np.ascontiguousarray(atoms.get_atomic_numbers(), dtype=np.int64))
+    digest.update(np.ascontiguousarray(atoms.get_positions(), dtype=np.float64))
+    digest.update(np.ascontiguousarray(atoms.cell.array, dtype=np.float64))
+    digest.update(np.ascontiguousarray(atoms.pbc, dtype=np.bool_))
+
+    return digest.hexdigest()
+
+
+class DiskCache:
+    """
+    A directory of cached items with a JSON index, shared between processes.
+
+    Each item is a file or directory in the cache directory and is listed in the
+    'items' of the index. The index is only read or written, and items are only added
+    or removed, while holding a lock on 'index.lock', so several jobs can use the
+    same cache. The time an item was last used is the modification time of its file
+    or directory, so lookups do not write the index. When the cache grows beyond
+    'max_size', the least recently used items are removed. Files that are not in the
+    index, e.g. left over by an interrupted job, are always removed.
+
+    Parameters
+    ----------
+    path: str | Path
+        Directory of the cache.
+    max_size: float
+        Maximum size of the cache in GB.
+    """
+
+    def __init__(self, path: str | Path, max_size: float = 10.0):
+        self.path = Path(path)
+        self.max_size = max_size
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.index_file = self.path / "index.json"
+        self.lock_file = self.path / "index.lock"
+
+    @contextmanager
+    def _locked(self, shared: bool = False) -> Iterator[dict]:
+        """Hold the lock of the cache and yield its index."""
+        with open(self.lock_file, "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+            try:
+                yield self._read_index()
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _read_index(self) -> dict:
+        if self.index_file.exists():
+            with open(self.index_file) as file:
+                return json.load(file)
+        return {"items": {}}
+
+    def _write_index(self, index: dict) -> None:
+        tmp_file = self.path / f"index.{uuid4().hex}.tmp"
+        with open(tmp_file, "w") as file:
+            json.dump(index, file)
+        os.replace(tmp_file, self.index_file)
+
+    def _touch(self, name: str) -> None:
+        """Mark an item as used."""
+        with suppress(FileNotFoundError):
+            os.utime(self.path / name)
+
+    def _evict(self, index: dict) -> set[str]:
+        """
+        Remove untracked files and the least recently used items until the cache fits.
+
+        Must be called while holding the exclusive lock. Returns the names of the
+        items removed from the index.
+        """
+        on_disk = {
+            path.name: path
+            for path in self.path.iterdir()
+            if path not in (self.index_file, self.lock_file)
+        }
+        for name, path in on_disk.items():
+            if name not in index["items"]:
+                _remove_path(path)
+
+        removed = {name for name in index["items"] if name not in on_disk}
+        items = sorted(
+            (on_disk[name].stat().st_mtime, _path_size(on_disk[name]), name)
+            for name in index["items"]
+            if name in on_disk
+        )
+        total_size = sum(size for _, size, _ in items)
+        max_bytes = self.max_size * 1024**3
+        for _, size, name in items:
+            if total_size <= max_bytes:
+                break
+            _remove_path(on_disk[name])
+            total_size -= size
+            removed.add(name)
+
+        if removed:
+            logging.info(f"Evicted {len(removed)} items from the cache {self.path}")
+        index["items"] = {k: v for k, v in index["items"].items() if k not in removed}
+        return removed
+
+
+def _path_size(path: Path) -> int:
+    """Return the size of a file or of all files in a directory in bytes."""
+    if path.is_dir():
+        return sum(file.stat().st_size for file in path.rglob("*") if file.is_file())
+    return path.stat().st_size
+
+
+def _remove_path(path: Path) -> None:
+    """Remove a file or a directory."""
+    if path.is_dir():
+        shutil.rmtree(path, ignore_errors=True)
+    else:
+        with suppress(FileNotFoundError):
+            os.remove(path)
+
+
+class DescriptorCache(DiskCache):
+    """
+    A persistent on-disk cache of descriptor vectors.
+
+    Vectors are stored in NumPy shards that are read back memory-mapped. They are
+    keyed by the content hash of the structure and the quip descriptor string, so
+    repeated CUR selections over the same frames, e.g. across RSS iterations, do not
+    recompute descriptors. When the cache grows beyond 'max_size', the least recently
+    used shards are removed.
+
+    Parameters
+    ----------
+    cache_dir: str | Path
+        Root directory of the cache. Each descriptor string gets its own subdirectory.
+    selected_descriptor: str
+        The quip descriptor string the cached vectors belong to.
+    max_size: float
+        Maximum size of the cache for this descriptor string in GB.
+    """
+
+    def __init__(
+        self,
+        cache_dir: str | Path,
+        selected_descriptor: str,
+        max_size: float = 10.0,
+    ):
+        self.selected_descriptor = selected_descriptor
+        descriptor_hash = hashlib.sha256(selected_descriptor.encode()).hexdigest()
+        super().__init__(Path(cache_dir) / descriptor_hash[:16], max_size)
+
+    def _read_index(self) -> dict:
+        index = super()._read_index()
+        index.setdefault("descriptor", self.selected_descriptor)
+        index.setdefault("entries", {})
+        return index
+
+    def get(self, atoms: list[Atoms]) -> list[np.ndarray | None]:
+        """
+        Look up the descriptor vectors of a list of structures.
+
+        Parameters
+        ----------
+        atoms: list[Atoms]
+            The structures to look up.
+
+        Returns
+        -------
+        list[np.ndarray | None]
+            The cached descriptor vector of each structure, or None if it is not cached.
+        """
+        results: list[np.ndarray | None] = [None] * len(atoms)
+        shards: dict[str, np.ndarray] = {}
+
+        with self._locked(shared=True) as index:
+            for i, atom in enumerate(atoms):
+                entry = index["entries"].get(structure_hash(atom))
+                if entry is None:
+                    continue
+                shard, row = entry
+                if shard not in shards:
+                    shard_file = self.path / shard
+                    if not shard_file.exists():
+                        continue
+                    shards[shard] = np.load(shard_file, mmap_mode="r")
+                results[i] = np.array(shards[shard][row])
+
+            for shard in shards:
+                self._touch(shard)
+
+        return results
+
+    def put(self, atoms: list[Atoms], descs: list[np.ndarray]) -> None:
+        """
+        Store the descriptor vectors of a list of structures.
+
+        Parameters
+        ----------
+        atoms: list[Atoms]
+            The structures the descriptor vectors belong to.
+        descs: list[np.ndarray]
+            The descriptor vector of each structure.
+        """
+        if len(atoms) == 0:
+            return
+
+        by_shape: dict[tuple, list[int]] = {}
+        for i, desc in enumerate(descs):
+            by_shape.setdefault(np.shape(desc), []).append(i)
+
+        with self._locked() as index:
+            for indices in by_shape.values():
+                shard = f"{uuid4().hex}.npy"
+                np.save(self.path / shard, np.array([descs[i] for i in indices]))
+                index["items"][shard] = {}
+                for row, i in enumerate(indices):
+                    index["entries"][structure_hash(atoms[i])] = [shard, row]
+
+            evicted = self._evict(index)
+            index["entries"] = {
+                k: v for k, v in index["entries"].items() if v[0] not in evicted
+            }
+            self._write_index(index)
+
+
+class DescriptorEngine:
+    """
+    A pool of workers that each hold a single quippy descriptor object.
+
+    The descriptor is constructed once per worker in the pool initializer instead of
+    once per structure, and structures are sent to the workers in batches. The pool
+    stays alive until the engine is closed, so it can be reused by repeated CUR calls,
+    e.g. in the two iterations of 'boltzhist_cur_dual_iter'.
+
+    Parameters
+    ----------
+    selected_descriptor: str
+        The quip descriptor string to use for the calculation.
+    num_processes: int | None
+        Number of worker processes. Defaults to the number of CPUs.
+    chunksize: int | None
+        Number of structures per task. If None, the structures are split into
+        about four batches per worker.
+    cache: DescriptorCache | None
+        On-disk descriptor cache that is consulted before computing and updated
+        with newly computed vectors.
+    """
+
+    def __init__(
+        self,
+        selected_descriptor: str,
+        num_processes: int | None = None,
+        chunksize: int | None = None,
+        cache: DescriptorCache | None = None,
+    ):
+        self.selected_descriptor = selected_descriptor
+        self.num_processes = num_processes or os.cpu_count() or 1
+        self.chunksize = chunksize
+        self.cache = cache
+        self._pool = None
+
+    def __enter__(self):
+        """Enter the context and return the engine."""
+        return self
+
+    def __exit__(self, *args):
+        """Shut down the worker pool when leaving the context."""
+        self.close()
+
+    def calc(self, atoms: list[Atoms]) -> list[np.ndarray]:
+        """
+        Calculate the descriptor vectors of a list of structures.
+
+        Parameters
+        ----------
+        atoms: list[Atoms]
+            The structures for which to calculate the descriptor vectors.
+
+        Returns
+        -------
+        list[np.ndarray]
+            The descriptor vector of each structure, in the order of the input.
+        """
+        if self.cache is None:
+            return self._calc(atoms)
+
+        descs = self.cache.get(atoms)
+        missing = [i for i, desc in enumerate(descs) if desc is None]
+        if missing:
+            logging.info(
+                f"Descriptor cache: {len(atoms) - len(missing)} hits, {len(missing)} misses"
+            )
+            missing_atoms = [atoms[i] for i in missing]
+            computed = self._calc(missing_atoms)
+            self.cache.put(missing_atoms, computed)
+            for i, desc in zip(missing, computed):
+                descs[i] = desc
+
+        return descs
+
+    def _calc(self, atoms: list[Atoms]) -> list[np.ndarray]:
+        """Calculate descriptor vectors in the worker pool."""
+        if len(atoms) == 0:
+            return []
+
+        if self._pool is None:
+            self._pool = Pool(
+                processes=self.num_processes,
+                initializer=_init_descriptor_worker,
+                initargs=(self.selected_descriptor,),
+            )
+
+        chunksize = self.chunksize or max(1, -(-len(atoms) // (4 * self.num_processes)))
+        batches = [
+            atoms[start : start + chunksize]
+            for start in range(0, len(atoms), chunksize)
+        ]
+
+        return list(
+            chain.from_iterable(self._pool.map(_calc_descriptor_batch, batches))
+        )
+
+    def close(self) -> None:
+        """Shut down the worker pool."""
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+
+
+def polynomial_kernel_operator(
+    descs: np.ndarray, kernel_exp: float, block_size: int
+) -> LinearOperator:
+    """
+    Build the dot-product polynomial kernel of a descriptor matrix as a streamed operator.
+
+    The N x N kernel ``(X^T X) ** kernel_exp`` is never stored. Each product with the
+    operator recomputes the kernel in blocks of ``block_size`` rows and applies the
+    exponent in place, so the peak memory is a single block of N x block_size floats.
+
+    Parameters
+    ----------
+    descs: np.ndarray
+        Descriptor matrix of shape (n_features, n_structures).
+    kernel_exp: float
+        The kernel exponent applied element-wise to the dot products.
+    block_size: int
+        Number of kernel rows evaluated at once.
+
+    Returns
+    -------
+    LinearOperator
+        A symmetric operator of shape (n_structures, n_structures).
+    """
+    n_structures = descs.shape[1]
+    block_size = max(1, min(int(block_size), n_structures))
+
+    def mm(v):
+        v = np.asarray(v)
+        out = np.empty((n_structures, *v.shape[1:]), dtype=np.result_type(descs, v))
+        for start in range(0, n_structures, block_size):
+            stop = min(start + block_size, n_structures)
+            kernel_block = np.matmul(descs[:, start:stop].T, descs)
+            np.power(kernel_block, kernel_exp, out=kernel_block)
+            out[start:stop] = np.dot(kernel_block, v)
+        return out
+
+    return LinearOperator(
+        (n_structures, n_structures),
+        matvec=mm,
+        rmatvec=mm,
+        matmat=mm,
+        rmatmat=mm,
+        dtype=descs.dtype,
+    )
+
+
+def calc_cur_scores(
+    at_descs: np.ndarray,
+    kernel_exp: float,
+    num: int,
+    memory_budget: float | None = None,
+) -> np.ndarray:
+    """
+    Calculate the CUR leverage scores of a set of descriptor vectors.
+
+    Parameters
+    ----------
+    at_descs: np.ndarray
+        Descriptor matrix of shape (n_features, n_structures).
+    kernel_exp: float
+        The kernel exponent. If not positive, the descriptors are used directly.
+    num: int
+        Number of singular vectors used for the scores.
+    memory_budget: float | None
+        Maximum memory in GB for the kernel matrix. If the full N x N kernel does not
+        fit into this budget, it is streamed in row blocks of at most this size
+        instead of being stored.
+        If None, the full kernel is always built.
+
+    Returns
+    -------
+    np.ndarray
+        The normalised leverage score of each structure.
+    """
+    n_structures = at_descs.shape[1]
+
+    if kernel_exp <= 0.0:
+        m = at_descs
+    elif memory_budget is None or n_structures**2 * 8 <= memory_budget * 1024**3:
+        m = np.matmul(at_descs.T, at_descs)
+        np.power(m, kernel_exp, out=m)
+    else:
+        block_size = int(memory_budget * 1024**3 / (n_structures * 8))
+        logging.info(
+            f"Streaming the CUR kernel of {n_structures} structures "
+            f"in blocks of {max(1, block_size)} rows"
+        )
+        m = polynomial_kernel_operator(at_descs, kernel_exp, block_size)
+
+    def descriptor_svd(at_descs, num, do_vectors="vh"):
+        if isinstance(at_descs, LinearOperator):
+            return svds(at_descs, k=num, return_singular_vectors=do_vectors)
+
+        def mv(v):
+            return np.dot(at_descs, v)
+
+        def rmv(v):
+            return np.dot(at_descs.T, v)
+
+        A = LinearOperator(at_descs.shape, matvec=mv, rmatvec=rmv, matmat=mv)
+        return svds(A, k=num, return_singular_vectors=do_vectors)
+
+    (_, _, vt) = descriptor_svd(m, min(max(1, num), min(m.shape) - 1))
+
+    return np.sum(vt**2, axis=0) / vt.shape[0]
+
+
 def cur_select(
     atoms,
     selected_descriptor,
@@ -938,6 +1417,8 @@ def cur_select(
     select_nums,
     stochastic=True,
     random_seed=None,
+    memory_budget=None,
+    descriptor_engine=None,
 ) -> list[Atoms] | None:
     """
     Perform CUR selection on a set of atoms to get representative SOAP descriptors.
@@ -956,6 +1437,11 @@ def cur_select(
         Whether to perform stochastic CUR selection.
     random_seed: int
         The seed for the random number generator.
+    memory_budget: float | None
+        Maximum memory in GB for the N x N kernel matrix. Larger kernels are
+        streamed in row blocks. If None, the full kernel is built.
+    descriptor_engine: DescriptorEngine | None
+        A running descriptor engine to reuse. If None, a temporary one is created.
 
     Returns
     -------
@@ -985,54 +1471,184 @@ def cur_select(
     else:
         fatoms = atoms
 
-    num_workers = min(len(fatoms), os.cpu_count() or 1)
-
-    descriptor_worker = partial(
-        parallel_calc_descriptor_vec, selected_descriptor=selected_descriptor
-    )
-    with threadpool_limits(limits=1), Pool(processes=num_workers) as pool:
-        # TODO: implement argument for number of cores throughout
-        ats = pool.map(descriptor_worker, fatoms)
-
-    if isinstance(ats, list) & (len(ats) != 0):
-        at_descs = np.array([at.info["descriptor_vec"] for at in ats]).T
-        m = (
-            np.matmul((np.squeeze(at_descs)).T, np.squeeze(at_descs)) ** kernel_exp
-            if kernel_exp > 0.0
-            else at_descs
-        )
-
-        def descriptor_svd(at_descs, num, do_vectors="vh"):
-            def mv(v):
-                return np.dot(at_descs, v)
-
-            def rmv(v):
-                return np.dot(at_descs.T, v)
+    if descriptor_engine is None:
+        with DescriptorEngine(
+            selected_descriptor, num_processes=min(len(fatoms), os.cpu_count() or 1)
+        ) as engine:
+            descs = engine.calc(fatoms)
+    else:
+        descs = descriptor_engine.calc(fatoms)
 
-            A = LinearOperator(at_descs.shape, matvec=mv, rmatvec=rmv, matmat=mv)
-            return svds(A, k=num, return_singular_vectors=do_vectors)
+    if len(descs) != 0:
+        at_descs = np.array(descs).T
 
-        (_, _, vt) = descriptor_svd(
-            m, min(max(1, int(select_nums / 2)), min(m.shape) - 1)
+        c_scores = calc_cur_scores(
+            np.squeeze(at_descs),
+            kernel_exp=kernel_exp,
+            num=int(select_nums / 2),
+            memory_budget=memory_budget,
         )
-        c_scores = np.sum(vt**2, axis=0) / vt.shape[0]
         if stochastic:
             selected = sorted(
                 np.random.choice(
-                    range(len(ats)), size=select_nums, replace=False, p=c_scores
+                    range(len(fatoms)), size=select_nums, replace=False, p=c_scores
                 )
             )
         else:
             selected = sorted(np.argsort(c_scores)[-select_nums:])
 
-        selected_atoms = [ats[i] for i in selected]
+        # deep copies keep the calculator results, e.g. of a SinglePointCalculator
+        return [deepcopy(fatoms[i]) for i in selected]
 
-        for at in selected_atoms:
-            del at.info["descriptor_vec"]
+    return None
 
-        return selected_atoms
 
-    return None
+def build_structure_table(
+    atoms: list[Atoms], energy_label: str = "energy"
+) -> dict[str, np.ndarray]:
+    """
+    Pack the energies, volumes and compositions of a list of structures into arrays.
+
+    Parameters
+    ----------
+    atoms: list[Atoms]
+        The structures to pack.
+    energy_label: str
+        The label for the energy property in the atoms. For 'energy', the energy of
+        the attached calculator is used if it is missing from the info dict.
+
+    Returns
+    -------
+    dict[str, np.ndarray]
+        The table with the entries 'energy', 'volume' and 'n_atoms' of length N,
+        and 'species_counts' of shape (N, max(Z) + 1), where column Z holds the
+        number of atoms with atomic number Z.
+    """
+    if energy_label == "energy":
+        energies = [
+            (
+                atom.info["energy"]
+                if "energy" in atom.info
+                else atom.get_potential_energy()
+            )
+            for atom in atoms
+        ]
+    else:
+        energies = [atom.info[energy_label] for atom in atoms]
+
+    numbers = [atom.get_atomic_numbers() for atom in atoms]
+    n_atoms = np.array([len(z) for z in numbers])
+    cells = np.array([atom.cell.array for atom in atoms]).reshape(-1, 3, 3)
+
+    # one bincount over the concatenated atomic numbers, offset per structure
+    max_z = int(max(z.max() for z in numbers)) + 1
+    frame = np.repeat(np.arange(len(atoms)), n_atoms)
+    species_counts = np.bincount(
+        frame * max_z + np.concatenate(numbers), minlength=len(atoms) * max_z
+    ).reshape(len(atoms), max_z)
+
+    return {
+        "energy": np.array(energies, dtype=float),
+        "volume": np.abs(np.linalg.det(cells)),
+        "n_atoms": n_atoms,
+        "species_counts": species_counts,
+    }
+
+
+def calc_enthalpies(
+    table: dict[str, np.ndarray],
+    isolated_atom_energies: dict,
+    pressures: np.ndarray | list[float],
+) -> np.ndarray:
+    """
+    Calculate the formation enthalpy per atom of all structures in a structure table.
+
+    Parameters
+    ----------
+    table: dict[str, np.ndarray]
+        The structure table from 'build_structure_table'.
+    isolated_atom_energies: dict
+        Dictionary of isolated energy values, keyed by atomic number.
+    pressures: np.ndarray | list[float]
+        The pressure of each structure, in GPa.
+
+    Returns
+    -------
+    np.ndarray
+        The formation enthalpy per atom of each structure, in eV/atom.
+    """
+    species_counts = table["species_counts"]
+    reference = np.zeros(species_counts.shape[1])
+    for z in np.flatnonzero(species_counts.any(axis=0)):
+        reference[z] = isolated_atom_energies[z]
+
+    formation_energies = table["energy"] - species_counts @ reference
+    pv = table["volume"] * np.asarray(pressures, dtype=float) * GPa
+
+    return (formation_energies + pv) / table["n_atoms"]
+
+
+def flat_histogram_log_weights(values: np.ndarray, kt: float) -> np.ndarray:
+    """
+    Calculate the log-weights of a Boltzmann-weighted flat histogram.
+
+    Each value is weighted by the inverse population of its histogram bin and,
+    for kt > 0, by a Boltzmann factor relative to the lowest value. Working in
+    log space avoids underflow of the Boltzmann factors for wide energy ranges.
+
+    Parameters
+    ----------
+    values: np.ndarray
+        The energies (e.g. enthalpies or distances to the convex hull), in eV.
+    kt: float
+        The product of the Boltzmann constant and the temperature, in eV.
+
+    Returns
+    -------
+    np.ndarray
+        The unnormalised log-weight of each value.
+    """
+    values = np.asarray(values, dtype=float)
+    counts, edges = np.histogram(values)
+    # the maximum falls into the last bin, as np.histogram closes it on the right
+    bin_i = np.minimum(np.digitize(values, edges[1:]), len(counts) - 1)
+    log_weights = -np.log(counts[bin_i])
+    if kt > 0.0:
+        log_weights -= (values - np.min(values)) / kt
+
+    return log_weights
+
+
+def weighted_sample_without_replacement(
+    log_weights: np.ndarray, num: int
+) -> np.ndarray:
+    """
+    Draw indices with probability proportional to their weights, without replacement.
+
+    All indices are drawn in one pass with the Gumbel-top-k trick: the 'num' largest
+    values of log-weight plus Gumbel noise are distributed like 'num' successive
+    weighted draws that each remove the drawn item.
+
+    Parameters
+    ----------
+    log_weights: np.ndarray
+        The unnormalised log-weight of each item.
+    num: int
+        The number of indices to draw.
+
+    Returns
+    -------
+    np.ndarray
+        The drawn indices, in the order they would have been drawn one at a time.
+    """
+    num = min(num, len(log_weights))
+    if num <= 0:
+        return np.array([], dtype=int)
+
+    keys = log_weights + np.random.gumbel(size=len(log_weights))
+    top = np.argpartition(-keys, num - 1)[:num]
+
+    return top[np.argsort(-keys[top])]
 
 
 def boltzhist_cur_one_shot(
@@ -1047,6 +1663,8 @@ def boltzhist_cur_one_shot(
     energy_label: str = "energy",
     pressures: list[float] | list[list[float]] | None = None,
     random_seed: int = None,
+    memory_budget: float | None = None,
+    descriptor_engine: DescriptorEngine | None = None,
 ) -> list | None:
     """
     Sample atoms from a list according to boltzmann energy weighting and CUR diversity.
@@ -1076,6 +1694,11 @@ def boltzhist_cur_one_shot(
         The pressures at which the atoms have been optimized, in GPa.
     random_seed : int
         The seed for the random number generator.
+    memory_budget: float | None
+        Maximum memory in GB for the CUR kernel matrix. Larger kernels are
+        streamed in row blocks. If None, the full kernel is built.
+    descriptor_engine: DescriptorEngine | None
+        A running descriptor engine to reuse for CUR. If None, a temporary one is created.
 
     Returns
     -------
@@ -1116,67 +1739,21 @@ def boltzhist_cur_one_shot(
     else:
         ps = flatten_list(pressures)
 
-    enthalpies = []
-
-    at_ids = [atom.get_atomic_numbers() for atom in fatoms]
-
-    if energy_label == "energy":
-        formation_energies = []
-        for ct, atom in enumerate(fatoms):
-            if "energy" in atom.info:
-                formation_energy = atom.info["energy"] - sum(
-                    [isolated_atom_energies[j] for j in at_ids[ct]]
-                )
-            else:
-                formation_energy = atom.get_potential_energy() - sum(
-                    [isolated_atom_energies[j] for j in at_ids[ct]]
-                )
-            formation_energies.append(formation_energy)
-        formation_energies = np.array(formation_energies)
-
-    else:
-        formation_energies = np.array(
-            [
-                atom.info[energy_label]
-                - sum([isolated_atom_energies[j] for j in at_ids[ct]])
-                for ct, atom in enumerate(fatoms)
-            ]
-        )
+    enthalpies = calc_enthalpies(
+        build_structure_table(fatoms, energy_label=energy_label),
+        isolated_atom_energies,
+        ps,
+    )
 
-    for i, at in enumerate(fatoms):
-        enthalpy = (formation_energies[i] + at.get_volume() * ps[i] * GPa) / len(at)
-        enthalpies.append(enthalpy)
-
-    enthalpies = np.array(enthalpies)
-    min_H = np.min(enthalpies)
-    config_prob = []
-    histo = np.histogram(enthalpies)
-    for H in enthalpies:
-        bin_i = np.searchsorted(histo[1][1:], H, side="right")
-        if bin_i == len(histo[1][1:]):
-            bin_i = bin_i - 1
-        p = 1.0 / histo[0][bin_i] if histo[0][bin_i] > 0.0 else 0.0
-        if kt > 0.0:
-            p *= np.exp(-(H - min_H) / kt)
-        config_prob.append(p)
+    log_weights = flat_histogram_log_weights(enthalpies, kt)
 
     select_num = round(bolt_frac * len(fatoms))
 
     select_num = select_num if select_num < bolt_max_num else bolt_max_num
 
-    config_prob = np.array(config_prob)
-    selected_bolt_ats = []
-    for _ in range(select_num):
-        config_prob /= np.sum(config_prob)
-        cumul_prob = np.cumsum(config_prob)
-        rv = np.random.uniform()
-        config_i = np.searchsorted(cumul_prob, rv)
-        selected_bolt_ats.append(fatoms[config_i])
-        # remove from config_prob by converting to list
-        config_prob = np.delete(config_prob, config_i)
-        # remove from other lists
-        del fatoms[config_i]
-        enthalpies = np.delete(enthalpies, config_i)
+    selected_bolt_ats = [
+        fatoms[i] for i in weighted_sample_without_replacement(log_weights, select_num)
+    ]
 
     if cur_num < select_num:
         selected_atoms = cur_select(
@@ -1186,6 +1763,8 @@ def boltzhist_cur_one_shot(
             select_nums=cur_num,
             stochastic=True,
             random_seed=random_seed,
+            memory_budget=memory_budget,
+            descriptor_engine=descriptor_engine,
         )
     else:
         selected_atoms = selected_bolt_ats
@@ -1205,6 +1784,8 @@ def boltzhist_cur_dual_iter(
     energy_label: str = "energy",
     pressures: list[list[float]] | None = None,
     random_seed: int = None,
+    memory_budget: float | None = None,
+    descriptor_engine: DescriptorEngine | None = None,
 ) -> list | None:
     """
     Execute sampling with two iterations.
@@ -1237,6 +1818,11 @@ def boltzhist_cur_dual_iter(
         The pressures at which the atoms have been optimized, in GPa.
     random_seed : int
         The seed for the random number generator.
+    memory_budget: float | None
+        Maximum memory in GB for the CUR kernel matrix. Larger kernels are
+        streamed in row blocks. If None, the full kernel is built.
+    descriptor_engine: DescriptorEngine | None
+        A running descriptor engine to reuse for CUR. If None, a temporary one is created.
 
     Returns
     -------
@@ -1264,6 +1850,8 @@ def boltzhist_cur_dual_iter(
         energy_label=energy_label,
         pressures=pressure_minima,
         random_seed=random_seed,
+        memory_budget=memory_budget,
+        descriptor_engine=descriptor_engine,
     )
 
     if selected_minima is None:
@@ -1292,6 +1880,8 @@ def boltzhist_cur_dual_iter(
         energy_label=energy_label,
         pressures=selected_trajs_pressure,
         random_seed=random_seed,
+        memory_budget=memory_budget,
+        descriptor_engine=descriptor_engine,
     )
 
 
@@ -1307,6 +1897,8 @@ def convexhull_cur(
     isolated_atom_energies: dict = None,
     element_order: list | None = None,
     scheme: str = "linear-hull",
+    memory_budget: float | None = None,
+    descriptor_engine: DescriptorEngine | None = None,
 ) -> list | None:
     """
     Sample atoms from a list according to Boltzmann energy weighting relative to convex hull and CUR diversity.
@@ -1343,6 +1935,11 @@ def convexhull_cur(
         use 'volume-stoichiometry' (>=3D E,V,mole-fraction hull).
         TODO: need to generalise this to ND hulls for mcp systems.
         GST good test case.
+    memory_budget: float | None
+        Maximum memory in GB for the CUR kernel matrix. Larger kernels are
+        streamed in row blocks. If None, the full kernel is built.
+    descriptor_engine: DescriptorEngine | None
+        A running descriptor engine to reuse for CUR. If None, a temporary one is created.
 
     Returns
     -------
@@ -1365,12 +1962,9 @@ def convexhull_cur(
         raise KeyError("isolated_atom_energies must be supplied for convexhull_cur")
 
     if scheme == "linear-hull":
-        hull, p = get_convex_hull(fatoms, energy_name=energy_label)
-        des = np.array(
-            [
-                get_e_distance_to_hull(hull, at, energy_name=energy_label)
-                for at in fatoms
-            ]
+        hull, _ = get_convex_hull(fatoms, energy_name=energy_label)
+        des = get_e_distances_to_hull(
+            hull, get_volume_energy_points(fatoms, energy_name=energy_label)
         )
 
     elif scheme == "volume-stoichiometry":
@@ -1382,17 +1976,14 @@ def convexhull_cur(
         )
         hull = calculate_hull_nd(points)
 
-        des = np.array(
-            [
-                get_e_distance_to_hull_nd(
-                    hull,
-                    at,
-                    isolated_atom_energies=isolated_atom_energies,
-                    energy_name=energy_label,
-                    element_order=element_order,
-                )
-                for at in fatoms
-            ]
+        des = get_e_distances_to_hull_nd(
+            hull,
+            get_stoichiometry_volume_points(
+                fatoms,
+                isolated_atom_energies,
+                energy_label,
+                element_order=element_order,
+            ),
         )
         print("it will be coming soon!")
 
@@ -1401,36 +1992,15 @@ def convexhull_cur(
             'scheme must be either "linear-hull" or "volume-stoichiometry"'
         )
 
-    histo = np.histogram(des)
-    config_prob = []
-    min_ec = np.min(des)
-
-    for ec in des:
-        bin_i = np.searchsorted(histo[1][1:], ec, side="right")
-        if bin_i == len(histo[1][1:]):
-            bin_i = bin_i - 1
-        p = 1.0 / histo[0][bin_i] if histo[0][bin_i] > 0.0 else 0.0
-        if kt > 0.0:
-            p *= np.exp(-(ec - min_ec) / kt)
-        config_prob.append(p)
+    log_weights = flat_histogram_log_weights(des, kt)
 
     select_num = round(bolt_frac * len(fatoms))
 
     select_num = select_num if select_num < bolt_max_num else bolt_max_num
 
-    config_prob = np.array(config_prob)
-    selected_bolt_ats = []
-    for _ in range(select_num):
-        config_prob /= np.sum(config_prob)
-        cumul_prob = np.cumsum(config_prob)  # cumulate prob
-        rv = np.random.uniform()
-        config_i = np.searchsorted(cumul_prob, rv)
-        selected_bolt_ats.append(fatoms[config_i])
-        # remove from config_prob by converting to list
-        config_prob = np.delete(config_prob, config_i)
-        # remove from other lists
-        del fatoms[config_i]
-        des = np.delete(des, config_i)
+    selected_bolt_ats = [
+        fatoms[i] for i in weighted_sample_without_replacement(log_weights, select_num)
+    ]
 
     # implement CUR
     if cur_num < select_num:
@@ -1440,6 +2010,8 @@ def convexhull_cur(
             kernel_exp=kernel_exp,
             select_nums=cur_num,
             stochastic=True,
+            memory_budget=memory_budget,
+            descriptor_engine=descriptor_engine,
         )
     else:
         selected_atoms = selected_bolt_ats
@@ -1448,15 +2020,17 @@ def convexhull_cur(
 
 
 def data_distillation(
-    vasp_ref_dir: str, force_max: float, force_label: str
+    vasp_ref_dir: str | Path | AtomsDataset,
+    force_max: float,
+    force_label: str,
 ) -> list[Atom | Atoms]:
     """
     For data distillation.
 
     Parameters
     ----------
-    vasp_ref_dir: str
-        VASP reference data directory.
+    vasp_ref_dir: str | Path | AtomsDataset
+        VASP reference data directory, or the already loaded reference dataset.
     force_max: float
         Maximally allowed force.
     force_label: str
@@ -1468,15 +2042,17 @@ def data_distillation(
         List of distilled atoms.
 
     """
-    atoms = ase.io.read(vasp_ref_dir, index=":")
-
-    atoms_distilled = []
-    for at in atoms:
-        forces = np.abs(at.arrays[force_label])
-        f_component_max = np.max(forces)
+    dataset = (
+        vasp_ref_dir
+        if isinstance(vasp_ref_dir, AtomsDataset)
+        else AtomsDataset.from_extxyz(vasp_ref_dir)
+    )
 
-        if f_component_max < force_max:
-            atoms_distilled.append(at)
+    # frames without forces would be zero-filled and pass the filter
+    if force_label not in dataset.arrays or not dataset.array_frames[force_label].all():
+        raise KeyError(force_label)
+    f_component_max = dataset.frame_max(np.abs(dataset.arrays[force_label]))
+    atoms_distilled = dataset.select(f_component_max < force_max).to_atoms()
 
     logging.warning(
         f"After distillation, there are still {len(atoms_distilled)} data points remaining."
@@ -1598,6 +2174,31 @@ def flatten_list(input_list: list | list[list]) -> list:
     return input_list
 
 
+def read_rss_trajectory(traj_file: str | Path) -> list[Atoms]:
+    """
+    Read the trajectory of an RSS relaxation.
+
+    Both the extxyz files and the streamed binary '.traj' files of 'process_rss' are
+    read. In the latter, only the last frame carries the 'minim_stat' of the
+    relaxation, which is copied to all frames.
+
+    Parameters
+    ----------
+    traj_file: str | Path
+        Path of the trajectory file.
+
+    Returns
+    -------
+    list[Atoms]
+        The frames of the relaxation.
+    """
+    frames = ase.io.read(traj_file, index=":")
+    if str(traj_file).endswith(".traj") and "minim_stat" in frames[-1].info:
+        for frame in frames:
+            frame.info["minim_stat"] = frames[-1].info["minim_stat"]
+    return frames
+
+
 def handle_rss_trajectory(
     traj_path, remove_traj_files
 ) -> tuple[list[list], list[list]]:
@@ -1633,7 +2234,7 @@ def handle_rss_trajectory(
     for traj in traj_path:
         if traj is not None and Path(traj).exists():
             print("Processing trajectory:", traj)
-            at = ase.io.read(traj, index=":")
+            at = read_rss_trajectory(traj)
             atoms.append(at)
             pressure = [i.info["RSS_applied_pressure"] for i in at]
             pressures.append(pressure)
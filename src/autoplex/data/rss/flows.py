@@ -39,6 +39,9 @@ class BuildMultiRandomizedStructure(Maker):
         Numbers of each fragment to be included in the random structures. Defaults to 1 for all specified.
     remove_tmp_files: bool
         Remove all temporary files raised by buildcell to save memory.
+    batched_generation: bool
+        If true, each worker runs buildcell for a batch of structures and parses its output
+        in memory, without a shell or temporary files.
     initial_selection_enabled: bool
         If true, sample structures using CUR.
     selected_struct_numbers: list
@@ -61,6 +64,7 @@ class BuildMultiRandomizedStructure(Maker):
     fragment_file: str | None = None
     fragment_numbers: list[str] | None = None
     remove_tmp_files: bool = True
+    batched_generation: bool = False
     initial_selection_enabled: bool = False
     selected_struct_numbers: list[int] | None = None
     bcur_params: dict | None = None
@@ -86,6 +90,7 @@ class BuildMultiRandomizedStructure(Maker):
                 tag=self.tag,
                 struct_number=struct_number,
                 remove_tmp_files=self.remove_tmp_files,
+                batched_generation=self.batched_generation,
                 cell_seed_path=cell_seed_path,
                 buildcell_option=buildcell_option,
                 fragment_file=self.fragment_file,
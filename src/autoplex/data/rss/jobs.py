@@ -3,6 +3,7 @@
 import os
 import re
 from dataclasses import dataclass
+from io import StringIO
 from multiprocessing import Pool
 from pathlib import Path
 from shutil import which
@@ -14,12 +15,17 @@ import numpy as np
 from ase import Atoms
 from ase.data import atomic_numbers, covalent_radii
 from jobflow import Flow, Maker, Response, job
-from monty.dev import requires
 from pymatgen.core import Element, Structure
 from pymatgen.io.ase import AseAtomsAdaptor
 
 from autoplex.data.common.utils import flatten
-from autoplex.data.rss.utils import minimize_structures, split_structure_into_groups
+from autoplex.data.rss.utils import (
+    FileTaskQueue,
+    RandomCellGenerator,
+    minimize_structures,
+    prepare_rss_atoms,
+    split_structure_into_groups,
+)
 
 
 @dataclass
@@ -43,7 +49,9 @@ class RandomizedStructure(Maker):
     remove_tmp_files: bool
         Remove all temporary files raised by buildcell to save memory.
     buildcell_option: dict
-        Customized parameters for buildcell.
+        Customized parameters for buildcell. The key 'GENERATOR' selects 'buildcell' or
+        the native 'RandomCellGenerator' ('native'). If it is not given, the native
+        generator is used when the 'buildcell' executable is not in PATH.
     cell_seed_path: str
         Path to the custom buildcell control file, which ends with '.cell'. If this file exists,
         the buildcell_option argument will no longer take effect.
@@ -55,6 +63,10 @@ class RandomizedStructure(Maker):
         atoms.cell must be defined (e.g. Atoms.cell = np.eye(3)*20).
     fragment_numbers: list[str] (optional)
         Numbers of each fragment to be included in the random structures. Defaults to 1 for all specified.
+    batched_generation: bool
+        If true, each worker runs buildcell for a batch of structures and parses its output
+        in memory, without a shell or temporary files. The structures are streamed into the
+        output file, and failed buildcell runs are counted and skipped instead of raising.
     """
 
     name: str = "build_random_cells"
@@ -67,17 +79,37 @@ class RandomizedStructure(Maker):
     num_processes: int = 32
     fragment_file: str | None = None
     fragment_numbers: list[str] | None = None
+    batched_generation: bool = False
 
-    @requires(
-        which("buildcell"),
-        "RSS flows requires the executable 'buildcell' to be in PATH. "
-        "Please follow the instructions in the autoplex documentation to install "
-        "the AIRSS library and add it to PATH. Link to the documentation:"
-        " https://autoatml.github.io/autoplex/user/index.html#enabling-rss-workflows",
-    )
     @job
     def make(self):
         """Maker to create random structures by buildcell."""
+        buildcell_option = self.buildcell_option
+        generator = None
+        if buildcell_option is not None:
+            buildcell_option = dict(buildcell_option)
+            generator = buildcell_option.pop("GENERATOR", None)
+
+        if generator is None:
+            generator = "buildcell" if which("buildcell") else "native"
+            if generator == "native":
+                print(
+                    "'buildcell' is not in PATH, using the native random structure "
+                    "generator."
+                )
+        elif generator not in ("buildcell", "native"):
+            raise ValueError(
+                f"Unknown generator '{generator}', use 'buildcell' or 'native'."
+            )
+        elif generator == "buildcell" and which("buildcell") is None:
+            raise RuntimeError(
+                "RSS flows requires the executable 'buildcell' to be in PATH. "
+                "Please follow the instructions in the autoplex documentation to "
+                "install the AIRSS library and add it to PATH, or use the native "
+                "generator. Link to the documentation:"
+                " https://autoatml.github.io/autoplex/user/index.html#enabling-rss-workflows"
+            )
+
         if self.cell_seed_path:
             if not os.path.isfile(self.cell_seed_path):
                 raise FileNotFoundError(
@@ -93,16 +125,16 @@ class RandomizedStructure(Maker):
                 "MINSEP=1.5",
             ]
 
-            if self.buildcell_option is not None:
+            if buildcell_option is not None:
                 buildcell_parameters = self._update_buildcell_option(
-                    self.buildcell_option, buildcell_parameters
+                    buildcell_option, buildcell_parameters
                 )
 
             elements = self._extract_elements(self.tag)  # {"Si":1, "O":2}
 
             if (
-                self.buildcell_option is not None
-                and "SPECIES" in self.buildcell_option
+                buildcell_option is not None
+                and "SPECIES" in buildcell_option
                 and self.fragment_file is not None
             ):
                 raise ValueError(
@@ -110,8 +142,8 @@ class RandomizedStructure(Maker):
                     "Specify your fragment only and use NFORM to control their number."
                 )
 
-            if self.buildcell_option is None or (
-                "SPECIES" not in self.buildcell_option and self.fragment_file is None
+            if buildcell_option is None or (
+                "SPECIES" not in buildcell_option and self.fragment_file is None
             ):
                 make_species = self._make_species(elements)  # Si%NUM=1,O%NUM=2
                 buildcell_parameters = self._update_buildcell_option(
@@ -119,12 +151,12 @@ class RandomizedStructure(Maker):
                 )
 
             if (
-                self.buildcell_option is None
+                buildcell_option is None
                 or (
-                    "VARVOL" not in self.buildcell_option
-                    and "TARGVOL" not in self.buildcell_option
+                    "VARVOL" not in buildcell_option
+                    and "TARGVOL" not in buildcell_option
                 )
-                or "MINSEP" not in self.buildcell_option
+                or "MINSEP" not in buildcell_option
             ):
                 r0 = {}
                 varvol = {}
@@ -143,9 +175,9 @@ class RandomizedStructure(Maker):
 
                     num_atom_formula += elements[ele]
 
-                if self.buildcell_option is None or (
-                    "VARVOL" not in self.buildcell_option
-                    and "TARGVOL" not in self.buildcell_option
+                if buildcell_option is None or (
+                    "VARVOL" not in buildcell_option
+                    and "TARGVOL" not in buildcell_option
                 ):
                     mean_var = total_varvol_formula / num_atom_formula * len(elements)
                     buildcell_parameters = self._update_buildcell_option(
@@ -153,10 +185,7 @@ class RandomizedStructure(Maker):
                         buildcell_parameters,
                     )
 
-                if (
-                    self.buildcell_option is None
-                    or "MINSEP" not in self.buildcell_option
-                ):
+                if buildcell_option is None or "MINSEP" not in buildcell_option:
                     minsep = self._make_minsep(r0)
                     buildcell_parameters = self._update_buildcell_option(
                         {
@@ -220,6 +249,10 @@ class RandomizedStructure(Maker):
             self._cell_seed(buildcell_parameters, self.tag)
             bc_file = f"{self.tag}.cell"
 
+        if self.batched_generation or generator == "native":
+            self._generate_batched(bc_file, generator)
+            return os.path.join(Path.cwd(), self.output_file_name)
+
         with Pool(processes=self.num_processes) as pool:
             args = [
                 (i, bc_file, self.tag, self.remove_tmp_files)
@@ -406,7 +439,25 @@ class RandomizedStructure(Maker):
                 check=True,
             )
 
-        atom = ase.io.read(tmp_file_name, parallel=False)
+        atom = self._clean_atoms(ase.io.read(tmp_file_name, parallel=False), i)
+
+        if remove_tmp_files:
+            os.remove(tmp_file_name)
+            os.remove(tmp_error_file_name)
+
+        return atom
+
+    def _clean_atoms(self, atom: Atoms, i: int) -> Atoms:
+        """
+        Label a structure generated by 'buildcell' and drop its CASTEP-specific arrays.
+
+        Parameters
+        ----------
+        atom: Atoms
+            The generated structure.
+        i: int
+            Unique index of the structure.
+        """
         atom.info["unique_starting_index"] = i
 
         if "castep_labels" in atom.arrays:
@@ -415,9 +466,116 @@ class RandomizedStructure(Maker):
         if "initial_magmoms" in atom.arrays:
             del atom.arrays["initial_magmoms"]
 
-        if remove_tmp_files:
-            os.remove(tmp_file_name)
-            os.remove(tmp_error_file_name)
+        return atom
+
+    def _generate_batched(self, bc_file: str, generator: str = "buildcell") -> None:
+        """
+        Generate the structures in batches and stream them into the output file.
+
+        Parameters
+        ----------
+        bc_file: str
+            Path to the input 'buildcell' file.
+        generator: str
+            Generator of the structures, 'buildcell' or 'native'.
+        """
+        with open(bc_file) as bc_file_handle:
+            seed = bc_file_handle.read()
+        if generator == "native":
+            # unsupported or unreadable options fail here rather than in every worker
+            RandomCellGenerator(seed)
+
+        batch_size = max(1, -(-self.struct_number // (4 * self.num_processes)))
+        batches = [
+            list(range(start, min(start + batch_size, self.struct_number)))
+            for start in range(0, self.struct_number, batch_size)
+        ]
+
+        num_generated = 0
+        num_failed = 0
+        with (
+            open(self.output_file_name, "w") as output_file,
+            Pool(processes=self.num_processes) as pool,
+        ):
+            for atoms_batch, batch_failed in pool.imap(
+                self._generate_batch, [(batch, seed, generator) for batch in batches]
+            ):
+                ase.io.write(output_file, atoms_batch, format="extxyz")
+                output_file.flush()
+                num_generated += len(atoms_batch)
+                num_failed += batch_failed
+                print(
+                    f"Generated {num_generated}/{self.struct_number} random structures"
+                    f" ({num_failed} failed)"
+                )
+
+        if num_generated == 0:
+            raise RuntimeError(
+                f"All {self.struct_number} runs of {generator} failed, see the "
+                "output above for the errors."
+            )
+
+    def _generate_batch(
+        self, args: tuple[list[int], str, str]
+    ) -> tuple[list[Atoms], int]:
+        """
+        Generate a batch of structures in a worker.
+
+        Parameters
+        ----------
+        args: tuple[list[int], str, str]
+            Unique indices of the structures, the contents of the 'buildcell' file
+            and the generator, 'buildcell' or 'native'.
+
+        Returns
+        -------
+        tuple[list[Atoms], int]
+            The generated structures and the number of failed runs.
+        """
+        indices, seed, generator = args
+        if generator == "native":
+            cell_generator = RandomCellGenerator(seed)
+            rng = np.random.default_rng()
+
+        atoms_batch = []
+        num_failed = 0
+        for i in indices:
+            try:
+                if generator == "native":
+                    atom = cell_generator.generate(rng)
+                    if atom is None:
+                        raise RuntimeError("no random cell could be filled")
+                else:
+                    atom = self._run_buildcell(seed)
+            except Exception as exc:
+                print(f"{generator} failed for structure {i}: {exc}")
+                num_failed += 1
+                continue
+            atoms_batch.append(self._clean_atoms(atom, i))
+
+        return atoms_batch, num_failed
+
+    def _run_buildcell(self, seed: str) -> Atoms:
+        """
+        Run 'buildcell' without a shell and parse its output in memory.
+
+        Parameters
+        ----------
+        seed: str
+            Contents of the 'buildcell' file.
+        """
+        result = run(
+            ["buildcell"], input=seed, capture_output=True, text=True, check=False
+        )
+        if result.returncode != 0:
+            raise RuntimeError(
+                f"exit code {result.returncode}: {result.stderr.strip()}"
+            )
+        atom = ase.io.read(
+            StringIO(result.stdout), format="castep-cell", parallel=False
+        )
+        if np.isnan(atom.get_positions()).any():
+            raise ValueError("NaN positions")
 
         return atom
 
@@ -445,6 +603,13 @@ def do_rss_single_node(
     struct_start_index: int = 0,
     config_type: str = "traj",
     keep_symmetry: bool = True,
+    batch_size: int | None = None,
+    task_queue: str | None = None,
+    stream_traj: bool = False,
+    traj_interval: int = 1,
+    traj_keep_last: int | None = None,
+    early_abort: dict | None = None,
+    duplicate_detection: dict | None = None,
 ) -> list[str | None]:
     """
     Perform sandom structure searching (RSS) on one node using a machine learning interatomic potential (MLIP).
@@ -494,6 +659,30 @@ def do_rss_single_node(
         Specify the type of configurations generated from RSS
     keep_symmetry: bool
         If true, preserve symmetry during relaxation.
+    batch_size: int | None
+        If set, relax up to this many structures at once with one batched MLIP
+        call per step, e.g. on a GPU, instead of one structure per process.
+    task_queue: str | None
+        Directory of a shared task queue created by 'do_rss_multi_node'. If set,
+        structures are pulled from the queue until it is empty.
+    stream_traj: bool
+        If true, stream the trajectories to binary '.traj' files while relaxing
+        instead of keeping all frames in memory and writing extxyz files.
+    traj_interval: int
+        With 'stream_traj', only write every 'traj_interval'-th frame.
+    traj_keep_last: int | None
+        With 'stream_traj', only keep the last 'traj_keep_last' frames and the
+        frame of lowest enthalpy.
+    early_abort: dict | None
+        Criteria to abort unproductive relaxations early, passed as keyword
+        arguments to 'EarlyAbortMonitor', e.g. {"enthalpy_margin": 1.0,
+        "min_distance": 0.5}. Aborted relaxations are written with the
+        'minim_stat' 'aborted' and their reason.
+    duplicate_detection: dict | None
+        If set, stop relaxations that reach an already found minimum, with the
+        parameters of 'MinimaIndex' as keyword arguments, e.g. {"enthalpy_tol": 0.01}.
+        The number of unique minima and duplicates is written to
+        '<output_file_name>_minima.json'.
 
     Returns
     -------
@@ -522,6 +711,13 @@ def do_rss_single_node(
         struct_start_index=struct_start_index,
         config_type=config_type,
         keep_symmetry=keep_symmetry,
+        batch_size=batch_size,
+        task_queue=task_queue,
+        stream_traj=stream_traj,
+        traj_interval=traj_interval,
+        traj_keep_last=traj_keep_last,
+        early_abort=early_abort,
+        duplicate_detection=duplicate_detection,
     )
 
 
@@ -549,6 +745,13 @@ def do_rss_multi_node(
     num_groups: int = 1,
     config_type: str = "traj",
     keep_symmetry: bool = True,
+    batch_size: int | None = None,
+    shared_queue: bool = False,
+    stream_traj: bool = False,
+    traj_interval: int = 1,
+    traj_keep_last: int | None = None,
+    early_abort: dict | None = None,
+    duplicate_detection: dict | None = None,
 ) -> list[list | None]:
     """
     Perform sandom structure searching (RSS) on multiple nodes using a machine learning interatomic potential (MLIP).
@@ -601,6 +804,31 @@ def do_rss_multi_node(
         Specify the type of configurations generated from RSS
     keep_symmetry: bool
         If true, preserve symmetry during relaxation.
+    batch_size: int | None
+        If set, relax up to this many structures at once with one batched MLIP
+        call per step, e.g. on a GPU, instead of one structure per process.
+    shared_queue: bool
+        If true, all structures are put into one task queue that the jobs of all
+        groups pull from until it is empty, instead of giving each group a fixed
+        share of the structures.
+    stream_traj: bool
+        If true, stream the trajectories to binary '.traj' files while relaxing
+        instead of keeping all frames in memory and writing extxyz files.
+    traj_interval: int
+        With 'stream_traj', only write every 'traj_interval'-th frame.
+    traj_keep_last: int | None
+        With 'stream_traj', only keep the last 'traj_keep_last' frames and the
+        frame of lowest enthalpy.
+    early_abort: dict | None
+        Criteria to abort unproductive relaxations early, passed as keyword
+        arguments to 'EarlyAbortMonitor', e.g. {"enthalpy_margin": 1.0,
+        "min_distance": 0.5}. Aborted relaxations are written with the
+        'minim_stat' 'aborted' and their reason.
+    duplicate_detection: dict | None
+        If set, stop relaxations that reach an already found minimum, with the
+        parameters of 'MinimaIndex' as keyword arguments, e.g. {"enthalpy_tol": 0.01}.
+        The number of unique minima and duplicates is written to
+        '<output_file_name>_minima.json'.
 
     Returns
     -------
@@ -624,6 +852,12 @@ def do_rss_multi_node(
     else:
         raise ValueError("Invalid structure format. It must be a list of structures.")
 
+    task_queue = None
+    if shared_queue:
+        task_queue = str(Path.cwd() / "rss_task_queue")
+        FileTaskQueue.create(task_queue, prepare_rss_atoms(structure, iteration_index))
+        structure_groups = [[] for _ in range(num_groups)]
+
     rss_info = []
 
     struct_start_index = 0
@@ -651,6 +885,13 @@ def do_rss_multi_node(
             struct_start_index=struct_start_index,
             config_type=config_type,
             keep_symmetry=keep_symmetry,
+            batch_size=batch_size,
+            task_queue=task_queue,
+            stream_traj=stream_traj,
+            traj_interval=traj_interval,
+            traj_keep_last=traj_keep_last,
+            early_abort=early_abort,
+            duplicate_detection=duplicate_detection,
         )
 
         struct_start_index += len(structure_groups[i])
@@ -3,30 +3,47 @@
 import ast
 import json
 import os
+import pickle
+from collections import deque
+from collections.abc import Callable
+from contextlib import suppress
 from functools import partial
-from multiprocessing import Pool
+from itertools import product
+from multiprocessing import Manager, Pool
 from pathlib import Path
-from typing import Literal
+from queue import SimpleQueue
+from typing import ClassVar, Literal
 
 import ase.io
 import matgl
 import numpy as np
+import torch
 from ase import Atoms
+from ase.calculators.calculator import Calculator
+from ase.calculators.singlepoint import SinglePointCalculator
+from ase.cell import Cell
 from ase.constraints import (
     FixConstraint,
     FixSymmetry,
     UnitCellFilter,
     slice2enlist,
 )
-from ase.data import atomic_numbers, chemical_symbols
-from ase.geometry import find_mic
+from ase.data import atomic_numbers, chemical_symbols, covalent_radii
+from ase.geometry import cellpar_to_cell, find_mic
+from ase.io.trajectory import Trajectory
+from ase.neighborlist import neighbor_list
 from ase.optimize.precon import Exp, PreconLBFGS
+from ase.stress import full_3x3_to_voigt_6_stress
 from ase.units import GPa
+from mace import data as mace_data
 from mace.calculators import MACECalculator
+from mace.tools import torch_geometric
 from matgl.ext.ase import M3GNetCalculator
 from nequip.ase import NequIPCalculator
-from pymatgen.core import Structure
+from pymatgen.core import Element, Structure
 from pymatgen.io.ase import AseAtomsAdaptor
+from scipy.spatial import cKDTree
+from scipy.spatial.transform import Rotation
 from threadpoolctl import threadpool_limits
 
 from autoplex.fitting.common.utils import (
@@ -304,6 +321,980 @@ class HookeanRepulsion(FixConstraint):
         return f"Hookean({self.index}) to plane"
 
 
+class HookeanPairRepulsion(FixConstraint):
+    """Constrain all atom pairs softly to species-dependent minimum separations.
+
+    A vectorised replacement for one 'HookeanRepulsion' constraint per atom pair.
+    The spring constant and threshold length of every pair are looked up from a
+    table of species pairs, and the minimum-image distances, forces and energies of
+    all pairs are calculated with NumPy in a single call. As the constraint is
+    defined by the species, it applies to any subset of the atoms.
+
+    Parameters
+    ----------
+    hookean_paras: dict[tuple[int, int], tuple[float, float]]
+        Spring constant in eV Å^-2 and threshold length in Å for each pair of
+        atomic numbers. Pairs with a zero spring constant or threshold are ignored.
+    """
+
+    def __init__(
+        self, hookean_paras: dict[tuple[int, int], tuple[float, float]]
+    ) -> None:
+        self.hookean_paras = {
+            (int(z1), int(z2)): (float(k), float(rt))
+            for (z1, z2), (k, rt) in hookean_paras.items()
+        }
+        self.used = False
+        self._pair_cache: tuple[bytes, tuple[np.ndarray, ...]] | None = None
+
+    def get_pairs(
+        self, numbers: np.ndarray
+    ) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """Get the constrained atom pairs with their spring constants and thresholds.
+
+        Parameters
+        ----------
+        numbers: np.ndarray
+            Atomic numbers of the structure.
+
+        Returns
+        -------
+        tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]
+            Indices of the first and second atoms, spring constants and threshold
+            lengths of the constrained pairs.
+        """
+        key = np.asarray(numbers).tobytes()
+        if self._pair_cache is not None and self._pair_cache[0] == key:
+            return self._pair_cache[1]
+
+        species = np.unique(numbers)
+        species_index = np.searchsorted(species, numbers)
+        springs = np.zeros((len(species), len(species)))
+        thresholds = np.zeros((len(species), len(species)))
+        # the order of the species in a pair only matters if both orders are given,
+        # in which case (Z_i, Z_j) of the pair i < j takes precedence
+        for a, z1 in enumerate(species):
+            for b, z2 in enumerate(species):
+                for pair in ((z1, z2), (z2, z1)):
+                    k, rt = self.hookean_paras.get(pair, (0.0, 0.0))
+                    if k != 0 and rt != 0:
+                        springs[a, b], thresholds[a, b] = k, rt
+                        break
+
+        i, j = np.triu_indices(len(numbers), k=1)
+        k = springs[species_index[i], species_index[j]]
+        rt = thresholds[species_index[i], species_index[j]]
+        mask = k != 0
+        pairs = (i[mask], j[mask], k[mask], rt[mask])
+        self._pair_cache = (key, pairs)
+
+        return pairs
+
+    def _compressed_pairs(
+        self, atoms: Atoms
+    ) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """Get the pairs closer than their threshold with their separation vectors."""
+        i, j, k, rt = self.get_pairs(atoms.numbers)
+        positions = atoms.positions
+        displace, bondlength = find_mic(
+            positions[j] - positions[i], atoms.cell, atoms.pbc
+        )
+        close = bondlength < rt
+        return i[close], j[close], k[close], rt[close], displace[close]
+
+    def get_removed_dof(self, atoms):
+        """Get number of removed degrees of freedom due to constraint."""
+        return 0
+
+    def todict(self):
+        """Convert constraint to dictionary."""
+        return {
+            "name": "HookeanPairRepulsion",
+            "kwargs": {
+                "hookean_paras": [
+                    [z1, z2, k, rt] for (z1, z2), (k, rt) in self.hookean_paras.items()
+                ]
+            },
+        }
+
+    def adjust_positions(self, atoms, newpositions):
+        """Adjust positions to match the constraints.
+
+        Do nothing for this constraint.
+        """
+
+    def adjust_momenta(self, atoms, momenta):
+        """Adjust momenta to match the constraints.
+
+        Do nothing for this constraint.
+        """
+
+    def adjust_forces(self, atoms, forces):
+        """Adjust forces on the atoms to match the constraints."""
+        i, j, k, rt, displace = self._compressed_pairs(atoms)
+        if len(i) == 0:
+            return
+        bondlength = np.linalg.norm(displace, axis=1)
+        print(
+            f"Hookean adjusting forces of {len(i)} pairs, shortest bondlength: ",
+            bondlength.min(),
+        )
+        self.used = True
+        force = (k * (rt - bondlength) / bondlength)[:, None] * displace
+        np.subtract.at(forces, i, force)
+        np.add.at(forces, j, force)
+
+    def adjust_potential_energy(self, atoms):
+        """Return the difference to the potential energy due to active constraints.
+
+        (the quantity returned is to be added to the potential energy).
+        """
+        _, _, k, rt, displace = self._compressed_pairs(atoms)
+        bondlength = np.linalg.norm(displace, axis=1)
+        return float(np.sum(0.5 * k * (bondlength - rt) ** 2))
+
+    def index_shuffle(self, atoms, ind):
+        """Change the indices.
+
+        Do nothing, as the constraint is defined by the species of the atoms.
+        """
+
+    def __repr__(self):
+        """Return a representation of the constraint."""
+        return f"HookeanPairRepulsion({self.hookean_paras})"
+
+
+def load_mlip_calculator(
+    mlip_type: str,
+    mlip_path: str | list[str],
+    device: str = "cpu",
+    isolated_atom_energies: dict[int, float] | None = None,
+) -> Calculator:
+    """
+    Load the ASE calculator of an MLIP.
+
+    Parameters
+    ----------
+    mlip_type: str
+        Choose one specific MLIP type:
+        'GAP' | 'J-ACE' | 'NequIP' | 'M3GNet' | 'MACE'.
+    mlip_path: str | list[str]
+        Path to the MLIP model or List of Path to the MLIP model.
+    device: str
+        Specify the device to use: "cuda" or "cpu".
+    isolated_atom_energies: dict
+        Dictionary of isolated atoms energies.
+
+    Returns
+    -------
+    Calculator
+        The calculator of the MLIP.
+    """
+    mlip_path = mlip_path[0] if isinstance(mlip_path, list) else mlip_path
+
+    if mlip_type == "GAP":
+        gap_label = os.path.join(mlip_path, "gap_file.xml")
+        gap_control = "Potential xml_label=" + extract_gap_label(gap_label)
+        pot = CustomPotential(args_str=gap_control, param_filename=gap_label)
+
+    elif mlip_type == "J-ACE":
+        from ase.calculators.lammpslib import LAMMPSlib  # noqa
+
+        try:
+            from lammps import lammps  # noqa
+
+            lmp = lammps()
+            if "ML-PACE" not in lmp.installed_packages:
+                raise RuntimeError(
+                    "To use RSS flow with J-ACE potential, it needs LAMMPS compiled with"
+                    "lammps-user-pace library. ML-PACE is not found in the current LAMMPS binary installation."
+                    "Please follow the instructions in the autoplex documentation to install"
+                    "LAMMPS with the required packages. Link to the documentation: "
+                    " https://autoatml.github.io/autoplex/user/index.html#lammps-installation"
+                )
+        except Exception as exc:
+            raise RuntimeError(
+                "To use RSS flow with J-ACE potential, it needs LAMMPS compiled with"
+                "python bindings and lammps-user-pace. Please follow the instructions in"
+                "the autoplex documentation to install LAMMPS with the required packages. "
+                "Link to the documentation:"
+                " https://autoatml.github.io/autoplex/user/index.html#lammps-installation"
+            ) from exc
+
+        ace_label = os.path.join(mlip_path, "acemodel.yace")
+        ace_json = os.path.join(mlip_path, "acemodel.json")
+        ace_table = os.path.join(mlip_path, "acemodel_pairpot.table")
+
+        atom_types, cmds = extract_pairstyle(ace_label, ace_json, ace_table)
+
+        pot = LAMMPSlib(
+            lmpcmds=cmds, atom_types=atom_types, log_file="test.log", keep_alive=True
+        )
+
+    elif mlip_type == "NEQUIP":
+        nequip_label = os.path.join(mlip_path, "deployed_nequip_model.pth")
+        if isolated_atom_energies:
+            ele_syms = [
+                chemical_symbols[int(e_num)] for e_num in isolated_atom_energies
+            ]
+
+        else:
+            raise ValueError("isol_es is empty or not defined!")
+        pot = NequIPCalculator.from_deployed_model(
+            model_path=nequip_label,
+            device=device,
+            species_to_type_name={s: s for s in ele_syms},
+            set_global_options=False,
+        )
+
+    elif mlip_type == "M3GNET":
+        pot_file = matgl.load_model(path=mlip_path)
+        pot = M3GNetCalculator(potential=pot_file)
+
+    elif mlip_type == "MACE":
+        mace_label = os.path.join(mlip_path, "checkpoints/MACE_model_run-123.model")
+        pot = MACECalculator(model_paths=mace_label, device=device)
+
+    else:
+        raise ValueError(f"MLIP type {mlip_type} is not supported for RSS.")
+
+    return pot
+
+
+_WORKER_CALCULATOR = None
+
+
+def _init_rss_worker(
+    mlip_type: str,
+    mlip_path: str | list[str],
+    device: str,
+    isolated_atom_energies: dict[int, float] | None,
+) -> None:
+    """Load the MLIP calculator once for the lifetime of a pool worker."""
+    global _WORKER_CALCULATOR  # noqa: PLW0603
+    threadpool_limits(limits=1)
+    try:
+        _WORKER_CALCULATOR = load_mlip_calculator(
+            mlip_type,
+            mlip_path,
+            device=device,
+            isolated_atom_energies=isolated_atom_energies,
+        )
+    except Exception as exc:
+        # raised in the tasks instead, a failing initializer makes the pool
+        # restart its workers forever
+        _WORKER_CALCULATOR = exc
+
+
+def _process_rss_worker(atom: Atoms, **kwargs) -> str | None:
+    """Relax a structure in a pool worker with the calculator of the worker."""
+    if isinstance(_WORKER_CALCULATOR, Exception):
+        raise _WORKER_CALCULATOR
+    return process_rss(atom, calculator=_WORKER_CALCULATOR, **kwargs)
+
+
+def set_rss_constraints(
+    atom: Atoms,
+    hookean_repul: bool = False,
+    hookean_paras: dict[tuple[int, int], tuple[float, float]] | None = None,
+    keep_symmetry: bool = True,
+) -> None:
+    """
+    Set the constraints of an RSS relaxation on a structure.
+
+    Parameters
+    ----------
+    atom: Atoms
+        The structure to relax.
+    hookean_repul: bool
+        If true, apply Hookean repulsion.
+    hookean_paras: dict[tuple[int, int], tuple[float, float]]
+        Parameters for Hookean repulsion as a dictionary of tuples.
+    keep_symmetry: bool
+        If true, preserve symmetry during relaxation.
+    """
+    if hookean_paras is not None:
+        hookean_paras = {
+            ast.literal_eval(k) if isinstance(k, str) else k: v
+            for k, v in hookean_paras.items()
+        }
+
+    constraint_list = []
+    if hookean_repul and hookean_paras:
+        hookean_constraint = HookeanPairRepulsion(hookean_paras)
+        if len(hookean_constraint.get_pairs(atom.get_atomic_numbers())[0]) > 0:
+            constraint_list.append(hookean_constraint)
+
+    if keep_symmetry:
+        print("Creating FixSymmetry calculator and maintaining initial symmetry!")
+        constraint_list.append(FixSymmetry(atom, symprec=1.0e-4))
+
+    if constraint_list:
+        atom.set_constraint(constraint_list)
+
+
+def sample_scalar_pressure(
+    scalar_pressure_method: str = "exp",
+    scalar_exp_pressure: float = 100,
+    scalar_pressure_exponential_width: float = 0.2,
+    scalar_pressure_low: float = 0,
+    scalar_pressure_high: float = 50,
+) -> float:
+    """
+    Draw the external pressure of an RSS relaxation.
+
+    Parameters
+    ----------
+    scalar_pressure_method: str
+        Method for adding external pressures. Default is 'exp'.
+    scalar_exp_pressure: float
+        Scalar exponential pressure. Default is 100.
+    scalar_pressure_exponential_width: float
+        Width for scalar pressure exponential. Default is 0.2.
+    scalar_pressure_low: float
+        Low limit for scalar pressure. Default is 0.
+    scalar_pressure_high: float
+        High limit for scalar pressure. Default is 50.
+
+    Returns
+    -------
+    float
+        The pressure in eV/A^3.
+    """
+    if scalar_pressure_method == "exp":
+        scalar_pressure_tmp = scalar_exp_pressure * GPa
+        if scalar_pressure_exponential_width > 0.0:
+            scalar_pressure_tmp *= np.random.exponential(
+                scalar_pressure_exponential_width
+            )
+    elif scalar_pressure_method == "uniform":
+        scalar_pressure_tmp = (
+            np.random.uniform(low=scalar_pressure_low, high=scalar_pressure_high) * GPa
+        )
+    return scalar_pressure_tmp
+
+
+def finalize_rss_trajectory(
+    traj: list[Atoms],
+    converged: bool,
+    output_file_name: str = "RSS_relax_results",
+    write_traj: bool = True,
+    config_type: str = "traj",
+    abort_reason: str | None = None,
+) -> str | None:
+    """
+    Label the frames of a finished RSS relaxation and write them to file.
+
+    Parameters
+    ----------
+    traj: list[Atoms]
+        The frames of the relaxation, carrying the 'unique_starting_index' info.
+    converged: bool
+        Whether the relaxation converged.
+    output_file_name: str
+        Prefix for the trajectory file name.
+    write_traj: bool
+        If true, write trajectory of RSS.
+    config_type: str
+        Specify the type of configurations generated from RSS.
+    abort_reason: str | None
+        If the relaxation was aborted early, the reason. The frames are then labelled
+        as 'aborted' and the reason is stored in the info of the last frame.
+
+    Returns
+    -------
+    str | None
+        Path of the trajectory file if the relaxation converged, otherwise None.
+    """
+    minim_stat = "converged" if converged else "unconverged"
+    if abort_reason is not None:
+        minim_stat = "aborted"
+        traj[-1].info["RSS_abort_reason"] = abort_reason
+    unique_starting_index = traj[0].info["unique_starting_index"]
+
+    for traj_at_i, traj_at in enumerate(traj):
+        traj_at.info["RSS_minim_iter"] = traj_at_i
+        traj_at.info["config_type"] = config_type
+        traj_at.info["minim_stat"] = minim_stat
+
+    traj_file_name = None
+    if write_traj:
+        traj_file_name = (
+            output_file_name + "_traj_" + str(unique_starting_index) + ".extxyz"
+        )
+        ase.io.write(traj_file_name, traj, parallel=False)
+    del traj[-1].info["minim_stat"]
+    traj[-1].info["config_type"] = minim_stat + "_minimum"
+
+    local_minima = traj[-1]
+
+    if (
+        local_minima.info["config_type"] == "converged_minimum"
+        and traj_file_name is not None
+    ):
+        dir_path = Path.cwd()
+        return os.path.join(dir_path, traj_file_name)
+    return None
+
+
+class RSSTrajectoryWriter:
+    """
+    Stream the frames of an RSS relaxation to a binary ASE trajectory file.
+
+    Frames are written while the optimizer runs instead of being collected in
+    memory. Either every 'interval'-th frame is written, or, if 'keep_last' is set,
+    only the last 'keep_last' frames and the frame of lowest enthalpy are kept and
+    written when the relaxation has finished. The last frame is always written and
+    carries the 'minim_stat' of the relaxation, which 'read_rss_trajectory' copies to
+    all other frames.
+
+    Parameters
+    ----------
+    file_name: str
+        Name of the trajectory file, ending in '.traj'.
+    interval: int
+        Write every 'interval'-th frame.
+    keep_last: int | None
+        If set, only keep the last 'keep_last' frames and the lowest-enthalpy frame.
+    config_type: str
+        Specify the type of configurations generated from RSS.
+    """
+
+    def __init__(
+        self,
+        file_name: str,
+        interval: int = 1,
+        keep_last: int | None = None,
+        config_type: str = "traj",
+    ):
+        self.file_name = file_name
+        self.interval = interval
+        self.keep_last = keep_last
+        self.config_type = config_type
+        self.n_frames = 0
+        self.last_frames: deque = deque(maxlen=keep_last or 1)
+        self.lowest_frame: Atoms | None = None
+        self._trajectory = None if keep_last else Trajectory(file_name, "w")
+
+    def __len__(self):
+        """Return the number of frames added so far."""
+        return self.n_frames
+
+    def append(self, frame: Atoms) -> None:
+        """
+        Add the next frame of the relaxation.
+
+        Parameters
+        ----------
+        frame: Atoms
+            The frame, with its 'energy' and 'enthalpy' info.
+        """
+        frame.set_constraint()
+        frame.info["RSS_minim_iter"] = self.n_frames
+        frame.info["config_type"] = self.config_type
+        if self.keep_last:
+            if (
+                self.lowest_frame is None
+                or frame.info["enthalpy"] < self.lowest_frame.info["enthalpy"]
+            ):
+                self.lowest_frame = frame
+        elif (
+            self.last_frames
+            and self.last_frames[-1].info["RSS_minim_iter"] % self.interval == 0
+        ):
+            # written one frame late, so the last frame can get the 'minim_stat'
+            self._trajectory.write(self.last_frames[-1])
+        self.last_frames.append(frame)
+        self.n_frames += 1
+
+    def close(self, converged: bool, abort_reason: str | None = None) -> str | None:
+        """
+        Write the remaining frames and close the file.
+
+        Parameters
+        ----------
+        converged: bool
+            Whether the relaxation converged.
+        abort_reason: str | None
+            If the relaxation was aborted early, the reason.
+
+        Returns
+        -------
+        str | None
+            Path of the trajectory file if the relaxation converged, otherwise None.
+        """
+        minim_stat = "converged" if converged else "unconverged"
+        if abort_reason is not None:
+            minim_stat = "aborted"
+            self.last_frames[-1].info["RSS_abort_reason"] = abort_reason
+        if self.keep_last:
+            frames = {id(frame): frame for frame in self.last_frames}
+            frames.setdefault(id(self.lowest_frame), self.lowest_frame)
+            frames = sorted(
+                frames.values(), key=lambda frame: frame.info["RSS_minim_iter"]
+            )
+            self._trajectory = Trajectory(self.file_name, "w")
+        else:
+            frames = list(self.last_frames)
+
+        for frame in frames:
+            frame.info["minim_stat"] = minim_stat
+            self._trajectory.write(frame)
+        self._trajectory.close()
+        del frames[-1].info["minim_stat"]
+        frames[-1].info["config_type"] = minim_stat + "_minimum"
+
+        if converged:
+            return os.path.join(Path.cwd(), self.file_name)
+        return None
+
+    def abort(self) -> None:
+        """Close and remove the file of a failed relaxation."""
+        if self._trajectory is not None:
+            self._trajectory.close()
+        with suppress(FileNotFoundError):
+            os.remove(self.file_name)
+
+
+class RelaxationAborted(Exception):
+    """Raised by an optimizer callback to stop an unproductive RSS relaxation."""
+
+
+class EnthalpyRecord:
+    """
+    A running record of the lowest enthalpy per atom of the converged minima of an RSS run.
+
+    The minima are recorded per composition and pressure. The entries can be stored
+    in a list of a 'multiprocessing.Manager' to share the record between the workers
+    of a pool.
+
+    Parameters
+    ----------
+    entries: list | None
+        Storage of the recorded minima, e.g. a list proxy of a 'multiprocessing.Manager'.
+    """
+
+    def __init__(self, entries: list | None = None):
+        self.entries = [] if entries is None else entries
+        self._n_synced = 0
+        self._best: dict[tuple[str, int], float] = {}
+
+    def __getstate__(self):
+        """Drop the local copy of the record when sending it to a worker."""
+        state = self.__dict__.copy()
+        state.update({"_n_synced": 0, "_best": {}})
+        return state
+
+    def _sync(self) -> None:
+        """Fetch the minima recorded by other workers."""
+        new_entries = list(self.entries[self._n_synced :])
+        self._n_synced += len(new_entries)
+        for key, enthalpy_per_atom in new_entries:
+            if enthalpy_per_atom < self._best.get(key, np.inf):
+                self._best[key] = enthalpy_per_atom
+
+    def add(self, key: tuple[str, int], enthalpy_per_atom: float) -> None:
+        """
+        Record a converged minimum if it is the lowest one of its key.
+
+        Parameters
+        ----------
+        key: tuple[str, int]
+            The composition and pressure bin of the minimum.
+        enthalpy_per_atom: float
+            Its enthalpy per atom in eV/atom.
+        """
+        self._sync()
+        if enthalpy_per_atom < self._best.get(key, np.inf):
+            self.entries.append((key, enthalpy_per_atom))
+
+    def get(self, key: tuple[str, int]) -> float | None:
+        """
+        Look up the lowest enthalpy per atom recorded for a key.
+
+        Parameters
+        ----------
+        key: tuple[str, int]
+            The composition and pressure bin.
+
+        Returns
+        -------
+        float | None
+            The lowest enthalpy per atom in eV/atom, or None if nothing was recorded.
+        """
+        self._sync()
+        return self._best.get(key)
+
+
+class EarlyAbortMonitor:
+    """
+    Detect RSS relaxations that are unlikely to end in a useful minimum.
+
+    The monitor is called for every frame of a relaxation and returns the reason to
+    abort it, if any. Relaxations are aborted if
+
+    - their enthalpy per atom is more than 'enthalpy_margin' above the lowest
+      enthalpy per atom of a converged minimum of the same composition found so far
+      at a pressure within the same bin of width 'pressure_tol',
+    - their volume per atom leaves 'volume_range',
+    - their maximum force has not dropped below 'stagnation_factor' times its
+      value 'stagnation_steps' steps before, or
+    - two atoms come closer than 'min_distance'.
+
+    The enthalpy and stagnation criteria only apply after 'min_steps' steps.
+
+    Parameters
+    ----------
+    enthalpy_margin: float | None
+        Enthalpy per atom above the best converged minimum in eV/atom.
+    volume_range: tuple[float, float] | None
+        Lower and upper bound of the volume per atom in A^3.
+    stagnation_steps: int | None
+        Number of steps over which the maximum force has to decrease.
+    stagnation_factor: float
+        Factor by which the maximum force has to decrease.
+    min_distance: float | None
+        Minimum interatomic distance in A.
+    min_steps: int
+        Number of steps before the enthalpy and stagnation criteria apply.
+    pressure_tol: float
+        Width of the bins of the applied pressure in GPa within which enthalpies
+        are compared.
+    enthalpy_record: EnthalpyRecord | None
+        The converged minima of the RSS run. If None, only the minima recorded with
+        this monitor are used.
+    """
+
+    def __init__(
+        self,
+        enthalpy_margin: float | None = None,
+        volume_range: tuple[float, float] | None = None,
+        stagnation_steps: int | None = None,
+        stagnation_factor: float = 0.9,
+        min_distance: float | None = None,
+        min_steps: int = 20,
+        pressure_tol: float = 1.0,
+        enthalpy_record: EnthalpyRecord | None = None,
+    ):
+        self.enthalpy_margin = enthalpy_margin
+        self.volume_range = volume_range
+        self.stagnation_steps = stagnation_steps
+        self.stagnation_factor = stagnation_factor
+        self.min_distance = min_distance
+        self.min_steps = min_steps
+        self.pressure_tol = pressure_tol
+        self.enthalpy_record = (
+            EnthalpyRecord() if enthalpy_record is None else enthalpy_record
+        )
+        self.fmax_history: list[float] = []
+
+    @classmethod
+    def from_dict(
+        cls, params: dict | None, enthalpy_record: EnthalpyRecord | None = None
+    ) -> "EarlyAbortMonitor | None":
+        """
+        Create a monitor from a dictionary of criteria.
+
+        Parameters
+        ----------
+        params: dict | None
+            Keyword arguments of the monitor. If None or empty, no monitor is created.
+        enthalpy_record: EnthalpyRecord | None
+            The converged minima of the RSS run.
+
+        Returns
+        -------
+        EarlyAbortMonitor | None
+            The monitor.
+        """
+        return cls(**params, enthalpy_record=enthalpy_record) if params else None
+
+    def _key(self, atoms: Atoms) -> tuple[str, int]:
+        """Return the composition and pressure bin of a structure."""
+        pressure = atoms.info.get("RSS_applied_pressure", 0.0)
+        return (
+            atoms.get_chemical_formula(empirical=True),
+            round(pressure / self.pressure_tol),
+        )
+
+    def record_minimum(self, atoms: Atoms, enthalpy: float) -> None:
+        """
+        Record the enthalpy of a converged minimum.
+
+        Parameters
+        ----------
+        atoms: Atoms
+            The minimum, with its 'RSS_applied_pressure' info in GPa.
+        enthalpy: float
+            Its enthalpy in eV.
+        """
+        self.enthalpy_record.add(self._key(atoms), enthalpy / len(atoms))
+
+    def check(self, atoms: Atoms, enthalpy: float) -> str | None:
+        """
+        Check the current frame of a relaxation.
+
+        Parameters
+        ----------
+        atoms: Atoms
+            The structure with its forces calculated.
+        enthalpy: float
+            Its enthalpy in eV.
+
+        Returns
+        -------
+        str | None
+            The reason to abort the relaxation, or None to continue.
+        """
+        step = len(self.fmax_history)
+        self.fmax_history.append(np.sqrt((atoms.get_forces() ** 2).sum(axis=1).max()))
+
+        if self.volume_range is not None:
+            volume_per_atom = atoms.get_volume() / len(atoms)
+            if not self.volume_range[0] <= volume_per_atom <= self.volume_range[1]:
+                return f"volume of {volume_per_atom:.2f} A^3/atom out of bounds"
+
+        if self.min_distance is not None and len(atoms) > 1:
+            distances = neighbor_list("d", atoms, self.min_distance)
+            if len(distances) > 0:
+                return f"interatomic distance of {distances.min():.2f} A"
+
+        if step < self.min_steps:
+            return None
+
+        if self.enthalpy_margin is not None:
+            best = self.enthalpy_record.get(self._key(atoms))
+            excess = enthalpy / len(atoms) - best if best is not None else -np.inf
+            if excess > self.enthalpy_margin:
+                return f"enthalpy of {excess:.3f} eV/atom above the best minimum"
+
+        if (
+            self.stagnation_steps is not None
+            and step >= self.stagnation_steps
+            and self.fmax_history[-1]
+            > self.stagnation_factor * self.fmax_history[-1 - self.stagnation_steps]
+        ):
+            return f"maximum force stagnated at {self.fmax_history[-1]:.3f} eV/A"
+
+        return None
+
+
+class MinimaIndex:
+    """
+    An online index of the minima found by an RSS run.
+
+    Every converged minimum is added with a fingerprint, a normalised Gaussian-smeared
+    histogram of its interatomic distances weighted by their inverse square. Relaxations that come close to an indexed
+    minimum of the same composition and a similar enthalpy are stopped early as
+    duplicates, and the hit is recorded. The entries can be stored in lists of a
+    'multiprocessing.Manager' to share the index between the workers of a pool.
+
+    Parameters
+    ----------
+    entries: list | None
+        Storage of the minima, e.g. a list proxy of a 'multiprocessing.Manager'.
+    hits: list | None
+        Storage of the duplicate hits, e.g. a list proxy of a 'multiprocessing.Manager'.
+    cutoff: float
+        Cutoff of the interatomic distances in A.
+    n_bins: int
+        Number of points of the distance histogram.
+    smearing: float
+        Width of the Gaussians of the distance histogram in A.
+    fingerprint_tol: float
+        Maximum Euclidean distance of two fingerprints of the same minimum.
+    enthalpy_tol: float
+        Maximum enthalpy difference of two structures of the same minimum in eV/atom.
+    check_interval: int
+        Number of optimizer steps between two checks of a relaxing structure.
+    fmax_threshold: float
+        Only check relaxing structures with a maximum force below this value in eV/A.
+    """
+
+    def __init__(
+        self,
+        entries: list | None = None,
+        hits: list | None = None,
+        cutoff: float = 6.0,
+        n_bins: int = 60,
+        smearing: float = 0.2,
+        fingerprint_tol: float = 0.1,
+        enthalpy_tol: float = 0.01,
+        check_interval: int = 10,
+        fmax_threshold: float = 0.5,
+    ):
+        self.entries = [] if entries is None else entries
+        self.hits = [] if hits is None else hits
+        self.cutoff = cutoff
+        self.n_bins = n_bins
+        self.smearing = smearing
+        self.fingerprint_tol = fingerprint_tol
+        self.enthalpy_tol = enthalpy_tol
+        self.check_interval = check_interval
+        self.fmax_threshold = fmax_threshold
+        self._n_synced = 0
+        self._minima: dict[str, tuple[list, list, list]] = {}
+        self._trees: dict[str, cKDTree] = {}
+
+    def __getstate__(self):
+        """Drop the local search trees when sending the index to a worker."""
+        state = self.__dict__.copy()
+        state.update({"_n_synced": 0, "_minima": {}, "_trees": {}})
+        return state
+
+    def fingerprint(self, atoms: Atoms) -> np.ndarray:
+        """
+        Calculate the fingerprint of a structure.
+
+        Parameters
+        ----------
+        atoms: Atoms
+            The structure.
+
+        Returns
+        -------
+        np.ndarray
+            The normalised distance histogram.
+        """
+        grid = np.linspace(0, self.cutoff, self.n_bins)
+        distances = neighbor_list("d", atoms, self.cutoff + 3 * self.smearing)
+        histogram = (
+            np.exp(-0.5 * ((grid - distances[:, None]) / self.smearing) ** 2)
+            / distances[:, None] ** 2
+        ).sum(axis=0)
+        norm = np.linalg.norm(histogram)
+        return histogram / norm if norm > 0 else histogram
+
+    def _sync(self) -> None:
+        """Fetch the minima added by other workers and rebuild the changed trees."""
+        new_entries = list(self.entries[self._n_synced :])
+        self._n_synced += len(new_entries)
+        for key, formula, enthalpy, fingerprint in new_entries:
+            keys, enthalpies, fingerprints = self._minima.setdefault(
+                formula, ([], [], [])
+            )
+            keys.append(key)
+            enthalpies.append(enthalpy)
+            fingerprints.append(fingerprint)
+            self._trees.pop(formula, None)
+
+    def find(self, atoms: Atoms, enthalpy: float) -> str | None:
+        """
+        Look up the indexed minimum a structure belongs to.
+
+        Parameters
+        ----------
+        atoms: Atoms
+            The structure.
+        enthalpy: float
+            Its enthalpy in eV.
+
+        Returns
+        -------
+        str | None
+            The key of the matching minimum, or None if there is none.
+        """
+        self._sync()
+        formula = atoms.get_chemical_formula(empirical=True)
+        if formula not in self._minima:
+            return None
+
+        keys, enthalpies, fingerprints = self._minima[formula]
+        if formula not in self._trees:
+            self._trees[formula] = cKDTree(np.array(fingerprints))
+        candidates = self._trees[formula].query_ball_point(
+            self.fingerprint(atoms), self.fingerprint_tol
+        )
+        enthalpy_per_atom = enthalpy / len(atoms)
+        for candidate in sorted(candidates):
+            if abs(enthalpies[candidate] - enthalpy_per_atom) < self.enthalpy_tol:
+                return keys[candidate]
+        return None
+
+    def add(self, atoms: Atoms, enthalpy: float, key: str) -> str | None:
+        """
+        Add a converged minimum, unless it is a duplicate of an indexed one.
+
+        Parameters
+        ----------
+        atoms: Atoms
+            The minimum.
+        enthalpy: float
+            Its enthalpy in eV.
+        key: str
+            Key of the minimum, e.g. its 'unique_starting_index'.
+
+        Returns
+        -------
+        str | None
+            The key of the matching minimum if it is a duplicate, otherwise None.
+        """
+        duplicate_of = self.find(atoms, enthalpy)
+        if duplicate_of is not None:
+            self.hits.append((duplicate_of, key))
+            return duplicate_of
+
+        self.entries.append(
+            (
+                key,
+                atoms.get_chemical_formula(empirical=True),
+                enthalpy / len(atoms),
+                self.fingerprint(atoms),
+            )
+        )
+        return None
+
+    def check(self, atoms: Atoms, enthalpy: float, step: int, key: str) -> str | None:
+        """
+        Check a relaxing structure for a duplicate and record the hit.
+
+        Parameters
+        ----------
+        atoms: Atoms
+            The structure with its forces calculated.
+        enthalpy: float
+            Its enthalpy in eV.
+        step: int
+            The optimizer step.
+        key: str
+            Key of the relaxation, e.g. its 'unique_starting_index'.
+
+        Returns
+        -------
+        str | None
+            The reason to stop the relaxation, or None to continue.
+        """
+        if step % self.check_interval != 0:
+            return None
+        if (atoms.get_forces() ** 2).sum(axis=1).max() > self.fmax_threshold**2:
+            return None
+
+        duplicate_of = self.find(atoms, enthalpy)
+        if duplicate_of is None:
+            return None
+        self.hits.append((duplicate_of, key))
+        return f"duplicate of minimum {duplicate_of}"
+
+    def summary(self) -> dict:
+        """
+        Summarise the minima found so far.
+
+        Returns
+        -------
+        dict
+            The number of unique minima, the number of duplicate hits and the number
+            of hits of each minimum.
+        """
+        hits_per_minimum: dict[str, int] = {}
+        for duplicate_of, _ in list(self.hits):
+            hits_per_minimum[duplicate_of] = hits_per_minimum.get(duplicate_of, 0) + 1
+        return {
+            "n_unique_minima": len(self.entries),
+            "n_duplicates": len(self.hits),
+            "hits_per_minimum": hits_per_minimum,
+        }
+
+
 def process_rss(
     atom: Atoms,
     mlip_type: str,
@@ -324,6 +1315,13 @@ def process_rss(
     isolated_atom_energies: dict[int, float] | None = None,
     config_type: str = "traj",
     keep_symmetry: bool = True,
+    calculator: Calculator | None = None,
+    stream_traj: bool = False,
+    traj_interval: int = 1,
+    traj_keep_last: int | None = None,
+    early_abort: dict | None = None,
+    minima_index: MinimaIndex | None = None,
+    enthalpy_record: EnthalpyRecord | None = None,
 ) -> str | None:
     """Run RSS on a single thread using MLIPs.
 
@@ -355,189 +1353,775 @@ def process_rss(
         Force residual tolerance for relaxation. Default is 0.01.
     stress_tol: float
         Stress residual tolerance for relaxation. Default is 0.01.
-    hookean_repul: bool
-        If true, apply Hookean repulsion. Default is False.
-    hookean_paras: dict[tuple[int, int], tuple[float, float]]
-        Parameters for Hookean repulsion as a dictionary of tuples. Default is None.
+    hookean_repul: bool
+        If true, apply Hookean repulsion. Default is False.
+    hookean_paras: dict[tuple[int, int], tuple[float, float]]
+        Parameters for Hookean repulsion as a dictionary of tuples. Default is None.
+    write_traj: bool
+        If true, write trajectory of RSS. Default is True.
+    device: str
+        Specify the device to use: "cuda" or "cpu".
+    isolated_atom_energies: dict
+        Dictionary of isolated atoms energies.
+    config_type: str
+        Specify the type of configurations generated from RSS.
+    keep_symmetry: bool
+        If true, preserve symmetry during relaxation.
+    calculator: Calculator | None
+        An already loaded calculator of the MLIP. If None, the MLIP is loaded
+        from 'mlip_path'.
+    stream_traj: bool
+        If true, stream the trajectory to a binary '.traj' file while relaxing
+        instead of keeping all frames in memory and writing an extxyz file.
+    traj_interval: int
+        With 'stream_traj', only write every 'traj_interval'-th frame.
+    traj_keep_last: int | None
+        With 'stream_traj', only keep the last 'traj_keep_last' frames and the
+        frame of lowest enthalpy.
+    early_abort: dict | None
+        Criteria to abort unproductive relaxations early, passed as keyword
+        arguments to 'EarlyAbortMonitor', e.g. {"enthalpy_margin": 1.0,
+        "min_distance": 0.5}. Aborted relaxations are written with the
+        'minim_stat' 'aborted' and their reason.
+    minima_index: MinimaIndex | None
+        Index of the minima found so far. Relaxations that reach one of them are
+        stopped as duplicates and converged minima are added to it.
+    enthalpy_record: EnthalpyRecord | None
+        The converged minima of the RSS run for the enthalpy criterion of
+        'early_abort'.
+
+    Returns
+    -------
+    str | None
+        Output string containing path for the results of the RSS relaxation.
+    """
+    pot = (
+        calculator
+        if calculator is not None
+        else load_mlip_calculator(
+            mlip_type,
+            mlip_path,
+            device=device,
+            isolated_atom_energies=isolated_atom_energies,
+        )
+    )
+
+    unique_starting_index = atom.info["unique_starting_index"]
+    log_file = output_file_name + "_" + str(unique_starting_index) + ".log"
+    set_rss_constraints(atom, hookean_repul, hookean_paras, keep_symmetry)
+
+    atom.calc = pot
+
+    scalar_pressure_tmp = sample_scalar_pressure(
+        scalar_pressure_method,
+        scalar_exp_pressure,
+        scalar_pressure_exponential_width,
+        scalar_pressure_low,
+        scalar_pressure_high,
+    )
+    atom.info["RSS_applied_pressure"] = scalar_pressure_tmp / GPa
+    atom = UnitCellFilter(atom, scalar_pressure=scalar_pressure_tmp)
+    traj = (
+        RSSTrajectoryWriter(
+            output_file_name + "_traj_" + str(unique_starting_index) + ".traj",
+            interval=traj_interval,
+            keep_last=traj_keep_last,
+            config_type=config_type,
+        )
+        if write_traj and stream_traj
+        else []
+    )
+
+    monitor = EarlyAbortMonitor.from_dict(early_abort, enthalpy_record)
+
+    try:
+        optimizer = PreconLBFGS(
+            atom, precon=Exp(3), use_armijo=True, logfile=log_file, master=True
+        )
+
+        def build_traj():
+            atom_copy = atom.copy()
+            atom_copy.info["energy"] = atom.atoms.get_potential_energy()
+            atom_copy.info["enthalpy"] = atom.get_potential_energy().copy()
+            traj.append(atom_copy)
+            if monitor is not None:
+                reason = monitor.check(atom.atoms, atom_copy.info["enthalpy"])
+                if reason is not None:
+                    raise RelaxationAborted(reason)
+            if minima_index is not None:
+                reason = minima_index.check(
+                    atom.atoms,
+                    atom_copy.info["enthalpy"],
+                    len(traj) - 1,
+                    unique_starting_index,
+                )
+                if reason is not None:
+                    raise RelaxationAborted(reason)
+
+        abort_reason = None
+        try:
+            optimizer.attach(build_traj)
+            optimizer.run(fmax=force_tol, smax=stress_tol, steps=max_steps)
+            converged = optimizer.converged()
+        except RelaxationAborted as exc:
+            abort_reason = str(exc)
+            converged = False
+            print(f"Relaxation {unique_starting_index} aborted: {abort_reason}")
+
+        if converged:
+            if monitor is not None:
+                monitor.record_minimum(atom.atoms, atom.get_potential_energy())
+            if minima_index is not None:
+                minima_index.add(
+                    atom.atoms, atom.get_potential_energy(), unique_starting_index
+                )
+
+        if isinstance(traj, RSSTrajectoryWriter):
+            return traj.close(converged, abort_reason=abort_reason)
+        return finalize_rss_trajectory(
+            traj,
+            converged,
+            output_file_name=output_file_name,
+            write_traj=write_traj,
+            config_type=config_type,
+            abort_reason=abort_reason,
+        )
+
+    except RuntimeError:
+        print("RuntimeError occurred during optimization! Return none!")
+        if isinstance(traj, RSSTrajectoryWriter):
+            traj.abort()
+        return None
+
+
+class CalculatorBatchEvaluator:
+    """
+    Evaluate a batch of structures with an ASE calculator, one structure at a time.
+
+    This is the fallback for MLIPs without a batched model interface. The
+    relaxation of the batch is still advanced in lockstep by 'relax_structures_batched'.
+
+    Parameters
+    ----------
+    calculator: Calculator
+        The calculator of the MLIP.
+    """
+
+    def __init__(self, calculator: Calculator):
+        self.calculator = calculator
+
+    def __call__(self, atoms: list[Atoms]) -> list[dict | None]:
+        """
+        Evaluate the energy, forces and stress of a batch of structures.
+
+        Parameters
+        ----------
+        atoms: list[Atoms]
+            The structures to evaluate. Their constraints are ignored.
+
+        Returns
+        -------
+        list[dict | None]
+            The 'energy', 'forces' and Voigt 'stress' of each structure, or None
+            if the evaluation failed.
+        """
+        results: list[dict | None] = []
+        for atom in atoms:
+            atom_copy = Atoms(
+                atom.numbers, positions=atom.positions, cell=atom.cell, pbc=atom.pbc
+            )
+            atom_copy.calc = self.calculator
+            try:
+                results.append(
+                    {
+                        "energy": atom_copy.get_potential_energy(),
+                        "forces": atom_copy.get_forces(),
+                        "stress": atom_copy.get_stress(),
+                    }
+                )
+            except RuntimeError:
+                print("RuntimeError occurred during the evaluation! Return none!")
+                results.append(None)
+        return results
+
+
+class MACEBatchEvaluator:
+    """
+    Evaluate a batch of structures with one MACE model call.
+
+    All structures are packed into a single graph batch, so a GPU is kept busy
+    even if each structure is small.
+
+    Parameters
+    ----------
+    calculator: MACECalculator
+        The MACE calculator that holds the models.
+    """
+
+    def __init__(self, calculator: MACECalculator):
+        self.calculator = calculator
+
+    def __call__(self, atoms: list[Atoms]) -> list[dict | None]:
+        """
+        Evaluate the energy, forces and stress of a batch of structures.
+
+        Parameters
+        ----------
+        atoms: list[Atoms]
+            The structures to evaluate. Their constraints are ignored.
+
+        Returns
+        -------
+        list[dict | None]
+            The 'energy', 'forces' and Voigt 'stress' of each structure.
+        """
+        calc = self.calculator
+        key_specification = mace_data.KeySpecification(
+            info_keys={}, arrays_keys={"charges": calc.charges_key}
+        )
+        data_loader = torch_geometric.dataloader.DataLoader(
+            dataset=[
+                mace_data.AtomicData.from_config(
+                    mace_data.config_from_atoms(
+                        atom, key_specification=key_specification, head_name=calc.head
+                    ),
+                    z_table=calc.z_table,
+                    cutoff=calc.r_max,
+                    heads=calc.available_heads,
+                )
+                for atom in atoms
+            ],
+            batch_size=len(atoms),
+            shuffle=False,
+            drop_last=False,
+        )
+        batch = next(iter(data_loader)).to(calc.device)
+
+        energies, forces, stresses = [], [], []
+        for model in calc.models:
+            out = model(batch.clone().to_dict(), compute_stress=True, training=False)
+            energies.append(out["energy"].detach())
+            forces.append(out["forces"].detach())
+            stresses.append(out["stress"].detach())
+
+        energies = (
+            torch.stack(energies).mean(dim=0).cpu().numpy() * calc.energy_units_to_eV
+        )
+        forces = (
+            torch.stack(forces).mean(dim=0).cpu().numpy()
+            * calc.energy_units_to_eV
+            / calc.length_units_to_A
+        )
+        stresses = (
+            torch.stack(stresses).mean(dim=0).cpu().numpy()
+            * calc.energy_units_to_eV
+            / calc.length_units_to_A**3
+        )
+
+        return [
+            {
+                "energy": float(energy),
+                "forces": atom_forces.astype(float),
+                "stress": full_3x3_to_voigt_6_stress(stress).astype(float),
+            }
+            for energy, atom_forces, stress in zip(
+                energies,
+                np.split(forces, batch.ptr.cpu().numpy()[1:-1]),
+                stresses,
+            )
+        ]
+
+
+def load_batch_evaluator(
+    mlip_type: str,
+    mlip_path: str | list[str],
+    device: str = "cpu",
+    isolated_atom_energies: dict[int, float] | None = None,
+) -> CalculatorBatchEvaluator | MACEBatchEvaluator:
+    """
+    Load the batch evaluator of an MLIP for 'relax_structures_batched'.
+
+    MACE models evaluate a whole batch in one model call, the other MLIPs are
+    evaluated one structure at a time.
+
+    Parameters
+    ----------
+    mlip_type: str
+        Choose one specific MLIP type:
+        'GAP' | 'J-ACE' | 'NequIP' | 'M3GNet' | 'MACE'.
+    mlip_path: str | list[str]
+        Path to the MLIP model or List of Path to the MLIP model.
+    device: str
+        Specify the device to use: "cuda" or "cpu".
+    isolated_atom_energies: dict
+        Dictionary of isolated atoms energies.
+
+    Returns
+    -------
+    CalculatorBatchEvaluator | MACEBatchEvaluator
+        The batch evaluator.
+    """
+    calculator = load_mlip_calculator(
+        mlip_type,
+        mlip_path,
+        device=device,
+        isolated_atom_energies=isolated_atom_energies,
+    )
+    if mlip_type == "MACE":
+        return MACEBatchEvaluator(calculator)
+    return CalculatorBatchEvaluator(calculator)
+
+
+def _batch_fire_step(
+    forces: np.ndarray,
+    velocities: np.ndarray,
+    offsets: np.ndarray,
+    dt: np.ndarray,
+    alpha: np.ndarray,
+    n_pos: np.ndarray,
+    started: np.ndarray,
+    maxstep: float = 0.2,
+    dtmax: float = 1.0,
+    n_min: int = 5,
+    finc: float = 1.1,
+    fdec: float = 0.5,
+    astart: float = 0.1,
+    fa: float = 0.99,
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Advance a batch of structures by one FIRE step.
+
+    The generalised coordinates of all structures are packed into one array and each
+    structure has its own time step and mixing parameter, as in ASE's FIRE.
+
+    Parameters
+    ----------
+    forces: np.ndarray
+        Packed generalised forces of all structures, shape (n_rows, 3).
+    velocities: np.ndarray
+        Packed velocities of all structures, shape (n_rows, 3).
+    offsets: np.ndarray
+        First row of each structure in the packed arrays.
+    dt, alpha, n_pos, started: np.ndarray
+        Time step, mixing parameter, number of downhill steps and whether the
+        structure has made a step before, per structure. Updated in place.
+    maxstep, dtmax, n_min, finc, fdec, astart, fa:
+        FIRE parameters, with the defaults of ASE.
+
+    Returns
+    -------
+    tuple[np.ndarray, np.ndarray]
+        The new packed velocities and the displacements.
+    """
+    row = np.repeat(np.arange(len(offsets)), np.diff(np.append(offsets, len(forces))))
+    vf = np.add.reduceat((forces * velocities).sum(axis=1), offsets)
+    vv = np.add.reduceat((velocities**2).sum(axis=1), offsets)
+    ff = np.add.reduceat((forces**2).sum(axis=1), offsets)
+
+    downhill = started & (vf > 0)
+    uphill = started & ~downhill
+    mix = np.where(downhill, alpha * np.sqrt(vv) / np.sqrt(np.where(ff > 0, ff, 1)), 0)
+    keep = np.where(downhill, 1 - alpha, np.where(uphill, 0, 1))
+    velocities = keep[row, None] * velocities + mix[row, None] * forces
+
+    accelerate = downhill & (n_pos > n_min)
+    dt[accelerate] = np.minimum(dt[accelerate] * finc, dtmax)
+    alpha[accelerate] *= fa
+    n_pos[downhill] += 1
+    dt[uphill] *= fdec
+    alpha[uphill] = astart
+    n_pos[uphill] = 0
+    started[:] = True
+
+    velocities = velocities + dt[row, None] * forces
+    displacements = dt[row, None] * velocities
+    norm = np.sqrt(np.add.reduceat((displacements**2).sum(axis=1), offsets))
+    scale = np.where(norm > maxstep, maxstep / np.where(norm > 0, norm, 1), 1)
+
+    return velocities, scale[row, None] * displacements
+
+
+def relax_structures_batched(
+    atoms: list[Atoms],
+    evaluator: Callable[[list[Atoms]], list[dict | None]],
+    batch_size: int = 32,
+    max_steps: int = 1000,
+    force_tol: float = 0.01,
+    stress_tol: float = 0.01,
+    output_file_name: str = "RSS_relax_results",
+    write_traj: bool = True,
+    config_type: str = "traj",
+    stream_traj: bool = False,
+    traj_interval: int = 1,
+    traj_keep_last: int | None = None,
+    early_abort: dict | None = None,
+    minima_index: MinimaIndex | None = None,
+    enthalpy_record: EnthalpyRecord | None = None,
+    on_result: Callable[[int, str | None], None] | None = None,
+) -> list[str | None]:
+    """
+    Relax many structures in lockstep with one batched MLIP call per step.
+
+    Up to 'batch_size' structures are relaxed at once with a vectorised FIRE
+    optimizer under a unit cell filter and their scalar pressure. Converged and
+    unconverged structures are retired after each step, written like in
+    'process_rss', and replaced by the next structures of the queue.
+
+    Parameters
+    ----------
+    atoms: list[Atoms]
+        Structures to relax, with their constraints set and the 'unique_starting_index'
+        and 'RSS_applied_pressure' (in GPa) info.
+    evaluator: Callable[[list[Atoms]], list[dict | None]]
+        Returns the 'energy', 'forces' and Voigt 'stress' of a batch of structures,
+        e.g. from 'load_batch_evaluator'.
+    batch_size: int
+        Maximum number of structures relaxed at once.
+    max_steps: int
+        Maximum number of steps for relaxation. Default is 1000.
+    force_tol: float
+        Force residual tolerance for relaxation. Default is 0.01.
+    stress_tol: float
+        Stress residual tolerance for relaxation. Default is 0.01.
+    output_file_name: str
+        Prefix for the trajectory file name.
     write_traj: bool
         If true, write trajectory of RSS. Default is True.
-    device: str
-        Specify the device to use: "cuda" or "cpu".
-    isolated_atom_energies: dict
-        Dictionary of isolated atoms energies.
     config_type: str
         Specify the type of configurations generated from RSS.
-    keep_symmetry: bool
-        If true, preserve symmetry during relaxation.
+    stream_traj: bool
+        If true, stream the trajectories to binary '.traj' files while relaxing
+        instead of keeping all frames in memory and writing extxyz files.
+    traj_interval: int
+        With 'stream_traj', only write every 'traj_interval'-th frame.
+    traj_keep_last: int | None
+        With 'stream_traj', only keep the last 'traj_keep_last' frames and the
+        frame of lowest enthalpy.
+    early_abort: dict | None
+        Criteria to abort unproductive relaxations early, passed as keyword
+        arguments to 'EarlyAbortMonitor', e.g. {"enthalpy_margin": 1.0,
+        "min_distance": 0.5}. Aborted relaxations are written with the
+        'minim_stat' 'aborted' and their reason.
+    minima_index: MinimaIndex | None
+        Index of the minima found so far. Relaxations that reach one of them are
+        stopped as duplicates and converged minima are added to it.
+    enthalpy_record: EnthalpyRecord | None
+        The converged minima of the RSS run for the enthalpy criterion of
+        'early_abort'.
+
+    on_result: Callable[[int, str | None], None] | None
+        Called with the index and the result of every structure as soon as its
+        relaxation has finished.
 
     Returns
     -------
-    str | None
-        Output string containing path for the results of the RSS relaxation.
+    list[str | None]
+        Path of the trajectory file of each converged structure, None otherwise.
     """
-    if hookean_paras is not None:
-        hookean_paras = {
-            ast.literal_eval(k) if isinstance(k, str) else k: v
-            for k, v in hookean_paras.items()
-        }
+    results: list[str | None] = [None] * len(atoms)
+    queue = list(range(len(atoms)))[::-1]
+    active: list[dict] = []
+    velocities: list[np.ndarray] = []
+    dt, alpha = np.zeros(0), np.zeros(0)
+    n_pos, started = np.zeros(0, dtype=int), np.zeros(0, dtype=bool)
+
+    while queue or active:
+        while queue and len(active) < batch_size:
+            index = queue.pop()
+            cell_filter = UnitCellFilter(
+                atoms[index],
+                scalar_pressure=atoms[index].info["RSS_applied_pressure"] * GPa,
+            )
+            traj = (
+                RSSTrajectoryWriter(
+                    output_file_name
+                    + "_traj_"
+                    + str(atoms[index].info["unique_starting_index"])
+                    + ".traj",
+                    interval=traj_interval,
+                    keep_last=traj_keep_last,
+                    config_type=config_type,
+                )
+                if write_traj and stream_traj
+                else []
+            )
+            active.append(
+                {
+                    "index": index,
+                    "filter": cell_filter,
+                    "traj": traj,
+                    "monitor": EarlyAbortMonitor.from_dict(
+                        early_abort, enthalpy_record
+                    ),
+                }
+            )
+            velocities.append(np.zeros((len(cell_filter), 3)))
+            dt, alpha = np.append(dt, 0.1), np.append(alpha, 0.1)
+            n_pos, started = np.append(n_pos, 0), np.append(started, False)
+
+        evaluated = evaluator([state["filter"].atoms for state in active])
+
+        keep = np.ones(len(active), dtype=bool)
+        forces = []
+        for k, (state, result) in enumerate(zip(active, evaluated)):
+            if result is None:
+                if isinstance(state["traj"], RSSTrajectoryWriter):
+                    state["traj"].abort()
+                if on_result is not None:
+                    on_result(state["index"], None)
+                keep[k] = False
+                continue
+
+            cell_filter = state["filter"]
+            atom = cell_filter.atoms
+            atom.calc = SinglePointCalculator(
+                atom, free_energy=result["energy"], **result
+            )
+            filter_forces = cell_filter.get_forces()
+
+            atom_copy = cell_filter.copy()
+            atom_copy.info["energy"] = atom.get_potential_energy()
+            atom_copy.info["enthalpy"] = cell_filter.get_potential_energy()
+            state["traj"].append(atom_copy)
+
+            fmax_sq = (filter_forces[: len(atom)] ** 2).sum(axis=1).max()
+            smax_sq = (cell_filter.stress**2).max()
+            converged = fmax_sq < force_tol**2 and smax_sq < stress_tol**2
+            abort_reason = (
+                state["monitor"].check(atom, atom_copy.info["enthalpy"])
+                if state["monitor"] is not None and not converged
+                else None
+            )
+            if abort_reason is None and minima_index is not None and not converged:
+                abort_reason = minima_index.check(
+                    atom,
+                    atom_copy.info["enthalpy"],
+                    len(state["traj"]) - 1,
+                    atom.info["unique_starting_index"],
+                )
+            if abort_reason is not None:
+                print(
+                    f"Relaxation {atom.info['unique_starting_index']} "
+                    f"aborted: {abort_reason}"
+                )
+            if converged:
+                if state["monitor"] is not None:
+                    state["monitor"].record_minimum(atom, atom_copy.info["enthalpy"])
+                if minima_index is not None:
+                    minima_index.add(
+                        atom,
+                        atom_copy.info["enthalpy"],
+                        atom.info["unique_starting_index"],
+                    )
 
-    mlip_path = mlip_path[0] if isinstance(mlip_path, list) else mlip_path
+            if converged or abort_reason or len(state["traj"]) > max_steps:
+                results[state["index"]] = (
+                    state["traj"].close(converged, abort_reason=abort_reason)
+                    if isinstance(state["traj"], RSSTrajectoryWriter)
+                    else finalize_rss_trajectory(
+                        state["traj"],
+                        converged,
+                        output_file_name=output_file_name,
+                        write_traj=write_traj,
+                        config_type=config_type,
+                        abort_reason=abort_reason,
+                    )
+                )
+                if on_result is not None:
+                    on_result(state["index"], results[state["index"]])
+                keep[k] = False
+                continue
+
+            forces.append(filter_forces)
+
+        active = [state for state, kept in zip(active, keep) if kept]
+        velocities = [v for v, kept in zip(velocities, keep) if kept]
+        dt, alpha, n_pos, started = dt[keep], alpha[keep], n_pos[keep], started[keep]
+        if not active:
+            continue
+
+        sizes = [len(v) for v in velocities]
+        offsets = np.cumsum([0, *sizes[:-1]])
+        packed_velocities, displacements = _batch_fire_step(
+            np.concatenate(forces),
+            np.concatenate(velocities),
+            offsets,
+            dt,
+            alpha,
+            n_pos,
+            started,
+        )
+        velocities = np.split(packed_velocities, offsets[1:])
+        for state, displacement in zip(active, np.split(displacements, offsets[1:])):
+            cell_filter = state["filter"]
+            cell_filter.set_positions(cell_filter.get_positions() + displacement)
 
-    if mlip_type == "GAP":
-        gap_label = os.path.join(mlip_path, "gap_file.xml")
-        gap_control = "Potential xml_label=" + extract_gap_label(gap_label)
-        pot = CustomPotential(args_str=gap_control, param_filename=gap_label)
+    return results
 
-    elif mlip_type == "J-ACE":
-        from ase.calculators.lammpslib import LAMMPSlib  # noqa
 
-        try:
-            from lammps import lammps  # noqa
+def prepare_rss_atoms(
+    structures: list[Structure], iteration_index: str, struct_start_index: int = 0
+) -> list[Atoms]:
+    """
+    Convert the starting structures of an RSS iteration into labelled ASE Atoms.
 
-            lmp = lammps()
-            if "ML-PACE" not in lmp.installed_packages:
-                raise RuntimeError(
-                    "To use RSS flow with J-ACE potential, it needs LAMMPS compiled with"
-                    "lammps-user-pace library. ML-PACE is not found in the current LAMMPS binary installation."
-                    "Please follow the instructions in the autoplex documentation to install"
-                    "LAMMPS with the required packages. Link to the documentation: "
-                    " https://autoatml.github.io/autoplex/user/index.html#lammps-installation"
-                )
-        except Exception as exc:
-            raise RuntimeError(
-                "To use RSS flow with J-ACE potential, it needs LAMMPS compiled with"
-                "python bindings and lammps-user-pace. Please follow the instructions in"
-                "the autoplex documentation to install LAMMPS with the required packages. "
-                "Link to the documentation:"
-                " https://autoatml.github.io/autoplex/user/index.html#lammps-installation"
-            ) from exc
+    Parameters
+    ----------
+    structures: list[Structure]
+        List of structures to be relaxed.
+    iteration_index: str
+        Index for the current iteration.
+    struct_start_index: int
+        Specify the starting index within a list
 
-        ace_label = os.path.join(mlip_path, "acemodel.yace")
-        ace_json = os.path.join(mlip_path, "acemodel.json")
-        ace_table = os.path.join(mlip_path, "acemodel_pairpot.table")
+    Returns
+    -------
+    list[Atoms]
+        The structures with their 'unique_starting_index' info.
+    """
+    atoms = [AseAtomsAdaptor().get_atoms(structure) for structure in structures]
+    for at in atoms:
+        if "virial" in at.info:
+            del at.info["virial"]
 
-        atom_types, cmds = extract_pairstyle(ace_label, ace_json, ace_table)
+    for i, atom in enumerate(atoms):
+        atom.info["unique_starting_index"] = iteration_index + f"{i+struct_start_index}"
 
-        pot = LAMMPSlib(
-            lmpcmds=cmds, atom_types=atom_types, log_file="test.log", keep_alive=True
-        )
+    return atoms
 
-    elif mlip_type == "NEQUIP":
-        nequip_label = os.path.join(mlip_path, "deployed_nequip_model.pth")
-        if isolated_atom_energies:
-            ele_syms = [
-                chemical_symbols[int(e_num)] for e_num in isolated_atom_energies
-            ]
 
-        else:
-            raise ValueError("isol_es is empty or not defined!")
-        pot = NequIPCalculator.from_deployed_model(
-            model_path=nequip_label,
-            device=device,
-            species_to_type_name={s: s for s in ele_syms},
-            set_global_options=False,
-        )
+class FileTaskQueue:
+    """
+    A queue of RSS starting structures in a shared directory.
 
-    elif mlip_type == "M3GNET":
-        pot_file = matgl.load_model(path=mlip_path)
-        pot = M3GNetCalculator(potential=pot_file)
+    Several jobs, e.g. on different nodes, pull structures from the same queue until
+    it is empty, so nodes that finish their relaxations early keep working instead of
+    idling. A task is claimed by renaming its file, which is atomic on POSIX file
+    systems, so every structure is relaxed only once. The result of every task is
+    written as soon as it is completed.
 
-    elif mlip_type == "MACE":
-        mace_label = os.path.join(mlip_path, "checkpoints/MACE_model_run-123.model")
-        pot = MACECalculator(model_paths=mace_label, device=device)
+    Parameters
+    ----------
+    path: str | Path
+        Directory of the queue.
+    """
 
-    unique_starting_index = atom.info["unique_starting_index"]
-    log_file = output_file_name + "_" + str(unique_starting_index) + ".log"
-    constraint_list = []
-    if hookean_repul and hookean_paras:
-        atom_num = atom.get_atomic_numbers()
-        for i in range(len(atom_num)):
-            for j in range(i + 1, len(atom_num)):
-                if (
-                    (atom_num[i], atom_num[j]) in hookean_paras
-                    and hookean_paras[(atom_num[i], atom_num[j])][0] != 0
-                    and hookean_paras[(atom_num[i], atom_num[j])][1] != 0
-                ):
-                    # print(f"Hookean repulsion is used for {atom_num[i]}-{atom_num[j]}!")
-                    constraint_list.append(
-                        HookeanRepulsion(
-                            i, j, *hookean_paras[(atom_num[i], atom_num[j])]
-                        )
-                    )
-                elif (
-                    (atom_num[j], atom_num[i]) in hookean_paras
-                    and hookean_paras[(atom_num[j], atom_num[i])][0] != 0
-                    and hookean_paras[(atom_num[j], atom_num[i])][1] != 0
-                ):
-                    # print(f"Hookean repulsion is used for {atom_num[j]}-{atom_num[i]}!")
-                    constraint_list.append(
-                        HookeanRepulsion(
-                            i, j, *hookean_paras[(atom_num[j], atom_num[i])]
-                        )
-                    )
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+        self.pending_dir = self.path / "pending"
+        self.claimed_dir = self.path / "claimed"
+        self.done_dir = self.path / "done"
 
-    if keep_symmetry:
-        print("Creating FixSymmetry calculator and maintaining initial symmetry!")
-        constraint_list.append(FixSymmetry(atom, symprec=1.0e-4))
+    @classmethod
+    def create(cls, path: str | Path, atoms: list[Atoms]) -> "FileTaskQueue":
+        """
+        Create a queue with one task per structure.
 
-    if constraint_list:
-        atom.set_constraint(constraint_list)
+        Parameters
+        ----------
+        path: str | Path
+            Directory of the queue.
+        atoms: list[Atoms]
+            The structures to relax.
+
+        Returns
+        -------
+        FileTaskQueue
+            The queue.
+        """
+        queue = cls(path)
+        for directory in (queue.pending_dir, queue.claimed_dir, queue.done_dir):
+            directory.mkdir(parents=True, exist_ok=True)
 
-    atom.calc = pot
+        # pickled, as extxyz would turn a string index like '1_1' into an integer
+        for i, atom in enumerate(atoms):
+            task_file = queue.pending_dir / f"{i:08d}.pkl"
+            tmp_file = queue.path / f"{task_file.name}.tmp"
+            with open(tmp_file, "wb") as file:
+                pickle.dump(atom, file)
+            os.replace(tmp_file, task_file)
 
-    if scalar_pressure_method == "exp":
-        scalar_pressure_tmp = scalar_exp_pressure * GPa
-        if scalar_pressure_exponential_width > 0.0:
-            scalar_pressure_tmp *= np.random.exponential(
-                scalar_pressure_exponential_width
-            )
-    elif scalar_pressure_method == "uniform":
-        scalar_pressure_tmp = (
-            np.random.uniform(low=scalar_pressure_low, high=scalar_pressure_high) * GPa
-        )
-    atom.info["RSS_applied_pressure"] = scalar_pressure_tmp / GPa
-    atom = UnitCellFilter(atom, scalar_pressure=scalar_pressure_tmp)
+        return queue
 
-    try:
-        optimizer = PreconLBFGS(
-            atom, precon=Exp(3), use_armijo=True, logfile=log_file, master=True
-        )
-        traj = []
+    def claim(self) -> tuple[str, Atoms] | None:
+        """
+        Claim the next pending task.
 
-        def build_traj():
-            atom_copy = atom.copy()
-            atom_copy.info["energy"] = atom.atoms.get_potential_energy()
-            atom_copy.info["enthalpy"] = atom.get_potential_energy().copy()
-            traj.append(atom_copy)
+        Returns
+        -------
+        tuple[str, Atoms] | None
+            The name and the structure of the task, or None if the queue is empty.
+        """
+        for task_name in sorted(os.listdir(self.pending_dir)):
+            try:
+                os.rename(self.pending_dir / task_name, self.claimed_dir / task_name)
+            except FileNotFoundError:
+                # claimed by another job in the meantime
+                continue
+            with open(self.claimed_dir / task_name, "rb") as file:
+                return task_name, pickle.load(file)
+
+        return None
 
-        optimizer.attach(build_traj)
-        optimizer.run(fmax=force_tol, smax=stress_tol, steps=max_steps)
+    def complete(self, task_name: str, result: str | None) -> None:
+        """
+        Record the result of a claimed task.
 
-        minim_stat = "converged" if optimizer.converged() else "unconverged"
+        Parameters
+        ----------
+        task_name: str
+            Name of the task.
+        result: str | None
+            Result of the relaxation.
+        """
+        tmp_file = self.done_dir / f"{task_name}.tmp"
+        with open(tmp_file, "w") as file:
+            json.dump({"result": result}, file)
+        os.replace(tmp_file, self.done_dir / f"{task_name}.json")
+        os.remove(self.claimed_dir / task_name)
 
-        for traj_at_i, traj_at in enumerate(traj):
-            traj_at.info["RSS_minim_iter"] = traj_at_i
-            traj_at.info["config_type"] = config_type
-            traj_at.info["minim_stat"] = minim_stat
+    def release(self, task_name: str) -> None:
+        """
+        Put a claimed task back into the queue, e.g. after its job failed.
 
-        if write_traj:
-            traj_file_name = (
-                output_file_name + "_traj_" + str(unique_starting_index) + ".extxyz"
-            )
-            ase.io.write(traj_file_name, traj, parallel=False)
-        del traj[-1].info["minim_stat"]
-        traj[-1].info["config_type"] = minim_stat + "_minimum"
+        Parameters
+        ----------
+        task_name: str
+            Name of the task.
+        """
+        os.rename(self.claimed_dir / task_name, self.pending_dir / task_name)
 
-        local_minima = traj[-1]
+    def results(self) -> dict[str, str | None]:
+        """
+        Read the results of all completed tasks.
 
-        if local_minima.info["config_type"] == "converged_minimum":
-            dir_path = Path.cwd()
-            return os.path.join(dir_path, traj_file_name)
-        return None
+        Returns
+        -------
+        dict[str, str | None]
+            The result of each completed task, keyed by task name.
+        """
+        results = {}
+        for result_file in sorted(self.done_dir.glob("*.json")):
+            with open(result_file) as file:
+                results[result_file.stem] = json.load(file)["result"]
+        return results
 
-    except RuntimeError:
-        print("RuntimeError occurred during optimization! Return none!")
-        return None
+
+def _run_rss_task(task: tuple, worker: Callable) -> tuple:
+    """Relax the structure of a (key, structure) task and return it with the key."""
+    key, atom = task
+    return key, worker(atom)
+
+
+def _write_minima_summary(minima_index: MinimaIndex, output_file_name: str) -> None:
+    """Report the unique minima and duplicates found by an RSS run."""
+    summary = minima_index.summary()
+    print(
+        f"Found {summary['n_unique_minima']} unique minima and "
+        f"{summary['n_duplicates']} duplicates"
+    )
+    with open(output_file_name + "_minima.json", "w") as file:
+        json.dump(summary, file, indent=2)
 
 
 def minimize_structures(
@@ -563,6 +2147,14 @@ def minimize_structures(
     config_type: str = "traj",
     struct_start_index: int = 0,
     keep_symmetry: bool = True,
+    persistent_workers: bool = True,
+    batch_size: int | None = None,
+    task_queue: str | None = None,
+    stream_traj: bool = False,
+    traj_interval: int = 1,
+    traj_keep_last: int | None = None,
+    early_abort: dict | None = None,
+    duplicate_detection: dict | None = None,
 ) -> list[str | None]:
     """Run RSS in parallel.
 
@@ -613,49 +2205,235 @@ def minimize_structures(
         Specify the starting index within a list
     keep_symmetry: bool
         If true, preserve symmetry during relaxation.
+    persistent_workers: bool
+        If true, each worker process loads the MLIP once and relaxes all of its
+        structures with it. Otherwise, the MLIP is loaded for every structure.
+    batch_size: int | None
+        If set, relax up to this many structures at once in the current process
+        with one batched MLIP call per step, e.g. on a GPU, instead of one
+        structure per worker process. This uses a FIRE optimizer.
+    task_queue: str | None
+        Directory of a shared 'FileTaskQueue'. If set, structures are pulled from
+        the queue until it is empty, in addition to 'structures'.
+    stream_traj: bool
+        If true, stream the trajectories to binary '.traj' files while relaxing
+        instead of keeping all frames in memory and writing extxyz files.
+    traj_interval: int
+        With 'stream_traj', only write every 'traj_interval'-th frame.
+    traj_keep_last: int | None
+        With 'stream_traj', only keep the last 'traj_keep_last' frames and the
+        frame of lowest enthalpy.
+    early_abort: dict | None
+        Criteria to abort unproductive relaxations early, passed as keyword
+        arguments to 'EarlyAbortMonitor', e.g. {"enthalpy_margin": 1.0,
+        "min_distance": 0.5}. Aborted relaxations are written with the
+        'minim_stat' 'aborted' and their reason.
+    duplicate_detection: dict | None
+        If set, stop relaxations that reach an already found minimum, with the
+        parameters of 'MinimaIndex' as keyword arguments, e.g. {"enthalpy_tol": 0.01}.
+        The number of unique minima and duplicates is written to
+        '<output_file_name>_minima.json'.
 
     Returns
     -------
     list
         Output list[str] containing paths for the results of the RSS relaxation.
     """
-    atoms = [AseAtomsAdaptor().get_atoms(structure) for structure in structures]
-    for at in atoms:
-        if "virial" in at.info:
-            del at.info["virial"]
+    atoms = prepare_rss_atoms(structures, iteration_index, struct_start_index)
+    queue = FileTaskQueue(task_queue) if task_queue is not None else None
 
     if hookean_repul:
         print("Hookean repulsion is used!")
 
-    for i, atom in enumerate(atoms):
-        atom.info["unique_starting_index"] = iteration_index + f"{i+struct_start_index}"
+    manager = None
+    minima_index = None
+    if duplicate_detection and batch_size:
+        minima_index = MinimaIndex(**duplicate_detection)
+    elif duplicate_detection:
+        # the index is shared between the worker processes
+        manager = Manager()
+        minima_index = MinimaIndex(
+            entries=manager.list(), hits=manager.list(), **duplicate_detection
+        )
 
-    minimize_worker = partial(
-        process_rss,
-        mlip_type=mlip_type,
-        mlip_path=mlip_path,
-        output_file_name=output_file_name,
-        scalar_pressure_method=scalar_pressure_method,
-        scalar_exp_pressure=scalar_exp_pressure,
-        scalar_pressure_exponential_width=scalar_pressure_exponential_width,
-        scalar_pressure_low=scalar_pressure_low,
-        scalar_pressure_high=scalar_pressure_high,
-        max_steps=max_steps,
-        force_tol=force_tol,
-        stress_tol=stress_tol,
-        hookean_repul=hookean_repul,
-        hookean_paras=hookean_paras,
-        write_traj=write_traj,
-        device=device,
-        isolated_atom_energies=isolated_atom_energies,
-        config_type=config_type,
-        keep_symmetry=keep_symmetry,
-    )
+    # the best minima of the enthalpy criterion are kept for this call only
+    enthalpy_record = None
+    if early_abort and early_abort.get("enthalpy_margin") is not None:
+        if batch_size:
+            enthalpy_record = EnthalpyRecord()
+        else:
+            manager = manager or Manager()
+            enthalpy_record = EnthalpyRecord(entries=manager.list())
+
+    # tasks claimed from the shared queue that are not completed yet
+    claimed: set[str] = set()
+    if batch_size:
+        evaluator = load_batch_evaluator(
+            mlip_type,
+            mlip_path,
+            device=device,
+            isolated_atom_energies=isolated_atom_energies,
+        )
+
+        def relax_batch(
+            batch: list[Atoms], on_result: Callable | None = None
+        ) -> list[str | None]:
+            for atom in batch:
+                set_rss_constraints(atom, hookean_repul, hookean_paras, keep_symmetry)
+                atom.info["RSS_applied_pressure"] = (
+                    sample_scalar_pressure(
+                        scalar_pressure_method,
+                        scalar_exp_pressure,
+                        scalar_pressure_exponential_width,
+                        scalar_pressure_low,
+                        scalar_pressure_high,
+                    )
+                    / GPa
+                )
+            return relax_structures_batched(
+                batch,
+                evaluator,
+                batch_size=batch_size,
+                max_steps=max_steps,
+                force_tol=force_tol,
+                stress_tol=stress_tol,
+                output_file_name=output_file_name,
+                write_traj=write_traj,
+                config_type=config_type,
+                stream_traj=stream_traj,
+                traj_interval=traj_interval,
+                traj_keep_last=traj_keep_last,
+                early_abort=early_abort,
+                minima_index=minima_index,
+                enthalpy_record=enthalpy_record,
+                on_result=on_result,
+            )
+
+        def complete_task(tasks: list[tuple], index: int, result: str | None) -> None:
+            task_name = tasks[index][0]
+            queue.complete(task_name, result)
+            claimed.discard(task_name)
 
-    with threadpool_limits(limits=1), Pool(processes=num_processes_rss) as pool:
-        results = pool.map(minimize_worker, atoms)
+        try:
+            results = relax_batch(atoms) if atoms else []
+            while queue is not None:
+                tasks = []
+                while len(tasks) < batch_size and (task := queue.claim()) is not None:
+                    tasks.append(task)
+                    claimed.add(task[0])
+                if not tasks:
+                    break
+                # every task is completed as soon as its relaxation has finished
+                results.extend(
+                    relax_batch(
+                        [atom for _, atom in tasks], partial(complete_task, tasks)
+                    )
+                )
+        except BaseException:
+            # unfinished tasks of the shared queue are left to the other jobs
+            for task_name in claimed:
+                queue.release(task_name)
+            raise
+
+        if minima_index is not None:
+            _write_minima_summary(minima_index, output_file_name)
+        return results
+
+    rss_kwargs = {
+        "mlip_type": mlip_type,
+        "mlip_path": mlip_path,
+        "output_file_name": output_file_name,
+        "scalar_pressure_method": scalar_pressure_method,
+        "scalar_exp_pressure": scalar_exp_pressure,
+        "scalar_pressure_exponential_width": scalar_pressure_exponential_width,
+        "scalar_pressure_low": scalar_pressure_low,
+        "scalar_pressure_high": scalar_pressure_high,
+        "max_steps": max_steps,
+        "force_tol": force_tol,
+        "stress_tol": stress_tol,
+        "hookean_repul": hookean_repul,
+        "hookean_paras": hookean_paras,
+        "write_traj": write_traj,
+        "device": device,
+        "isolated_atom_energies": isolated_atom_energies,
+        "config_type": config_type,
+        "keep_symmetry": keep_symmetry,
+        "stream_traj": stream_traj,
+        "traj_interval": traj_interval,
+        "traj_keep_last": traj_keep_last,
+        "early_abort": early_abort,
+        "minima_index": minima_index,
+        "enthalpy_record": enthalpy_record,
+    }
+
+    if persistent_workers:
+        # the MLIP is loaded once per worker instead of once per structure
+        pool_kwargs = {
+            "initializer": _init_rss_worker,
+            "initargs": (mlip_type, mlip_path, device, isolated_atom_energies),
+        }
+        minimize_worker = partial(_process_rss_worker, **rss_kwargs)
+    else:
+        pool_kwargs = {}
+        minimize_worker = partial(process_rss, **rss_kwargs)
+
+    def next_task() -> tuple | None:
+        task = next(tasks, None)
+        if task is None and queue is not None:
+            task = queue.claim()
+        return task
+
+    tasks = enumerate(atoms)
+    results = {}
+    # the callbacks of the pool report finished tasks and errors to this thread
+    finished: SimpleQueue = SimpleQueue()
+    try:
+        with (
+            threadpool_limits(limits=1),
+            Pool(processes=num_processes_rss, **pool_kwargs) as pool,
+        ):
+            # a task is only handed out, or claimed from the shared queue, when a
+            # worker becomes free, as relaxation times vary a lot
+            in_flight = 0
+            while True:
+                while in_flight < num_processes_rss and (task := next_task()):
+                    if isinstance(task[0], str):
+                        claimed.add(task[0])
+                    pool.apply_async(
+                        _run_rss_task,
+                        (task, minimize_worker),
+                        callback=finished.put,
+                        error_callback=finished.put,
+                    )
+                    in_flight += 1
+                if in_flight == 0:
+                    break
 
-    return list(results)
+                outcome = finished.get()
+                in_flight -= 1
+                if isinstance(outcome, BaseException):
+                    raise outcome
+                key, result = outcome
+                results[key] = result
+                if isinstance(key, str):
+                    queue.complete(key, result)
+                    claimed.discard(key)
+    except BaseException:
+        # unfinished tasks of the shared queue are left to the other jobs
+        for task_name in claimed:
+            queue.release(task_name)
+        if manager is not None:
+            manager.shutdown()
+        raise
+
+    if minima_index is not None:
+        _write_minima_summary(minima_index, output_file_name)
+    if manager is not None:
+        manager.shutdown()
+
+    return [results[i] for i in range(len(atoms))] + [
+        results[key] for key in sorted(key for key in results if isinstance(key, str))
+    ]
 
 
 def split_structure_into_groups(structures: list, num_groups: int) -> list[list]:
@@ -684,3 +2462,459 @@ def split_structure_into_groups(structures: list, num_groups: int) -> list[list]
         start_index += group_size
 
     return structure_groups
+
+
+class _CellList:
+    """
+    A cell list of the atoms placed in a periodic cell for fast overlap checks.
+
+    The cell is divided into bins whose perpendicular widths are at least the largest
+    minimum separation, so only atoms in the neighbouring bins and their periodic
+    images have to be checked for a new position.
+
+    Parameters
+    ----------
+    cell: np.ndarray
+        The cell vectors as rows.
+    minsep: np.ndarray
+        Minimum separations between the species in A.
+    """
+
+    def __init__(self, cell: np.ndarray, minsep: np.ndarray):
+        self.cell = cell
+        self.inv_cell = np.linalg.inv(cell)
+        self.minsep = minsep
+        widths = 1 / np.linalg.norm(self.inv_cell, axis=0)
+        cutoff = max(minsep.max(), 1e-8)
+        self.n_bins = np.maximum(1, np.floor(widths / cutoff)).astype(int)
+        reach = np.ceil(cutoff * self.n_bins / widths).astype(int)
+        self.offsets = np.array(list(product(*(range(-r, r + 1) for r in reach))))
+        self.bins: dict[tuple, list[int]] = {}
+        self.positions: list[np.ndarray] = []
+        self.species: list[int] = []
+
+    def _bin(self, position: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """Wrap a position into the cell and return it with its bin."""
+        scaled = (position @ self.inv_cell) % 1.0
+        bin_index = np.minimum((scaled * self.n_bins).astype(int), self.n_bins - 1)
+        return scaled @ self.cell, bin_index
+
+    def too_close(self, position: np.ndarray, species: int, factor: float) -> bool:
+        """
+        Check if a position is closer to any placed atom than its minimum separation.
+
+        Parameters
+        ----------
+        position: np.ndarray
+            Cartesian position of the new atom.
+        species: int
+            Species index of the new atom.
+        factor: float
+            Factor applied to the minimum separations.
+
+        Returns
+        -------
+        bool
+            True if the position overlaps with a placed atom or one of its images.
+        """
+        position, bin_index = self._bin(position)
+        neighbours = []
+        shifts = []
+        for target in bin_index + self.offsets:
+            for j in self.bins.get(tuple(target % self.n_bins), ()):
+                neighbours.append(j)
+                shifts.append(target // self.n_bins)
+        if not neighbours:
+            return False
+
+        vectors = (
+            np.array([self.positions[j] for j in neighbours])
+            + np.array(shifts) @ self.cell
+            - position
+        )
+        limits = factor * self.minsep[np.array(self.species)[neighbours], species]
+        return bool(np.any(np.linalg.norm(vectors, axis=1) < limits))
+
+    def add(self, position: np.ndarray, species: int) -> None:
+        """Place an atom."""
+        position, bin_index = self._bin(position)
+        self.bins.setdefault(tuple(bin_index), []).append(len(self.positions))
+        self.positions.append(position)
+        self.species.append(species)
+
+    def pop(self, n: int = 1) -> None:
+        """Remove the last n placed atoms."""
+        for _ in range(n):
+            position = self.positions.pop()
+            self.species.pop()
+            self.bins[tuple(self._bin(position)[1])].pop()
+
+
+class RandomCellGenerator:
+    """
+    A native generator of random structures from a 'buildcell' seed.
+
+    It supports the buildcell options used by autoplex, so random structures can be
+    generated without the AIRSS binary. The options are read from the '#KEY=VALUE'
+    lines of the seed, fragments from its 'POSITIONS_ABS' block:
+
+    - SPECIES, e.g. 'Si%NUM=1,O%NUM=2', and fragments with '# <label> % NUM=<n>'
+    - NFORM, the number of formula units, e.g. '2', '1-4' or '{2,4,6,8}'
+    - NATOM, the total number of atoms, e.g. '{6,8,10}'. It takes precedence over
+      NFORM and must be a multiple of the number of atoms per formula unit.
+    - TARGVOL or VARVOL, the volume per formula unit in A^3, e.g. '20-25'
+    - VARVOL_RANGE, a range of factors the volume is scaled by, e.g. '0.75 1.25'
+    - MINSEP, e.g. '1.5 Si-Si=1.76 Si-O=1.408'
+    - SLACK and OVERLAP, the fractions by which the minimum separations are relaxed
+      for atoms and fragments, respectively
+    - SYMMOPS, e.g. '1-2'. Two or more operations place single atoms in inversion
+      symmetric pairs, higher symmetries are not generated.
+    - COMPACT, which has no effect as the random cells are never strongly skewed
+
+    Other options raise a ValueError unless they are switched off, e.g. 'OCTET=False'.
+    Atoms are placed at random positions with a cell list rejecting overlaps, so the
+    cost per atom does not grow with the size of the cell.
+
+    Parameters
+    ----------
+    seed: str
+        Contents of the buildcell seed file.
+    max_attempts: int
+        Number of random positions tried for each atom or fragment before a cell is
+        discarded.
+    max_cells: int
+        Number of random cells tried for a structure before giving up.
+    """
+
+    def __init__(self, seed: str, max_attempts: int = 1000, max_cells: int = 100):
+        self.max_attempts = max_attempts
+        self.max_cells = max_cells
+        self.options: dict[str, str] = {}
+        fragments: dict[str, list] = {}
+        in_block = False
+        for raw_line in seed.splitlines():
+            line = raw_line.strip()
+            if line.upper().startswith("%BLOCK POSITIONS_ABS"):
+                in_block = True
+            elif line.upper().startswith("%ENDBLOCK"):
+                in_block = False
+            elif in_block and line:
+                atom, _, label = line.partition("#")
+                label, _, num = label.partition("%")
+                symbol, *position = atom.split()
+                fragment = fragments.setdefault(
+                    label.strip() or f"{symbol}{len(fragments)}", [[], [], 1]
+                )
+                fragment[0].append(symbol)
+                fragment[1].append([float(x) for x in position])
+                if "NUM=" in num.upper():
+                    fragment[2] = int(num.upper().split("NUM=")[1].split()[0])
+            elif line.startswith("#"):
+                key, _, value = line.lstrip("#").partition("=")
+                self.options[key.strip().upper()] = value.strip()
+
+        # units are placed as a whole, larger fragments first
+        self.units = [
+            (symbols, np.array(positions) - np.mean(positions, axis=0), num)
+            for symbols, positions, num in fragments.values()
+        ]
+        for species in filter(None, self.options.get("SPECIES", "").split(",")):
+            symbol, _, num = species.partition("%")
+            num = num.upper().split("NUM=")[1] if "NUM=" in num.upper() else "1"
+            self.units.append(([symbol.strip()], np.zeros((1, 3)), int(num)))
+        if not self.units:
+            raise ValueError(
+                "The buildcell seed defines neither SPECIES nor fragments."
+            )
+        self.units.sort(key=lambda unit: -len(unit[0]))
+
+        self.symbols = sorted({s for unit in self.units for s in unit[0]})
+        self.formula_atoms = sum(len(unit[0]) * unit[2] for unit in self.units)
+        self._check_options()
+
+    SUPPORTED_OPTIONS: ClassVar[set[str]] = {
+        "SPECIES",
+        "NFORM",
+        "NATOM",
+        "TARGVOL",
+        "VARVOL",
+        "VARVOL_RANGE",
+        "MINSEP",
+        "SLACK",
+        "OVERLAP",
+        "SYMMOPS",
+        "COMPACT",
+    }
+
+    def _check_options(self) -> None:
+        """Raise a ValueError for options that are not supported or cannot be read."""
+        unsupported = [
+            key
+            for key, value in self.options.items()
+            if key not in self.SUPPORTED_OPTIONS
+            and value.lower() not in ("false", "f", "0")
+        ]
+        if unsupported:
+            raise ValueError(
+                f"The native generator does not support the buildcell options "
+                f"{unsupported}, use buildcell instead."
+            )
+
+        for key in ("NFORM", "NATOM", "SYMMOPS"):
+            if self.options.get(key):
+                self._parse(key, self.options[key], integer=True)
+        for key in ("TARGVOL", "VARVOL", "SLACK", "OVERLAP"):
+            if self.options.get(key):
+                self._parse(key, self.options[key])
+        if self.options.get("VARVOL_RANGE"):
+            self._parse("VARVOL_RANGE", self._varvol_range())
+        for minsep in self.options.get("MINSEP", "").split():
+            self._parse("MINSEP", minsep.rpartition("=")[2])
+
+        if self.options.get("NATOM"):
+            natoms = self._parse("NATOM", self.options["NATOM"], integer=True)
+            if not any(
+                natom % self.formula_atoms == 0 for natom in self._values(natoms)
+            ):
+                raise ValueError(
+                    f"NATOM={self.options['NATOM']} contains no multiple of the "
+                    f"{self.formula_atoms} atoms per formula unit."
+                )
+
+    @staticmethod
+    def _parse(key: str, value: str, integer: bool = False) -> tuple[str, list]:
+        """Read a value like '2', a range like '1-4' or a set like '{2,4,6}'."""
+        convert = int if integer else float
+        try:
+            if value.startswith("{") and value.endswith("}"):
+                return "set", [convert(v) for v in value[1:-1].split(",")]
+            low, _, high = value.partition("-")
+            if not high:
+                return "set", [convert(low)]
+            return "range", [convert(low), convert(high)]
+        except ValueError:
+            raise ValueError(
+                f"Cannot read the buildcell option {key}={value}"
+            ) from None
+
+    @staticmethod
+    def _values(spec: tuple[str, list]) -> list:
+        """List all values of a parsed integer option."""
+        kind, values = spec
+        return values if kind == "set" else list(range(values[0], values[1] + 1))
+
+    @classmethod
+    def _sample(
+        cls,
+        value: str,
+        rng: np.random.Generator,
+        integer: bool = False,
+        key: str = "",
+    ):
+        """Draw a number from a value like '2', a range like '1-4' or a set."""
+        kind, values = cls._parse(key, value, integer)
+        if kind == "set":
+            return values[int(rng.integers(len(values)))]
+        if integer:
+            return int(rng.integers(values[0], values[1], endpoint=True))
+        return float(rng.uniform(values[0], values[1]))
+
+    def _nform(self, rng: np.random.Generator) -> int:
+        """Draw the number of formula units, from NATOM if it is given."""
+        if not self.options.get("NATOM"):
+            return self._sample(
+                self.options.get("NFORM") or "1", rng, integer=True, key="NFORM"
+            )
+
+        natoms = [
+            natom
+            for natom in self._values(
+                self._parse("NATOM", self.options["NATOM"], integer=True)
+            )
+            if natom % self.formula_atoms == 0
+        ]
+        return natoms[int(rng.integers(len(natoms)))] // self.formula_atoms
+
+    def _varvol_range(self) -> str:
+        """Return VARVOL_RANGE, given as e.g. '0.75 1.25', as a range '0.75-1.25'."""
+        return "-".join(self.options["VARVOL_RANGE"].split())
+
+    def _formula_volume(self, rng: np.random.Generator) -> float:
+        """Draw the volume per formula unit."""
+        for key in ("TARGVOL", "VARVOL"):
+            if self.options.get(key):
+                volume = self._sample(self.options[key], rng, key=key)
+                break
+        else:
+            volume = 0.0
+            for symbols, _, num in self.units:
+                for symbol in symbols:
+                    factor = 5.5 if Element(symbol).is_metal else 14.5
+                    volume += num * factor * covalent_radii[atomic_numbers[symbol]] ** 3
+
+        if self.options.get("VARVOL_RANGE"):
+            volume *= self._sample(self._varvol_range(), rng, key="VARVOL_RANGE")
+        return volume
+
+    def _minsep(self, rng: np.random.Generator) -> np.ndarray:
+        """Draw the minimum separations between the species."""
+        default, *pairs = self.options.get("MINSEP", "1.5").split()
+        minsep = np.full(
+            (len(self.symbols),) * 2, self._sample(default, rng, key="MINSEP")
+        )
+        for pair in pairs:
+            species, _, value = pair.partition("=")
+            symbol1, symbol2 = species.split("-")
+            if symbol1 in self.symbols and symbol2 in self.symbols:
+                i, j = self.symbols.index(symbol1), self.symbols.index(symbol2)
+                minsep[i, j] = minsep[j, i] = self._sample(value, rng, key="MINSEP")
+        return minsep
+
+    @staticmethod
+    def _random_cell(volume: float, rng: np.random.Generator) -> np.ndarray:
+        """Draw a random cell of the given volume that is not too thin."""
+        while True:
+            lengths = rng.uniform(1.0, 2.0, 3)
+            cos_angles = np.cos(np.radians(rng.uniform(60, 120, 3)))
+            if 1 - np.sum(cos_angles**2) + 2 * np.prod(cos_angles) <= 0.01:
+                continue
+            cell = cellpar_to_cell(
+                np.concatenate([lengths, np.degrees(np.arccos(cos_angles))])
+            )
+            cell *= (volume / abs(np.linalg.det(cell))) ** (1 / 3)
+            widths = 1 / np.linalg.norm(np.linalg.inv(cell), axis=0)
+            if widths.min() >= 0.5 * volume ** (1 / 3):
+                return cell
+
+    def _place(
+        self,
+        cell_list: _CellList,
+        orbit: list[np.ndarray],
+        species: list[int],
+        factor: float,
+    ) -> bool:
+        """
+        Place a fragment or a symmetry orbit of atoms if it does not overlap.
+
+        The atoms of a fragment are only checked against the placed atoms, while the
+        atoms of a symmetry orbit are also checked against each other.
+        """
+        if len(species) > 1:
+            if any(
+                cell_list.too_close(position, species_index, factor)
+                for position, species_index in zip(orbit, species)
+            ):
+                return False
+            for position, species_index in zip(orbit, species):
+                cell_list.add(position, species_index)
+            return True
+
+        for n_placed, position in enumerate(orbit):
+            if cell_list.too_close(position, species[0], factor):
+                cell_list.pop(n_placed)
+                return False
+            cell_list.add(position, species[0])
+        return True
+
+    def _fill_cell(
+        self,
+        cell: np.ndarray,
+        nform: int,
+        inversion: bool,
+        minsep: np.ndarray,
+        slack: float,
+        overlap: float,
+        rng: np.random.Generator,
+    ) -> Atoms | None:
+        """Place all atoms in a cell, or return None if it is too crowded."""
+        if Cell(cell).minkowski_reduce()[0].lengths().min() < np.diag(minsep).max() * (
+            1 - slack
+        ):
+            return None
+
+        cell_list = _CellList(cell, minsep)
+        centres = [np.array(c) @ cell for c in product((0.0, 0.5), repeat=3)]
+        rng.shuffle(centres)
+        for symbols, positions, num in self.units:
+            species = [self.symbols.index(s) for s in symbols]
+            if len(symbols) > 1:
+                factor, n_pairs, n_centres = 1 - overlap, 0, 0
+                n_singles = num * nform
+            elif inversion:
+                factor, n_singles = 1 - slack, 0
+                n_pairs, n_centres = divmod(num * nform, 2)
+            else:
+                factor, n_pairs, n_centres = 1 - slack, 0, 0
+                n_singles = num * nform
+
+            for _ in range(n_singles):
+                for _ in range(self.max_attempts):
+                    origin = rng.random(3) @ cell
+                    rotated = Rotation.random(random_state=rng).apply(positions)
+                    if self._place(cell_list, list(origin + rotated), species, factor):
+                        break
+                else:
+                    return None
+
+            for _ in range(n_pairs):
+                for _ in range(self.max_attempts):
+                    position = rng.random(3) @ cell
+                    if self._place(cell_list, [position, -position], species, factor):
+                        break
+                else:
+                    return None
+
+            for _ in range(n_centres):
+                for i, centre in enumerate(centres):
+                    if self._place(cell_list, [centre], species, factor):
+                        del centres[i]
+                        break
+                else:
+                    return None
+
+        return Atoms(
+            symbols=[self.symbols[i] for i in cell_list.species],
+            positions=np.array(cell_list.positions),
+            cell=cell,
+            pbc=True,
+        )
+
+    def generate(self, rng: np.random.Generator | None = None) -> Atoms | None:
+        """
+        Generate a random structure.
+
+        Parameters
+        ----------
+        rng: np.random.Generator | None
+            Random number generator. A new one is created if None.
+
+        Returns
+        -------
+        Atoms | None
+            The random structure, or None if no cell could be filled.
+        """
+        rng = np.random.default_rng() if rng is None else rng
+        nform = self._nform(rng)
+        symmops = self._sample(
+            self.options.get("SYMMOPS") or "1", rng, integer=True, key="SYMMOPS"
+        )
+        volume = self._formula_volume(rng) * nform
+        minsep = self._minsep(rng)
+        slack = self._sample(self.options.get("SLACK") or "0", rng, key="SLACK")
+        overlap = self._sample(self.options.get("OVERLAP") or "0", rng, key="OVERLAP")
+        # inversion symmetry is only used for single atoms
+        inversion = symmops >= 2 and all(len(unit[0]) == 1 for unit in self.units)
+
+        for _ in range(self.max_cells):
+            atoms = self._fill_cell(
+                self._random_cell(volume, rng),
+                nform,
+                inversion,
+                minsep,
+                slack,
+                overlap,
+                rng,
+            )
+            if atoms is not None:
+                return atoms
+        return None
@@ -12,6 +12,11 @@ from jobflow import Flow, Maker, job
 from pymatgen.io.ase import AseAtomsAdaptor
 
 from autoplex import MLIP_HYPERS
+from autoplex.data.common.dataset import (
+    AtomsDataset,
+    database_dir_name,
+    read_previous_dataset,
+)
 from autoplex.fitting.common.jobs import machine_learning_fit
 from autoplex.fitting.common.regularization import set_custom_sigma
 from autoplex.fitting.common.utils import (
@@ -78,6 +83,14 @@ class MLIPFitMaker(Maker):
         For including atom-wise regularization.
     auto_delta: bool
         Automatically determine delta for 2b, 3b and soap terms.
+    auto_delta_subsample: int | None
+        If set, estimate the residuals for the deltas from intermediate fits on a
+        stratified subsample of this many training structures.
+    auto_delta_confidence: float
+        Confidence level of the interval logged for the estimated residuals.
+    concurrent_fits: bool
+        Fit the dataset variants, e.g. with and without regularization, side by side
+        with the fitting processes split between them.
     glue_xml: bool
         Use the glue.xml core potential instead of fitting 2b terms.
     num_processes_fit: int
@@ -86,6 +99,12 @@ class MLIPFitMaker(Maker):
         Determine whether to preprocess the data.
     run_fits_on_different_cluster: bool
         If true, run fits on different clusters.
+    fit_cache_dir: str | None
+        Directory of a persistent fit cache. Fits with the same data, hyperparameters
+        and fitting code version are restored from it instead of being rerun.
+        If None, fits are not cached.
+    fit_cache_size: float
+        Maximum size of the fit cache in GB.
     """
 
     name: str = "MLpotentialFit"
@@ -106,10 +125,15 @@ class MLIPFitMaker(Maker):
     atomwise_regularization_parameter: float = 0.1  # This is only used for GAP.
     atom_wise_regularization: bool = True  # This is only used for GAP.
     auto_delta: bool = False  # This is only used for GAP.
+    auto_delta_subsample: int | None = None  # This is only used for GAP.
+    auto_delta_confidence: float = 0.95  # This is only used for GAP.
+    concurrent_fits: bool = False  # This is only used for GAP.
     glue_xml: bool = False  # This is only used for GAP.
     num_processes_fit: int | None = None
     apply_data_preprocessing: bool = True
     run_fits_on_different_cluster: bool = False
+    fit_cache_dir: str | None = None
+    fit_cache_size: float = 10.0
 
     def make(
         self,
@@ -177,6 +201,11 @@ class MLIPFitMaker(Maker):
                 isolated_atom_energies=isolated_atom_energies,
                 num_processes_fit=self.num_processes_fit,
                 auto_delta=self.auto_delta,
+                auto_delta_subsample=self.auto_delta_subsample,
+                auto_delta_confidence=self.auto_delta_confidence,
+                concurrent_fits=self.concurrent_fits,
+                fit_cache_dir=self.fit_cache_dir,
+                fit_cache_size=self.fit_cache_size,
                 glue_xml=self.glue_xml,
                 glue_file_path=self.glue_file_path,
                 mlip_type=self.mlip_type,
@@ -211,6 +240,11 @@ class MLIPFitMaker(Maker):
             isolated_atom_energies=isolated_atom_energies,
             num_processes_fit=self.num_processes_fit,
             auto_delta=self.auto_delta,
+            auto_delta_subsample=self.auto_delta_subsample,
+            auto_delta_confidence=self.auto_delta_confidence,
+            concurrent_fits=self.concurrent_fits,
+            fit_cache_dir=self.fit_cache_dir,
+            fit_cache_size=self.fit_cache_size,
             glue_xml=self.glue_xml,
             glue_file_path=self.glue_file_path,
             mlip_type=self.mlip_type,
@@ -277,6 +311,9 @@ class DataPreprocessing(Maker):
         Name of the test xyz data file.
     run_fits_on_different_cluster: bool
         If True, will copy the fitting database to the MongoDB
+    binary_database: bool
+        If True, additionally store the train and test sets as binary databases,
+        which are read instead of the extxyz files when used as pre-database.
 
     """
 
@@ -297,6 +334,7 @@ class DataPreprocessing(Maker):
     train_data_file: str = "train.extxyz"
     test_data_file: str = "test.extxyz"
     run_fits_on_different_cluster: bool = False
+    binary_database: bool = False
 
     @job(data=["database_dict"])
     def make(
@@ -353,16 +391,18 @@ class DataPreprocessing(Maker):
                 )
                 for file_name in self.pre_xyz_files:
                     # TODO: if it makes sense to remove isolated atoms from other files as well
-                    atoms_list = ase.io.read(
-                        os.path.join(self.pre_database_dir, file_name), index=":"
+                    # the binary copy of the previous database is used if it exists
+                    pre_dataset = read_previous_dataset(
+                        self.pre_database_dir, file_name
                     )
-                    new_atoms_list = [
-                        atoms
-                        for atoms in atoms_list
-                        if atoms.info["config_type"] != "IsolatedAtom"
-                    ]
-
-                    ase.io.write(destination_file_path, new_atoms_list, append=True)
+                    if pre_dataset is None:
+                        raise FileNotFoundError(
+                            f"{file_name} not found in {self.pre_database_dir}"
+                        )
+                    pre_dataset[
+                        pre_dataset.get_info("config_type", default="")
+                        != "IsolatedAtom"
+                    ].write(destination_file_path, append=True)
 
                     logging.info(
                         f"File {self.pre_xyz_files[0]} has been copied to {destination_file_path}"
@@ -385,7 +425,8 @@ class DataPreprocessing(Maker):
             ref_virial_name=self.ref_virial_name,
         )
 
-        write_after_distillation_data_split(
+        # the reference data is parsed once, later steps reuse the split in memory
+        atoms_train, atoms_test = write_after_distillation_data_split(
             distillation=self.distillation,
             force_max=self.force_max,
             split_ratio=self.split_ratio,
@@ -393,6 +434,7 @@ class DataPreprocessing(Maker):
             energy_label=self.ref_energy_name,
             train_name=self.train_data_file,
             test_name=self.test_data_file,
+            dataset=AtomsDataset.from_extxyz("vasp_ref.extxyz"),
         )
 
         # Merging database
@@ -407,8 +449,7 @@ class DataPreprocessing(Maker):
                 logging.warning(f"Error creating folder {folder_name}: {e}")
             train_path = os.path.join(folder_name, self.train_data_file)
             test_path = os.path.join(folder_name, self.test_data_file)
-            atoms = ase.io.read(self.train_data_file, index=":")
-            ase.io.write(train_path, atoms, format="extxyz")
+            shutil.copy(self.train_data_file, train_path)
             logging.info(f"Written train file without regularization to: {train_path}")
             try:
                 shutil.copy(self.test_data_file, test_path)
@@ -417,15 +458,13 @@ class DataPreprocessing(Maker):
                 logging.warning("test.extxyz not found. Skipping copy.")
             except Exception as e:
                 logging.warning(f"Error copying test.extxyz: {e}")
-            atoms_with_sigma = set_custom_sigma(
-                atoms,
+            atoms_train = set_custom_sigma(
+                atoms_train,
                 reg_minmax=[(0.1, 1), (0.001, 0.1), (0.0316, 0.316), (0.0632, 0.632)],
             )
-            ase.io.write(self.train_data_file, atoms_with_sigma, format="extxyz")
+            ase.io.write(self.train_data_file, atoms_train, format="extxyz")
         if self.separated:
             base_dir = os.getcwd()
-            atoms_train = ase.io.read(self.train_data_file, index=":")
-            atoms_test = ase.io.read(self.test_data_file, index=":")
             for dt in set(data_types):
                 data_type = dt.removesuffix("_dir")
                 if data_type != "iso_atoms":
@@ -443,21 +482,14 @@ class DataPreprocessing(Maker):
                     train_path = os.path.join(folder_name, self.train_data_file)
                     test_path = os.path.join(folder_name, self.test_data_file)
 
-                    for atoms in atoms_train + atoms_test:
-                        if atoms.info["data_type"] == "iso_atoms":
-                            ase.io.write(
-                                vasp_ref_path,
-                                atoms,
-                                format="extxyz",
-                                append=True,
-                            )
-                        if atoms.info["data_type"] == data_type:
-                            ase.io.write(
-                                vasp_ref_path,
-                                atoms,
-                                format="extxyz",
-                                append=True,
-                            )
+                    atoms_separated = [
+                        atoms
+                        for atoms in atoms_train + atoms_test
+                        if atoms.info["data_type"] in ("iso_atoms", data_type)
+                    ]
+                    ase.io.write(
+                        vasp_ref_path, atoms_separated, format="extxyz", append=True
+                    )
                     try:
                         write_after_distillation_data_split(
                             distillation=self.distillation,
@@ -467,6 +499,7 @@ class DataPreprocessing(Maker):
                             train_name=train_path,
                             test_name=test_path,
                             force_label=self.ref_force_name,
+                            dataset=AtomsDataset.from_atoms(atoms_separated),
                         )
                         logging.info(f"Data split written: {train_path}, {test_path}")
                     except Exception as e:
@@ -474,6 +507,14 @@ class DataPreprocessing(Maker):
                             f"Error in write_after_distillation_data_split: {e}"
                         )
 
+        if self.binary_database:
+            AtomsDataset.from_atoms(atoms_train).save(
+                database_dir_name(self.train_data_file)
+            )
+            AtomsDataset.from_atoms(atoms_test).save(
+                database_dir_name(self.test_data_file)
+            )
+
         # TODO: add a database to MongoDB besides just the path
         if self.run_fits_on_different_cluster:
 
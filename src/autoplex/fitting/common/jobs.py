@@ -1,5 +1,6 @@
 """General fitting jobs using several MLIPs available."""
 
+import logging
 from pathlib import Path
 
 import numpy as np
@@ -8,8 +9,12 @@ from jobflow import job
 from pymatgen.io.ase import AseAtomsAdaptor
 
 from autoplex import MLIP_HYPERS
+from autoplex.data.common.dataset import DatabaseManifest
 from autoplex.fitting.common.utils import (
+    FitCache,
     check_convergence,
+    concurrent_gap_fitting,
+    fit_cache_key,
     gap_fitting,
     jace_fitting,
     m3gnet_fitting,
@@ -27,6 +32,9 @@ def machine_learning_fit(
     isolated_atom_energies: dict | None = None,
     num_processes_fit: int = 32,
     auto_delta: bool = True,
+    auto_delta_subsample: int | None = None,
+    auto_delta_confidence: float = 0.95,
+    concurrent_fits: bool = False,
     glue_xml: bool = False,
     glue_file_path: str = "glue.xml",
     gpu_identifier_indices: list[int] | None = None,
@@ -38,6 +46,8 @@ def machine_learning_fit(
     database_dict: dict | None = None,
     hyperpara_opt: bool = False,
     hyperparameters: MLIP_HYPERS = MLIP_HYPERS,
+    fit_cache_dir: str | None = None,
+    fit_cache_size: float = 10.0,
     **fit_kwargs,
 ):
     """
@@ -57,6 +67,16 @@ def machine_learning_fit(
         Number of processes for fitting.
     auto_delta: bool
         Automatically determine delta for 2b, 3b and soap terms. Only used for GAP fitting.
+    auto_delta_subsample: int | None
+        If set, estimate the residuals for the deltas from intermediate fits on a
+        stratified subsample of this many training structures. Only used for GAP fitting.
+    auto_delta_confidence: float
+        Confidence level of the interval logged for the estimated residuals.
+        Only used for GAP fitting.
+    concurrent_fits: bool
+        Fit the dataset variants (e.g. with and without regularization, phonon and
+        rattled data) side by side, each in its own directory and with an equal
+        share of num_processes_fit. Only used for GAP fitting.
     glue_xml: bool
         Use the glue.xml core potential instead of fitting 2b terms. Only used for GAP fitting.
     glue_file_path: str
@@ -84,6 +104,12 @@ def machine_learning_fit(
     run_fits_on_different_cluster: bool
         Indicates if fits are to be run on a different cluster.
         If True, the fitting data (train.extxyz, test.extxyz) is stored in the database.
+    fit_cache_dir: str | None
+        Directory of a persistent fit cache. A fit with the same training and test
+        data, hyperparameters and fitting code version as a cached one is restored
+        from the cache instead of being run. If None, fits are not cached.
+    fit_cache_size: float
+        Maximum size of the fit cache in GB.
     fit_kwargs: dict
         Additional keyword arguments for MLIP fitting.
     """
@@ -107,6 +133,12 @@ def machine_learning_fit(
         if isinstance(database_dir, str):  # data_prep_job.output is returned as string
             database_dir = Path(database_dir)
 
+        manifest = DatabaseManifest.load(database_dir)
+        if manifest is not None and not (database_dir / "train.extxyz").exists():
+            # an incremental database only stores segments, the fitting codes need files
+            manifest.write_extxyz(Path.cwd())
+            database_dir = Path.cwd()
+
     train_files = [
         "train.extxyz",
         "without_regularization/train.extxyz",
@@ -120,29 +152,91 @@ def machine_learning_fit(
         "rattled/test.extxyz",
     ]
 
+    fit_cache = None
+    if fit_cache_dir is not None:
+        fit_cache = FitCache(fit_cache_dir, max_size=fit_cache_size)
+        hyperparameter_name = {"J-ACE": "J_ACE"}.get(mlip_type, mlip_type)
+        data_files = {
+            file_name: database_dir / file_name
+            for file_name in train_files + test_files
+            if (database_dir / file_name).exists()
+        }
+        if glue_xml:
+            data_files["glue.xml"] = glue_file_path
+        cache_key = fit_cache_key(
+            data_files=data_files,
+            mlip_type=mlip_type,
+            fit_settings={
+                "hyperparameters": getattr(
+                    hyperparameters, hyperparameter_name
+                ).model_dump(by_alias=True),
+                "fit_kwargs": fit_kwargs,
+                "species_list": species_list,
+                "isolated_atom_energies": isolated_atom_energies,
+                "auto_delta": auto_delta,
+                "auto_delta_subsample": auto_delta_subsample,
+                "glue_xml": glue_xml,
+                "ref_energy_name": ref_energy_name,
+                "ref_force_name": ref_force_name,
+                "ref_virial_name": ref_virial_name,
+            },
+        )
+        cached_fit = fit_cache.get(cache_key, Path.cwd())
+        if cached_fit is not None:
+            logging.info(f"Restored {mlip_type} fit {cache_key} from the fit cache")
+            return {
+                **cached_fit,
+                "convergence": check_convergence(cached_fit["test_error"]),
+                "database_dir": database_dir,
+            }
+
     mlip_paths = []
 
     if mlip_type == "GAP":
-        for train_name, test_name in zip(train_files, test_files):
-            if (database_dir / train_name).exists() and (
-                database_dir / test_name
-            ).exists():
-                train_test_error = gap_fitting(
+        gap_kwargs = {
+            "hyperparameters": hyperparameters.GAP,
+            "species_list": species_list,
+            "auto_delta": auto_delta,
+            "auto_delta_subsample": auto_delta_subsample,
+            "auto_delta_confidence": auto_delta_confidence,
+            "glue_xml": glue_xml,
+            "glue_file_path": glue_file_path,
+            "ref_energy_name": ref_energy_name,
+            "ref_force_name": ref_force_name,
+            "ref_virial_name": ref_virial_name,
+            "fit_kwargs": fit_kwargs,
+        }
+        train_test_files = [
+            (train_name, test_name)
+            for train_name, test_name in zip(train_files, test_files)
+            if (database_dir / train_name).exists()
+            and (database_dir / test_name).exists()
+        ]
+        if concurrent_fits and len(train_test_files) > 1:
+            train_test_errors = concurrent_gap_fitting(
+                db_dir=database_dir,
+                variants=[
+                    train_name.replace("train.extxyz", "")
+                    for train_name, _ in train_test_files
+                ],
+                num_processes_fit=num_processes_fit,
+                **gap_kwargs,
+            )
+        else:
+            train_test_errors = [
+                gap_fitting(
                     db_dir=database_dir,
-                    hyperparameters=hyperparameters.GAP,
-                    species_list=species_list,
                     num_processes_fit=num_processes_fit,
-                    auto_delta=auto_delta,
-                    glue_xml=glue_xml,
-                    glue_file_path=glue_file_path,
-                    ref_energy_name=ref_energy_name,
-                    ref_force_name=ref_force_name,
-                    ref_virial_name=ref_virial_name,
                     train_name=train_name,
                     test_name=test_name,
-                    fit_kwargs=fit_kwargs,
+                    **gap_kwargs,
                 )
-                mlip_paths.append(train_test_error["mlip_path"])
+                for train_name, test_name in train_test_files
+            ]
+        mlip_paths = [
+            train_test_error["mlip_path"] for train_test_error in train_test_errors
+        ]
+        train_test_error = train_test_errors[-1]
 
     elif mlip_type == "J-ACE":
         train_test_error = jace_fitting(
@@ -211,6 +305,17 @@ def machine_learning_fit(
         )
         mlip_paths.append(train_test_error["mlip_path"])
 
+    if fit_cache is not None:
+        fit_cache.put(
+            cache_key,
+            Path.cwd(),
+            {
+                "mlip_path": mlip_paths,
+                "train_error": train_test_error["train_error"],
+                "test_error": train_test_error["test_error"],
+            },
+        )
+
     check_conv = check_convergence(train_test_error["test_error"])
 
     return {
@@ -7,7 +7,7 @@ from contextlib import suppress
 
 import numpy as np
 from ase import Atoms
-from scipy.spatial import ConvexHull
+from scipy.spatial import ConvexHull, cKDTree
 
 logging.basicConfig(
     level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
@@ -101,7 +101,6 @@ def set_custom_sigma(
     if scheme == "linear-hull":
         logging.info("Regularising with linear hull")
         hull, points = get_convex_hull(atoms, energy_name=energy_name)
-        get_e_distance_func = get_e_distance_to_hull
 
     elif scheme == "volume-stoichiometry":
         logging.info("Regularising with 3D volume-mole fraction hull")
@@ -116,7 +115,6 @@ def set_custom_sigma(
             atoms, isolated_atom_energies, energy_name, element_order=element_order
         )  # label atoms with volume and mole fraction
         hull = calculate_hull_nd(points)
-        get_e_distance_func = get_e_distance_to_hull_nd  # type: ignore
 
     points = {}
     for group in sorted(
@@ -137,6 +135,29 @@ def set_custom_sigma(
         except Exception:
             pass
 
+    # all distances to the hull are evaluated in one batch
+    candidates = [
+        at
+        for atoms_group in points.values()
+        for at in atoms_group
+        if not (retain_existing_sigma and "energy_sigma" in at.info)
+    ]
+    if scheme == "linear-hull":
+        distances = get_e_distances_to_hull(
+            hull, get_volume_energy_points(candidates, energy_name=energy_name)
+        )
+    else:
+        distances = get_e_distances_to_hull_nd(
+            hull,
+            get_stoichiometry_volume_points(
+                candidates,
+                isolated_atom_energies,
+                energy_name,
+                element_order=element_order,
+            ),
+        )
+    distance_to_hull = {id(at): de for at, de in zip(candidates, distances)}
+
     for group, atoms_group in points.items():
         logging.info(f"group: {group}")
 
@@ -146,13 +167,7 @@ def set_custom_sigma(
                 atoms_modi.append(val)
                 continue
 
-            de = get_e_distance_func(
-                hull,
-                val,
-                energy_name=energy_name,
-                isolated_atom_energies=isolated_atom_energies,
-                element_order=element_order,
-            )
+            de = distance_to_hull[id(val)]
 
             if de > max_energy:
                 # don't even fit if too high
@@ -266,13 +281,7 @@ def get_convex_hull(
         if atom.info["config_type"] in ["IsolatedAtom", "dimer"]:
             continue
         try:
-            volume_per_atom = atom.get_volume() / len(atom)
-            energy_per_atom = (
-                atom.info[energy_name] / len(atom)
-                if energy_name != "energy"
-                else atom.get_potential_energy() / len(atom)
-            )
-            points_list.append((volume_per_atom, energy_per_atom))
+            points_list.append(_volume_energy_point(atom, energy_name))
         except KeyError:
             failed_count += 1
 
@@ -284,6 +293,11 @@ def get_convex_hull(
     points = np.array(points_list)
     points = points.T[:, np.argsort(points.T[0])].T  # sort by volume axis
 
+    return _get_lower_hull(points), points
+
+
+def _get_lower_hull(points: np.ndarray) -> np.ndarray:
+    """Return the lower half of the (V, E) convex hull of points sorted by volume."""
     hull = ConvexHull(points)  # generate full convex hull
     hull_points = points[hull.vertices]
 
@@ -302,11 +316,44 @@ def get_convex_hull(
 
     lower_half_hull_points = points[lower_half_hull]
 
-    lower_half_hull_points = lower_half_hull_points[
+    return lower_half_hull_points[
         lower_half_hull_points[:, 1] <= np.max(lower_half_hull_points[:, 1])
     ]
 
-    return lower_half_hull_points, points
+
+def _volume_energy_point(atoms: Atoms, energy_name: str) -> tuple[float, float]:
+    """Return the volume and energy per atom of a structure."""
+    volume = atoms.get_volume() / len(atoms)
+    energy = (
+        atoms.info[energy_name] / len(atoms)
+        if energy_name != "energy"
+        else atoms.get_potential_energy() / len(atoms)
+    )
+    return volume, energy
+
+
+def get_volume_energy_points(
+    atoms: list[Atoms], energy_name: str = "energy"
+) -> np.ndarray:
+    """
+    Calculate the (V, E) coordinates of a list of structures.
+
+    Parameters
+    ----------
+    atoms: (list[Atoms])
+        List of atoms objects
+    energy_name: (str)
+        Name of the energy key in atoms.info (typically a DFT energy)
+
+    Returns
+    -------
+    Array of shape (N, 2) with the volume and energy per atom of each structure,
+    in the order of the input.
+
+    """
+    return np.array(
+        [_volume_energy_point(atom, energy_name) for atom in atoms], dtype=float
+    ).reshape(-1, 2)
 
 
 def get_e_distance_to_hull(
@@ -325,34 +372,61 @@ def get_e_distance_to_hull(
         Name of the energy key in atoms.info (typically a DFT energy)
 
     """
-    volume = atoms.get_volume() / len(atoms)
-    energy = (
-        atoms.info[energy_name] / len(atoms)
-        if energy_name != "energy"
-        else atoms.get_potential_energy() / len(atoms)
+    return float(
+        get_e_distances_to_hull(
+            hull, get_volume_energy_points([atoms], energy_name=energy_name)
+        )[0]
     )
-    tp = np.array([volume, energy])
-    hull_ps = hull.points if isinstance(hull, ConvexHull) else hull
 
-    if any(
-        np.isclose(hull_ps[:], tp).all(1)
-    ):  # if the point is on the hull, return 0.0
-        return 0.0
 
-    nearest = np.searchsorted(hull_ps.T[0], tp, side="right")[
-        0
-    ]  # find the nearest convex hull point
+def get_e_distances_to_hull(hull: np.ndarray | ConvexHull, points) -> np.ndarray:
+    """
+    Calculate the distances of many (V, E) points to the linear convex hull in energy.
 
-    return (
-        energy
-        - get_intersect(
-            tp,  # get intersection of the vertical line (energy axis)
-            tp + np.array([0, 1]),  # and the line between the nearest hull points
-            hull_ps[(nearest - 1) % len(hull_ps.T[0])],
-            hull_ps[nearest % len(hull_ps.T[0])],
-        )[1]
+    The energy of the hull is interpolated linearly between the two hull points
+    bracketing the volume of each point. Points that coincide with a hull point
+    have a distance of 0.
+
+    Parameters
+    ----------
+    hull: (np.array | ConvexHull)
+        Points in the convex hull, sorted by volume
+    points: (np.array)
+        Array of shape (N, 2) with the volume and energy per atom of each structure
+
+    Returns
+    -------
+    Array of the N distances to the hull in energy.
+
+    """
+    points = np.asarray(points, dtype=float).reshape(-1, 2)
+    hull_ps = hull.points if isinstance(hull, ConvexHull) else np.asarray(hull)
+    volume, energy = points.T
+
+    # the two hull points bracketing each volume, wrapping around at the ends
+    nearest = np.searchsorted(hull_ps[:, 0], volume, side="right")
+    (x0, y0), (x1, y1) = (
+        hull_ps[(nearest - 1) % len(hull_ps)].T,
+        hull_ps[nearest % len(hull_ps)].T,
     )
 
+    # intersection of the vertical line through each point with the hull segment
+    with np.errstate(divide="ignore", invalid="ignore"):
+        hull_energy = np.where(
+            x1 == x0, np.inf, (volume * (y1 - y0) + x1 * y0 - x0 * y1) / (x1 - x0)
+        )
+    distances = energy - hull_energy
+
+    # points on the hull, compared in chunks to bound the memory of the comparison
+    chunk = max(1, 2**20 // len(hull_ps))
+    for start in range(0, len(points), chunk):
+        on_hull = np.isclose(
+            hull_ps[None, :, :], points[start : start + chunk, None, :]
+        ).all(axis=2)
+        distances[start : start + chunk][on_hull.any(axis=1)] = 0.0
+
+    return distances
+
 
 def get_intersect(a1, a2, b1, b2) -> tuple[float, float] | tuple:
     """
@@ -448,23 +522,79 @@ def label_stoichiometry_volume(
     points_list = []
     for atom in atoms_list:
         try:
-            volume = atom.get_volume() / len(atom)
-            # make energy relative to isolated atoms
-            energy = (
-                atom.info[energy_name]
-                - sum([isolated_atom_energies[j] for j in atom.get_atomic_numbers()])
-                if energy_name != "energy"
-                else atom.get_potential_energy()
-                - sum([isolated_atom_energies[j] for j in atom.get_atomic_numbers()])
-            ) / len(atom)
-            mole_frac = get_mole_frac(atom, element_order=element_order)
-            points_list.append(np.hstack((mole_frac, volume, energy)))
+            points_list.append(
+                _stoichiometry_volume_point(
+                    atom, isolated_atom_energies, energy_name, element_order
+                )
+            )
         except KeyError:
             traceback.print_exc()
     points = np.array(points_list)
     return points[np.lexsort(points.T[::-1])]
 
 
+def _stoichiometry_volume_point(
+    atoms: Atoms,
+    isolated_atom_energies: dict,
+    energy_name: str,
+    element_order: list | None,
+) -> np.ndarray:
+    """Return the mole fraction, volume and formation energy per atom of a structure."""
+    volume = atoms.get_volume() / len(atoms)
+    # make energy relative to isolated atoms
+    energy = (
+        atoms.info[energy_name]
+        - sum([isolated_atom_energies[j] for j in atoms.get_atomic_numbers()])
+        if energy_name != "energy"
+        else atoms.get_potential_energy()
+        - sum([isolated_atom_energies[j] for j in atoms.get_atomic_numbers()])
+    ) / len(atoms)
+    mole_frac = get_mole_frac(atoms, element_order=element_order)
+    return np.hstack((mole_frac, volume, energy))
+
+
+def get_stoichiometry_volume_points(
+    atoms_list: list[Atoms],
+    isolated_atom_energies: dict,
+    energy_name: str,
+    element_order: list | None = None,
+) -> np.ndarray:
+    """
+    Calculate the stoichiometry, volume and energy coordinates of a list of structures.
+
+    Unlike 'label_stoichiometry_volume', the points are neither sorted nor filtered,
+    so they can be matched to the input structures.
+
+    Parameters
+    ----------
+    atoms_list: (list[Atoms])
+        List of atoms objects
+    isolated_atom_energies: (dict)
+        Dictionary of isolated atom energies {atomic_number: energy}
+    energy_name: (str)
+        Name of energy key in atoms.info (typically a DFT energy)
+    element_order: (list | None)
+        List of atomic numbers in order of choice (e.g. [42, 16] for MoS2)
+
+    Returns
+    -------
+    Array with one row of (mole fractions..., volume, energy) per structure.
+
+    """
+    isolated_atom_energies = {
+        ast.literal_eval(k) if isinstance(k, str) else k: v
+        for k, v in isolated_atom_energies.items()
+    }
+    return np.array(
+        [
+            _stoichiometry_volume_point(
+                atom, isolated_atom_energies, energy_name, element_order
+            )
+            for atom in atoms_list
+        ]
+    )
+
+
 def point_in_triangle_2D(p1, p2, p3, pn) -> bool:
     """
     Check if a point is inside a triangle in 2D.
@@ -563,6 +693,126 @@ def calculate_hull_nd(points_nd) -> ConvexHull:
     return hull
 
 
+class LowerHullFacetIndex:
+    """
+    A lookup of the lower-hull facets of an N-dimensional convex hull.
+
+    The facets visible from below are projected onto the non-energy axes, where
+    they tile the composition-volume domain. For each facet, the inverse
+    barycentric matrix and the plane equation are precomputed, and a KD-tree over
+    the facet centroids proposes the facets to test for a query point. Only points
+    that lie in none of the proposed facets are tested against all facets.
+
+    Parameters
+    ----------
+    hull:
+        Convex hull from 'calculate_hull_nd'.
+    n_candidates: int
+        Number of facets with the nearest centroids tested for each point.
+    tol: float
+        Tolerance of the barycentric containment test.
+
+    """
+
+    def __init__(self, hull: ConvexHull, n_candidates: int = 8, tol: float = 1e-9):
+        # facets visible from below, without vertical facets that have no energy
+        equations = hull.equations[hull.good]
+        facets = hull.simplices[hull.good]
+        non_vertical = np.abs(equations[:, -2]) > 1e-12
+        self.equations = equations[non_vertical]
+        self.tol = tol
+
+        vertices = hull.points[facets[non_vertical]][:, :, :-1]
+        self.origins = vertices[:, -1]
+        self.inverses = np.linalg.inv(
+            np.transpose(vertices[:, :-1] - self.origins[:, None], (0, 2, 1))
+        )
+
+        # the axes (mole fractions, volume) are rescaled to a comparable range
+        projected = hull.points[:, :-1]
+        self.scale = np.ptp(projected, axis=0)
+        self.scale[self.scale == 0] = 1.0
+        self.n_candidates = min(n_candidates, len(self.equations))
+        self.tree = (
+            cKDTree(vertices.mean(axis=1) / self.scale)
+            if len(self.equations) > 0
+            else None
+        )
+
+    def _contains(self, x: np.ndarray, candidates: np.ndarray) -> np.ndarray:
+        """Test which of the candidate facets, shape (n, k), contain the points x."""
+        bary = np.einsum(
+            "nkij,nkj->nki",
+            self.inverses[candidates],
+            x[:, None, :] - self.origins[candidates],
+        )
+        return (bary >= -self.tol).all(axis=2) & (bary.sum(axis=2) <= 1 + self.tol)
+
+    def locate(self, x) -> np.ndarray:
+        """
+        Find the lower-hull facet containing each projected point.
+
+        Parameters
+        ----------
+        x: (np.array)
+            Array of shape (N, D-1) of points without the energy coordinate.
+
+        Returns
+        -------
+        Array of N facet indices, -1 for points outside the projected hull.
+
+        """
+        x = np.atleast_2d(np.asarray(x, dtype=float))
+        located = np.full(len(x), -1)
+        if self.tree is None or len(x) == 0:
+            return located
+
+        _, candidates = self.tree.query(x / self.scale, k=self.n_candidates)
+        candidates = candidates.reshape(len(x), -1)
+        inside = self._contains(x, candidates)
+        found = inside.any(axis=1)
+        located[found] = candidates[found, inside[found].argmax(axis=1)]
+
+        # fall back to testing all facets, in chunks to bound the memory
+        missing = np.flatnonzero(~found)
+        all_facets = np.arange(len(self.equations))
+        chunk = max(1, 2**22 // (len(all_facets) * self.inverses.shape[1]))
+        for start in range(0, len(missing), chunk):
+            rows = missing[start : start + chunk]
+            inside = self._contains(
+                x[rows], np.broadcast_to(all_facets, (len(rows), len(all_facets)))
+            )
+            found = inside.any(axis=1)
+            located[rows[found]] = inside[found].argmax(axis=1)
+
+        return located
+
+    def energy(self, x) -> np.ndarray:
+        """
+        Calculate the energy of the lower hull at projected points.
+
+        Parameters
+        ----------
+        x: (np.array)
+            Array of shape (N, D-1) of points without the energy coordinate.
+
+        Returns
+        -------
+        Array of N hull energies, NaN for points outside the projected hull.
+
+        """
+        x = np.atleast_2d(np.asarray(x, dtype=float))
+        located = self.locate(x)
+        inside = located >= 0
+        eq = self.equations[located[inside]]
+        hull_energy = np.full(len(x), np.nan)
+        hull_energy[inside] = (
+            -(eq[:, -1] + np.einsum("ni,ni->n", eq[:, :-2], x[inside])) / eq[:, -2]
+        )
+
+        return hull_energy
+
+
 def get_e_distance_to_hull_nd(
     hull, atoms, isolated_atom_energies=None, energy_name="energy", element_order=None
 ) -> float:
@@ -583,50 +833,61 @@ def get_e_distance_to_hull_nd(
         List of atomic numbers in order of choice (e.g. [42, 16] for MoS2)
 
     """
-    isolated_atom_energies = {
-        ast.literal_eval(k) if isinstance(k, str) else k: v
-        for k, v in isolated_atom_energies.items()
-    }
-    mole_frac = get_mole_frac(atoms, element_order=element_order)
-    energy = (
-        atoms.info[energy_name]
-        - sum([isolated_atom_energies[j] for j in atoms.get_atomic_numbers()])
-        if energy_name != "energy"
-        else atoms.get_potential_energy()
-        - sum([isolated_atom_energies[j] for j in atoms.get_atomic_numbers()])
-    ) / len(atoms)
-    volume = atoms.get_volume() / len(atoms)
-    sp = np.hstack([mole_frac, volume, energy])
+    points = get_stoichiometry_volume_points(
+        [atoms],
+        isolated_atom_energies,
+        energy_name,
+        element_order=element_order,
+    )
+    return float(get_e_distances_to_hull_nd(hull, points)[0])
+
+
+def get_e_distances_to_hull_nd(hull: ConvexHull, points) -> np.ndarray:
+    """
+    Calculate the energy distances of many points to the N-dimensional convex hull.
+
+    Each point is projected onto the non-energy axes and located in the projected
+    lower-hull facets with barycentric coordinates. The distance is the energy of
+    the point above the plane of the facet containing it.
+
+    Parameters
+    ----------
+    hull:
+        Convex hull from 'calculate_hull_nd'.
+    points: (np.array)
+        Array with one row of (mole fractions..., volume, energy) per structure,
+        as from 'get_stoichiometry_volume_points'.
 
+    Returns
+    -------
+    Array of the distances to the hull in energy. Points outside the projected
+    hull get a distance of 1e6.
+
+    """
+    points = np.atleast_2d(np.asarray(points, dtype=float))
     for i in hull.remove_dim:
-        sp = np.delete(sp, i)
+        points = np.delete(points, i, axis=1)
 
-    if len(sp[:-1]) == 1:
+    if points.shape[1] == 2:
         logging.info("doing convexhull analysis in 1D")
-        return get_e_distance_to_hull(hull, atoms, energy_name=energy_name)
-
-    for _, visible_facet in enumerate(hull.simplices[hull.good]):
-        if point_in_simplex_nd(sp[:-1], *hull.points[visible_facet][:, :-1]):
-            n_d = hull.points[visible_facet]
-
-            if n_d.shape[1] == 3:
-                norm = np.cross(n_d[2] - n_d[0], n_d[1] - n_d[0])
-                plane_norm = norm / np.linalg.norm(norm)
-            else:
-                relative_vectors = n_d[:-1] - n_d[0]
-                plane_norm = np.linalg.lstsq(
-                    relative_vectors, np.ones(relative_vectors.shape[0]), rcond=None
-                )[0]
-
-            plane_constant = np.dot(plane_norm, n_d[0])
-
-            return (
-                energy
-                - (plane_constant - np.dot(plane_norm[:-1], sp[:-1])) / plane_norm[-1]
-            )
+        # the first hull point is the test point below the data
+        hull_points = hull.points[1:]
+        hull_points = hull_points[np.argsort(hull_points[:, 0])]
+        return get_e_distances_to_hull(_get_lower_hull(hull_points), points)
 
-    logging.info("Failed to find distance to hull in ND")
-    return 1e6
+    index = getattr(hull, "facet_index", None)
+    if index is None:
+        # built once per hull and reused by every later query
+        index = hull.facet_index = LowerHullFacetIndex(hull)
+
+    distances = points[:, -1] - index.energy(points[:, :-1])
+
+    if not np.all(np.isfinite(distances)):
+        logging.info(
+            f"Failed to find distance to hull in ND for "
+            f"{np.sum(~np.isfinite(distances))} structures"
+        )
+    return np.where(np.isfinite(distances), distances, 1e6)
 
 
 def piecewise_linear(x, vals) -> np.ndarray:
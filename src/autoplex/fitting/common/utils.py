@@ -1,6 +1,8 @@
 """Utility functions for fitting jobs."""
 
 import contextlib
+import hashlib
+import json
 import logging
 import multiprocessing as mp
 import os
@@ -10,7 +12,9 @@ import subprocess
 import sys
 import xml.etree.ElementTree as ET
 from collections.abc import Iterable
+from concurrent.futures import ProcessPoolExecutor
 from functools import partial
+from importlib.metadata import PackageNotFoundError, version
 from pathlib import Path
 
 import ase
@@ -27,6 +31,7 @@ from ase.constraints import voigt_6_to_full_3x3_stress
 from ase.data import chemical_symbols
 from ase.io import read, write
 from ase.io.extxyz import XYZError
+from ase.neighborlist import neighbor_list
 from atomate2.utils.path import strip_hostname
 from calorine.nep import read_loss, write_nepfile, write_structures
 from dgl.data.utils import split_dataset
@@ -44,6 +49,7 @@ from pymatgen.io.ase import AseAtomsAdaptor
 from pytorch_lightning.loggers import CSVLogger
 from quippy import descriptors
 from scipy.spatial import ConvexHull
+from scipy.stats import norm
 from threadpoolctl import threadpool_limits
 
 from autoplex import (
@@ -53,8 +59,11 @@ from autoplex import (
     MACE_HYPERS,
     NEP_HYPERS,
     NEQUIP_HYPERS,
+    __version__,
 )
+from autoplex.data.common.dataset import AtomsDataset
 from autoplex.data.common.utils import (
+    DiskCache,
     data_distillation,
     plot_energy_forces,
     rms_dict,
@@ -80,6 +89,8 @@ def gap_fitting(
     test_name: str = "test.extxyz",
     glue_file_path: str = "glue.xml",
     fit_kwargs: dict | None = None,  # pylint: disable=E3701
+    auto_delta_subsample: int | None = None,
+    auto_delta_confidence: float = 0.95,
 ) -> dict:
     """
     Perform the GAP (Gaussian approximation potential) model fitting.
@@ -113,6 +124,13 @@ def gap_fitting(
     fit_kwargs: dict
         Additional keyword arguments for GAP fitting with keys same as
         those in gap-defaults.json.
+    auto_delta_subsample: int | None
+        If set, the intermediate fits of auto_delta, which only provide the residuals
+        for the next delta, are fitted and evaluated on a stratified subsample of this
+        many training structures. Only the final fit uses the full training set.
+    auto_delta_confidence: float
+        Confidence level of the interval that is logged for the residuals estimated
+        from the subsample.
 
     Returns
     -------
@@ -156,100 +174,108 @@ def gap_fitting(
     gap_default_hyperparameters["general"].update({"at_file": train_data_path})
 
     if auto_delta:
+        if include_soap:
+            final_stage = "soap"
+        elif glue_xml:
+            final_stage = "glue"
+        else:
+            final_stage = "threeb" if include_three_body else "twob"
+
+        # the intermediate fits only provide the residuals for the next delta
+        delta_atoms = db_atoms
+        delta_data_path = train_data_path
+        residual_file = quip_train_file
+        if auto_delta_subsample is not None and auto_delta_subsample < len(db_atoms):
+            delta_atoms = subsample_training_data(
+                db_atoms, auto_delta_subsample, ref_energy_name
+            )
+            delta_data_path = train_name.replace("train", "auto_delta_subsample")
+            residual_file = train_name.replace("train", "quip_auto_delta_subsample")
+            ase.io.write(delta_data_path, delta_atoms, format="extxyz")
+
+        def auto_delta_residual() -> float:
+            if delta_atoms is db_atoms:
+                return energy_remain(residual_file)
+            residual, low, high = estimate_energy_remain(
+                residual_file, auto_delta_confidence
+            )
+            logging.info(
+                f"Residual energy estimated from {len(delta_atoms)} structures "
+                f"(eV/at.): {round(residual, 7)}, {auto_delta_confidence:.0%} "
+                f"confidence interval [{round(low, 7)}, {round(high, 7)}]"
+            )
+            return residual
+
+        def run_stage(stage: str, **constructor_kwargs) -> None:
+            at_file, eval_file = (
+                (train_data_path, quip_train_file)
+                if stage == final_stage
+                else (delta_data_path, residual_file)
+            )
+            gap_default_hyperparameters["general"].update({"at_file": at_file})
+            fit_parameters_list = gap_hyperparameter_constructor(
+                gap_parameter_dict=gap_default_hyperparameters, **constructor_kwargs
+            )
+            run_gap(num_processes_fit, fit_parameters_list)
+            run_ase_gap(num_processes_fit, at_file, gap_file_xml, eval_file, glue_xml)
+
         if include_two_body and not glue_xml:
             if include_three_body or include_soap:
                 cutoff_2b = gap_default_hyperparameters["twob"]["cutoff"]
                 delta_2b = calculate_delta_2b(
-                    atoms_db=db_atoms, cutoff=cutoff_2b, e_name=ref_energy_name
+                    atoms_db=db_atoms,
+                    cutoff=cutoff_2b,
+                    e_name=ref_energy_name,
+                    num_processes=num_processes_fit,
                 )
             else:
                 delta_2b = 1
 
             gap_default_hyperparameters["twob"].update({"delta": delta_2b})
-
-            fit_parameters_list = gap_hyperparameter_constructor(
-                gap_parameter_dict=gap_default_hyperparameters,
-                include_two_body=include_two_body,
-            )
-
-            run_gap(num_processes_fit, fit_parameters_list)
-
-            run_ase_gap(
-                num_processes_fit, train_data_path, gap_file_xml, quip_train_file
-            )
+            run_stage("twob", include_two_body=include_two_body)
 
         if include_three_body and not glue_xml:
             if include_two_body:
                 cutoff_3b = gap_default_hyperparameters["threeb"]["cutoff"]
-                energy_residual = energy_remain(quip_train_file)
-                descriptor_num_list = [
-                    compute_num_of_descriptor(atom=at, nb=3, cutoff=cutoff_3b) / len(at)
-                    for at in db_atoms
-                ]
-                num_of_descriptors = sum(descriptor_num_list) / len(db_atoms)
+                energy_residual = auto_delta_residual()
+                descriptor_num = count_num_of_descriptors(
+                    delta_atoms,
+                    nb=3,
+                    cutoff=cutoff_3b,
+                    num_processes=num_processes_fit,
+                )
+                num_of_descriptors = np.mean(
+                    descriptor_num / np.array([len(at) for at in delta_atoms])
+                )
                 delta_3b = energy_residual / num_of_descriptors
             else:
                 delta_3b = 1
             gap_default_hyperparameters["threeb"].update({"delta": delta_3b})
-
-            fit_parameters_list = gap_hyperparameter_constructor(
-                gap_parameter_dict=gap_default_hyperparameters,
+            run_stage(
+                "threeb",
                 include_two_body=include_two_body,
                 include_three_body=include_three_body,
             )
 
-            print("fit_parameters_list:", fit_parameters_list)
-
-            run_gap(num_processes_fit, fit_parameters_list)
-            run_ase_gap(
-                num_processes_fit, train_data_path, gap_file_xml, quip_train_file
-            )
-
         if glue_xml:
             gap_default_hyperparameters["general"].update(
                 {"core_param_file": "glue.xml"}
             )
             gap_default_hyperparameters["general"].update({"core_ip_args": "{IP Glue}"})
-
-            fit_parameters_list = gap_hyperparameter_constructor(
-                gap_parameter_dict=gap_default_hyperparameters,
-                include_two_body=False,
-                include_three_body=False,
-            )
-
-            run_gap(num_processes_fit, fit_parameters_list)
-            run_ase_gap(
-                num_processes_fit,
-                train_data_path,
-                gap_file_xml,
-                quip_train_file,
-                glue_xml,
-            )
+            run_stage("glue", include_two_body=False, include_three_body=False)
 
         if include_soap:
             delta_soap = (
-                energy_remain(quip_train_file)
-                if include_two_body or include_three_body
-                else 1
+                auto_delta_residual() if include_two_body or include_three_body else 1
             )
             gap_default_hyperparameters["soap"].update({"delta": delta_soap})
-
-            fit_parameters_list = gap_hyperparameter_constructor(
-                gap_parameter_dict=gap_default_hyperparameters,
+            run_stage(
+                "soap",
                 include_two_body=include_two_body,
                 include_three_body=include_three_body,
                 include_soap=include_soap,
             )
 
-            run_gap(num_processes_fit, fit_parameters_list)
-            run_ase_gap(
-                num_processes_fit,
-                train_data_path,
-                gap_file_xml,
-                quip_train_file,
-                glue_xml,
-            )
-
     else:
         if glue_xml:
             gap_default_hyperparameters["general"].update(
@@ -305,6 +331,101 @@ def gap_fitting(
     }
 
 
+def _fit_gap_variant(
+    variant_dir: Path, cpus: list[int] | None, gap_kwargs: dict
+) -> dict:
+    """Run gap_fitting for one dataset variant in its own working directory."""
+    if cpus is not None:
+        os.sched_setaffinity(0, cpus)
+    variant_dir.mkdir(parents=True, exist_ok=True)
+    os.chdir(variant_dir)
+
+    return gap_fitting(**gap_kwargs)
+
+
+def concurrent_gap_fitting(
+    db_dir: str | Path,
+    variants: list[str],
+    num_processes_fit: int | None = 32,
+    pin_cores: bool = True,
+    glue_file_path: str = "glue.xml",
+    **gap_kwargs,
+) -> list[dict]:
+    """
+    Fit GAP potentials to several dataset variants side by side.
+
+    Each variant, e.g. 'phonon/' or 'rattled/', is fitted by 'gap_fitting' in a
+    separate process that works in the variant's own directory below the current
+    working directory, i.e. in the same directory the sequential fit writes its
+    files to. The 'num_processes_fit' threads are split evenly between the variants.
+
+    Parameters
+    ----------
+    db_dir: str or path
+        Path to database directory.
+    variants: list[str]
+        Prefixes of the dataset variants, '' for the main 'train.extxyz' and
+        'test.extxyz' and e.g. 'phonon/' for 'phonon/train.extxyz'.
+    num_processes_fit: int | None
+        Total number of threads shared by all gap_fit runs. Defaults to the number
+        of CPUs.
+    pin_cores: bool
+        Pin every fit to its own share of the available CPU cores, if supported
+        by the platform.
+    glue_file_path: str
+        Name of the glue.xml file path.
+    gap_kwargs:
+        Additional keyword arguments passed to 'gap_fitting'.
+
+    Returns
+    -------
+    list[dict]
+        The result of 'gap_fitting' for each variant, in the order of 'variants'.
+
+    """
+    if len(variants) == 0:
+        return []
+
+    num_processes_fit = num_processes_fit or os.cpu_count() or 1
+    threads = max(1, num_processes_fit // len(variants))
+    cpu_shares: list[list[int] | None] = [None] * len(variants)
+    if pin_cores and hasattr(os, "sched_getaffinity"):
+        cpus = sorted(os.sched_getaffinity(0))
+        if len(cpus) >= len(variants):
+            cpu_shares = [
+                [int(cpu) for cpu in share]
+                for share in np.array_split(cpus, len(variants))
+            ]
+            threads = min(threads, *(len(share) for share in cpu_shares))
+
+    cwd = Path.cwd()
+    db_dir = Path(db_dir).resolve()
+    glue_file_path = str(Path(glue_file_path).resolve())
+    logging.info(
+        f"Fitting {len(variants)} dataset variants concurrently "
+        f"with {threads} threads each"
+    )
+
+    with ProcessPoolExecutor(max_workers=len(variants)) as executor:
+        futures = [
+            executor.submit(
+                _fit_gap_variant,
+                cwd / variant,
+                cpu_share,
+                {
+                    **gap_kwargs,
+                    "db_dir": db_dir / variant,
+                    "num_processes_fit": threads,
+                    "glue_file_path": glue_file_path,
+                    "train_name": "train.extxyz",
+                    "test_name": "test.extxyz",
+                },
+            )
+            for variant, cpu_share in zip(variants, cpu_shares)
+        ]
+        return [future.result() for future in futures]
+
+
 @requires(
     (
         subprocess.run(
@@ -1729,6 +1850,87 @@ def energy_remain(in_file: str) -> float:
     return rms["rmse"]
 
 
+def estimate_energy_remain(
+    in_file: str, confidence: float = 0.95
+) -> tuple[float, float, float]:
+    """
+    Estimate the energy per atom RMSE of the output vs. the input from a subsample.
+
+    Parameters
+    ----------
+    in_file:
+        input file
+    confidence: float
+        Confidence level of the interval.
+
+    Returns
+    -------
+    tuple[float, float, float]
+        The energy per atom RMSE and the bounds of its confidence interval, from a
+        normal approximation of the mean squared error.
+    """
+    in_atoms = ase.io.read(in_file, ":")
+    squared_errors = np.array(
+        [
+            (
+                (at.info["REF_energy"] - at.get_potential_energy())
+                / len(at.get_chemical_symbols())
+            )
+            ** 2
+            for at in in_atoms
+            if at.info.get("config_type") != "IsolatedAtoms"
+        ]
+    )
+    mse = squared_errors.mean()
+    half_width = (
+        norm.ppf(0.5 + confidence / 2)
+        * squared_errors.std(ddof=1)
+        / np.sqrt(len(squared_errors))
+        if len(squared_errors) > 1
+        else np.inf
+    )
+    return (
+        float(np.sqrt(mse)),
+        float(np.sqrt(max(mse - half_width, 0.0))),
+        float(np.sqrt(mse + half_width)),
+    )
+
+
+def subsample_training_data(
+    atoms: list[Atoms], num_structures: int, energy_label: str = "REF_energy"
+) -> list[Atoms]:
+    """
+    Draw a subsample of a training set stratified by the energy per atom.
+
+    The isolated atoms and dimers are always kept.
+
+    Parameters
+    ----------
+    atoms: list[Atoms]
+        The training structures.
+    num_structures: int
+        Number of structures in the subsample, in addition to the isolated atoms and
+        dimers.
+    energy_label: str
+        The label for the energy property in the atoms.
+
+    Returns
+    -------
+    list[Atoms]
+        The subsample.
+    """
+    num_bulk = sum(
+        at.info.get("config_type") not in ("dimer", "IsolatedAtom") for at in atoms
+    )
+    if num_structures >= num_bulk:
+        return list(atoms)
+
+    subsample, _ = stratified_dataset_split(
+        atoms, (num_bulk - num_structures) / num_bulk, energy_label
+    )
+    return subsample
+
+
 def extract_gap_label(xml_file_path) -> str:
     """
     Extract GAP label.
@@ -1783,7 +1985,10 @@ def plot_convex_hull(all_points: np.ndarray, hull_points: np.ndarray) -> None:
 
 
 def calculate_delta_2b(
-    atoms_db: list[Atoms], cutoff: float, e_name: str
+    atoms_db: list[Atoms],
+    cutoff: float,
+    e_name: str,
+    num_processes: int | None = None,
 ) -> tuple[float, ndarray]:
     """
     Calculate the delta parameter and average number of triplets for gap-fitting.
@@ -1798,6 +2003,8 @@ def calculate_delta_2b(
         Cutoff radius used to compute the dimensionality of the descriptor.
     e_name: str
         energy_parameter_name as defined in mlip-phonon-defaults.json
+    num_processes: int | None
+        Number of processes used to count the pairs. Defaults to the number of CPUs.
 
     Returns
     -------
@@ -1825,11 +2032,12 @@ def calculate_delta_2b(
     cutoff = (
         cutoff * 2 / 3
     )  # two-thirds of the cutoff is used since two-body interactions are weak near its edge.
-    descriptor_num_list = [
-        compute_num_of_descriptor(atom=at, nb=2, cutoff=cutoff) / len(at)
-        for at in atoms_db
-    ]
-    num_of_descriptors = sum(descriptor_num_list) / len(atoms_db)
+    descriptor_num = count_num_of_descriptors(
+        atoms_db, nb=2, cutoff=cutoff, num_processes=num_processes
+    )
+    num_of_descriptors = np.mean(
+        descriptor_num / np.array([len(at) for at in atoms_db])
+    )
     return es_var / num_of_descriptors
 
 
@@ -1864,6 +2072,61 @@ def compute_num_of_descriptor(atom: Atoms, nb: int, cutoff: float) -> list[float
     return n_desc
 
 
+def _count_num_of_descriptor(atom: Atoms, nb: int, cutoff: float) -> int:
+    """Count the pairs or triplets of a structure from a single neighbour list."""
+    center_indices = neighbor_list("i", atom, cutoff)
+    if nb == 2:
+        # quippy's distance_2b counts every ordered pair (i, j), including periodic images
+        return len(center_indices)
+
+    # distance_Nb order=3 counts the pairs of neighbours around every central atom
+    num_neighbours = np.bincount(center_indices, minlength=len(atom))
+    return int(np.sum(num_neighbours * (num_neighbours - 1) // 2))
+
+
+def count_num_of_descriptors(
+    atoms: list[Atoms],
+    nb: int,
+    cutoff: float,
+    num_processes: int | None = None,
+) -> ndarray:
+    """
+    Count the number of two-body or three-body descriptors of a list of structures.
+
+    Gives the same counts as 'compute_num_of_descriptor', but uses one neighbour list
+    per structure instead of building a quippy descriptor and computing its sizes.
+    The structures are distributed over a pool of worker processes.
+
+    Parameters
+    ----------
+    atoms: list[Atoms]
+        The structures to evaluate.
+    nb: int
+        Two-body or three-body interactions.
+    cutoff: float
+        Cutoff radius used to compute the dimensionality of the descriptor.
+    num_processes: int | None
+        Number of worker processes. Defaults to the number of CPUs.
+
+    Returns
+    -------
+    ndarray
+        The number of pairs or triplets of each structure.
+
+    """
+    if nb not in (2, 3):
+        raise ValueError(f"nb must be 2 or 3, got {nb}.")
+
+    num_processes = min(num_processes or os.cpu_count() or 1, len(atoms))
+    count = partial(_count_num_of_descriptor, nb=nb, cutoff=cutoff)
+    if num_processes <= 1:
+        return np.array([count(atom) for atom in atoms], dtype=int)
+
+    chunksize = max(1, -(-len(atoms) // (4 * num_processes)))
+    with mp.Pool(processes=num_processes) as pool:
+        return np.array(pool.map(count, atoms, chunksize=chunksize), dtype=int)
+
+
 def run_ace(num_processes_fit: int, script_name: str) -> None:
     """
     Julia-ACE script runner.
@@ -1926,26 +2189,142 @@ class CustomPotential(quippy.potential.Potential):
         return res
 
 
-def _compute_gap_energy(atom, gap_control: str, gap_label: str):
+_WORKER_GAP = None
+
+
+def _init_gap_worker(gap_control: str, gap_label: str) -> None:
+    """Load the GAP potential once for the lifetime of a pool worker."""
+    global _WORKER_GAP  # noqa: PLW0603
+    threadpool_limits(limits=1)
+    try:
+        _WORKER_GAP = CustomPotential(args_str=gap_control, param_filename=gap_label)
+    except Exception as exc:
+        # raised in the tasks instead, a failing initializer makes the pool
+        # restart its workers forever
+        _WORKER_GAP = exc
+
+
+def _evaluate_gap_chunk(
+    chunk: tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray],
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Evaluate a packed chunk of structures with the GAP potential of a pool worker."""
+    if isinstance(_WORKER_GAP, Exception):
+        raise _WORKER_GAP
+    numbers, positions, cells, pbcs, n_atoms = chunk
+    offsets = np.concatenate([[0], np.cumsum(n_atoms)])
+    energies = np.empty(len(n_atoms))
+    forces = np.empty((offsets[-1], 3))
+    stresses = np.full((len(n_atoms), 6), np.nan)
+    for k, (start, end) in enumerate(zip(offsets[:-1], offsets[1:])):
+        atom = Atoms(
+            numbers=numbers[start:end],
+            positions=positions[start:end],
+            cell=cells[k],
+            pbc=pbcs[k],
+        )
+        atom.calc = _WORKER_GAP
+        energies[k] = atom.get_potential_energy()
+        forces[start:end] = atom.get_forces()
+        if "stress" in atom.info:
+            stresses[k] = atom.info["stress"]
+
+    return energies, forces, stresses
+
+
+class GapEvaluator:
     """
-    Compute potential energy of a single ASE Atoms object.
+    A pool of workers that each hold a single GAP potential.
+
+    The GAP XML file is parsed once per worker in the pool initializer instead of once
+    per structure. Structures are sent to the workers in chunks of packed arrays and
+    the energies, forces and, if calculated, stresses come back as arrays as well.
 
     Parameters
     ----------
-    atom : ase.Atoms
-        The Atoms object for which to compute the potential energy.
-    gap_control : str
-        Control string specifying the GAP potential configuration
-        (e.g., "Potential xml_label=<label>").
-    gap_label : str
+    xml_file: str
         The GAP XML potential file.
+    num_processes: int | None
+        Number of worker processes. Defaults to the number of CPUs.
+    chunksize: int | None
+        Number of structures per task. If None, the structures are split into
+        about four chunks per worker.
     """
-    pot = CustomPotential(args_str=gap_control, param_filename=gap_label)
-    atom.calc = pot
-    atom.info["energy"] = atom.get_potential_energy()
-    atom.arrays["force"] = atom.get_forces()
-    atom.calc = None
-    return atom
+
+    def __init__(
+        self,
+        xml_file: str,
+        num_processes: int | None = None,
+        chunksize: int | None = None,
+    ):
+        self.xml_file = xml_file
+        self.gap_control = "Potential xml_label=" + extract_gap_label(xml_file)
+        self.num_processes = num_processes or os.cpu_count() or 1
+        self.chunksize = chunksize
+        self._pool = None
+
+    def __enter__(self):
+        """Enter the context of the evaluator."""
+        return self
+
+    def __exit__(self, *args):
+        """Shut down the worker pool when leaving the context."""
+        self.close()
+
+    def evaluate(
+        self, atoms: list[Atoms]
+    ) -> tuple[np.ndarray, list[np.ndarray], np.ndarray]:
+        """
+        Evaluate a list of structures.
+
+        Parameters
+        ----------
+        atoms: list[Atoms]
+            The structures to evaluate.
+
+        Returns
+        -------
+        tuple[np.ndarray, list[np.ndarray], np.ndarray]
+            The energy, the forces and the stress in Voigt notation of each structure,
+            in the order of the input. Stresses that were not calculated are NaN.
+        """
+        if len(atoms) == 0:
+            return np.empty(0), [], np.empty((0, 6))
+
+        if self._pool is None:
+            self._pool = mp.Pool(
+                processes=self.num_processes,
+                initializer=_init_gap_worker,
+                initargs=(self.gap_control, self.xml_file),
+            )
+
+        chunksize = self.chunksize or max(1, -(-len(atoms) // (4 * self.num_processes)))
+        chunks = []
+        for start in range(0, len(atoms), chunksize):
+            chunk = atoms[start : start + chunksize]
+            chunks.append(
+                (
+                    np.concatenate([atom.numbers for atom in chunk]),
+                    np.concatenate([atom.positions for atom in chunk]),
+                    np.array([atom.cell.array for atom in chunk]),
+                    np.array([atom.pbc for atom in chunk]),
+                    np.array([len(atom) for atom in chunk]),
+                )
+            )
+
+        results = self._pool.map(_evaluate_gap_chunk, chunks)
+        energies = np.concatenate([result[0] for result in results])
+        forces = np.concatenate([result[1] for result in results])
+        stresses = np.concatenate([result[2] for result in results])
+        split_indices = np.cumsum([len(atom) for atom in atoms])[:-1]
+
+        return energies, np.split(forces, split_indices), stresses
+
+    def close(self) -> None:
+        """Shut down the worker pool."""
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
 
 
 def run_ase_gap(
@@ -1969,14 +2348,18 @@ def run_ase_gap(
     glue_xml: bool
         Use the glue.xml core potential instead of fitting 2b terms.
     """
-    gap_control = "Potential xml_label=" + extract_gap_label(xml_file)
     atoms = ase.io.read(data_path, index=":")
-    eval_worker = partial(
-        _compute_gap_energy, gap_control=gap_control, gap_label=xml_file
-    )
-    with threadpool_limits(limits=1), mp.Pool(processes=num_processes_fit) as pool:
-        atoms_eval = pool.map(eval_worker, atoms)
-    ase.io.write(filename, atoms_eval, format="extxyz")
+    with GapEvaluator(xml_file, num_processes=num_processes_fit) as evaluator:
+        energies, forces, stresses = evaluator.evaluate(atoms)
+
+    for atom, energy, force, stress in zip(atoms, energies, forces, stresses):
+        atom.calc = None
+        atom.info["energy"] = energy
+        atom.arrays["forces"] = force
+        atom.arrays["force"] = force
+        if not np.isnan(stress).any():
+            atom.info["stress"] = stress
+    ase.io.write(filename, atoms, format="extxyz")
 
 
 def run_nep(gpu_identifier_indices: list[int]) -> None:
@@ -2151,7 +2534,8 @@ def write_after_distillation_data_split(
     test_name: str = "test.extxyz",
     force_label: str = "REF_forces",
     energy_label: str = "REF_energy",
-) -> None:
+    dataset: AtomsDataset | None = None,
+) -> tuple[list[Atoms], list[Atoms]]:
     """
     Write train.extxyz and test.extxyz after data distillation and split.
 
@@ -2176,12 +2560,22 @@ def write_after_distillation_data_split(
         label of the force entries.
     energy_label: str
         label of the energy entries.
+    dataset: AtomsDataset | None
+        The already loaded VASP reference data. If None, it is read from vasp_ref_name.
+
+    Returns
+    -------
+    tuple[list[Atoms], list[Atoms]]
+        The train and test structures that were written.
     """
+    if dataset is None:
+        dataset = AtomsDataset.from_extxyz(vasp_ref_name)
+
     # reject structures with large force components
     atoms = (
-        data_distillation(vasp_ref_name, force_max, force_label)
+        data_distillation(dataset, force_max, force_label)
         if distillation
-        else ase.io.read(vasp_ref_name, index=":")
+        else dataset.to_atoms()
     )
 
     # split dataset into training and test datasets
@@ -2192,6 +2586,8 @@ def write_after_distillation_data_split(
     ase.io.write(train_name, train_structures, format="extxyz", append=True)
     ase.io.write(test_name, test_structures, format="extxyz", append=True)
 
+    return train_structures, test_structures
+
 
 def mace_virial_format_conversion(
     atoms: list[Atoms], ref_virial_name: str, out_file_name: str
@@ -2215,3 +2611,170 @@ def mace_virial_format_conversion(
             formatted_atoms.append(at)
 
     write(out_file_name, formatted_atoms, format="extxyz")
+
+
+FIT_CODE_PACKAGES = {
+    "GAP": "quippy-ase",
+    "NEP": "calorine",
+    "NEQUIP": "nequip",
+    "M3GNET": "matgl",
+    "MACE": "mace-torch",
+}
+
+
+def file_digest(file_path: str | Path) -> str:
+    """
+    Return the SHA-256 digest of the content of a file.
+
+    Parameters
+    ----------
+    file_path: str | Path
+        Path of the file to hash.
+
+    Returns
+    -------
+    str
+        The hexadecimal digest.
+    """
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as file:
+        for block in iter(partial(file.read, 1024**2), b""):
+            digest.update(block)
+
+    return digest.hexdigest()
+
+
+def fit_cache_key(
+    data_files: dict[str, str | Path],
+    mlip_type: str,
+    fit_settings: dict,
+) -> str:
+    """
+    Return the key of a fit in the fit cache.
+
+    The key is a digest of the content of the training and test data, the fit settings,
+    e.g. the model_dump of the hyperparameters, and the versions of autoplex and of the
+    package that performs the fit.
+
+    Parameters
+    ----------
+    data_files: dict[str, str | Path]
+        The training and test data files of the fit, keyed by a name that does not
+        depend on their location, e.g. 'phonon/train.extxyz'.
+    mlip_type: str
+        The MLIP type, e.g. 'GAP' or 'MACE'.
+    fit_settings: dict
+        All settings that change the fitted model. Must be JSON serializable, other
+        values are converted with str.
+
+    Returns
+    -------
+    str
+        The hexadecimal key.
+    """
+    try:
+        fit_code_version = version(FIT_CODE_PACKAGES[mlip_type])
+    except (KeyError, PackageNotFoundError):
+        fit_code_version = None
+
+    key = {
+        "data": {name: file_digest(file) for name, file in data_files.items()},
+        "mlip_type": mlip_type,
+        "fit_settings": fit_settings,
+        "autoplex_version": __version__,
+        "fit_code_version": fit_code_version,
+    }
+
+    return hashlib.sha256(
+        json.dumps(key, sort_keys=True, default=str).encode()
+    ).hexdigest()
+
+
+class FitCache(DiskCache):
+    """
+    A persistent on-disk cache of fitted potentials.
+
+    Each entry is a copy of the directory of a finished fit job together with the
+    relative mlip paths and the training and test errors. On a hit, the files are
+    copied into the new job directory, so that restarted or resubmitted workflows
+    with identical data and hyperparameters skip the fit. When the cache grows beyond
+    'max_size', the least recently used entries are removed.
+
+    Parameters
+    ----------
+    cache_dir: str | Path
+        Root directory of the cache.
+    max_size: float
+        Maximum size of the cache in GB.
+    """
+
+    def __init__(self, cache_dir: str | Path, max_size: float = 10.0):
+        super().__init__(cache_dir, max_size)
+
+    def get(self, key: str, job_dir: str | Path) -> dict | None:
+        """
+        Restore a cached fit into a job directory.
+
+        Parameters
+        ----------
+        key: str
+            The key of the fit, see 'fit_cache_key'.
+        job_dir: str | Path
+            The directory the cached files are copied to.
+
+        Returns
+        -------
+        dict | None
+            The mlip_path list, train_error and test_error of the cached fit, or None
+            if the fit is not cached.
+        """
+        job_dir = Path(job_dir)
+        with self._locked(shared=True) as index:
+            entry = index["items"].get(key)
+            if entry is None or not (self.path / key).is_dir():
+                return None
+            shutil.copytree(self.path / key, job_dir, dirs_exist_ok=True)
+            self._touch(key)
+
+        return {
+            "mlip_path": [job_dir / mlip_path for mlip_path in entry["mlip_path"]],
+            "train_error": entry["train_error"],
+            "test_error": entry["test_error"],
+        }
+
+    def put(self, key: str, job_dir: str | Path, result: dict) -> None:
+        """
+        Store the files and the result of a finished fit.
+
+        Parameters
+        ----------
+        key: str
+            The key of the fit, see 'fit_cache_key'.
+        job_dir: str | Path
+            The directory of the fit job. All of its files are stored.
+        result: dict
+            The mlip_path list, train_error and test_error of the fit. All mlip paths
+            must be located in job_dir.
+        """
+        job_dir = Path(job_dir).resolve()
+        mlip_paths = [
+            os.path.relpath(Path(mlip_path).resolve(), job_dir)
+            for mlip_path in result["mlip_path"]
+        ]
+        if any(mlip_path.startswith("..") for mlip_path in mlip_paths):
+            logging.warning("Fit is not cached, its mlip_path is outside the job dir")
+            return
+
+        with self._locked() as index:
+            # a fit with the same key, e.g. of a concurrent job, is kept
+            if key not in index["items"] or not (self.path / key).is_dir():
+                shutil.rmtree(self.path / key, ignore_errors=True)
+                shutil.copytree(job_dir, self.path / key)
+                index["items"][key] = {
+                    "mlip_path": mlip_paths,
+                    "train_error": result["train_error"],
+                    "test_error": result["test_error"],
+                }
+            self._touch(key)
+            self._evict(index)
+            self._write_index(index)
@@ -863,6 +863,19 @@ class BcurParams(AutoplexBaseModel):
     bolt_max_num: int = Field(
         default=3000, description="Maximum number of Boltzmann selections"
     )
+    cur_memory_budget: float | None = Field(
+        default=None,
+        description="Maximum memory in GB for the CUR kernel matrix. Larger kernels "
+        "are streamed in row blocks. If None, the full kernel is built",
+    )
+    descriptor_cache_dir: str | None = Field(
+        default=None,
+        description="Directory of a persistent SOAP descriptor cache shared "
+        "between RSS iterations. If None, descriptors are not cached",
+    )
+    descriptor_cache_size: float = Field(
+        default=10.0, description="Maximum size of the descriptor cache in GB"
+    )
 
 
 class BuildcellOptions(AutoplexBaseModel):
@@ -0,0 +1,209 @@
+import shutil
+
+import numpy as np
+from ase.build import bulk
+from ase.calculators.singlepoint import SinglePointCalculator
+from ase.io import read, write
+
+from autoplex.data.common.dataset import AtomsDataset
+
+
+def test_dataset_round_trip(test_dir, tmp_path):
+    file = test_dir / "fitting" / "ref_files" / "vasp_ref.extxyz"
+    atoms = read(file, index=":")
+    dataset = AtomsDataset.from_extxyz(file)
+
+    assert len(dataset) == len(atoms)
+    assert np.array_equal(dataset.n_atoms, [len(at) for at in atoms])
+    assert np.allclose(dataset.get_info("REF_energy"), [at.info["REF_energy"] for at in atoms])
+    assert np.allclose(dataset.volumes, [at.get_volume() for at in atoms])
+    assert np.allclose(
+        dataset.frame_max(np.abs(dataset.arrays["REF_forces"])),
+        [np.abs(at.arrays["REF_forces"]).max() for at in atoms],
+    )
+
+    for at, at_dataset in zip(atoms, dataset):
+        assert at == at_dataset
+        assert np.allclose(at.arrays["REF_forces"], at_dataset.arrays["REF_forces"])
+        assert np.allclose(at.info["REF_virial"], at_dataset.info["REF_virial"])
+        assert at.info["config_type"] == at_dataset.info["config_type"]
+
+    dataset.write(tmp_path / "copy.extxyz")
+    atoms_copy = read(tmp_path / "copy.extxyz", index=":")
+    assert [at.info["data_type"] for at in atoms_copy] == [at.info["data_type"] for at in atoms]
+
+
+def test_dataset_select_and_concatenate():
+    atoms = []
+    for i, a in enumerate(np.linspace(5.2, 5.6, 5)):
+        at = bulk("Si", a=a) * (1, 1, i + 1)
+        at.info["config_type"] = "bulk"
+        at.calc = SinglePointCalculator(
+            at, energy=-5.0 * len(at), forces=np.full((len(at), 3), float(i))
+        )
+        atoms.append(at)
+    # a frame with an extra info key and per-atom array
+    atoms[2].info["rss_group"] = "initial"
+    atoms[2].new_array("force_atom_sigma", np.ones(len(atoms[2])))
+
+    dataset = AtomsDataset.from_atoms(atoms)
+    assert dataset.calc_keys == {"energy", "forces"}
+    assert dataset.info["rss_group"] == [None, None, "initial", None, None]
+    assert list(dataset.array_frames["force_atom_sigma"]) == [False, False, True, False, False]
+
+    subset = dataset[[3, 2]]
+    assert len(subset) == 2
+    assert np.array_equal(subset.n_atoms, [8, 6])
+    assert subset[0].get_potential_energy() == -40.0
+    assert np.all(subset[0].get_forces() == 3.0)
+    assert "force_atom_sigma" not in subset[0].arrays
+    assert np.all(subset[1].arrays["force_atom_sigma"] == 1.0)
+    assert subset[1].info["rss_group"] == "initial"
+
+    masked = dataset[dataset.get_info("energy") < -25.0]
+    assert np.array_equal(masked.n_atoms, [6, 8, 10])
+
+    joined = AtomsDataset.concatenate([dataset[:2], subset])
+    assert len(joined) == 4
+    assert np.array_equal(joined.n_atoms, [2, 4, 8, 6])
+    assert joined[3] == atoms[2]
+    assert joined.info["rss_group"] == [None, None, None, "initial"]
+
+
+def test_binary_database(test_dir, tmp_path):
+    from autoplex.data.common.dataset import (
+        database_to_extxyz,
+        extxyz_to_database,
+        read_dataset,
+        read_previous_dataset,
+    )
+
+    file = test_dir / "fitting" / "ref_files" / "vasp_ref.extxyz"
+    atoms = read(file, index=":")
+    # columns that are missing in some frames or of mixed type
+    del atoms[0].info["REF_virial"]
+    atoms[1].info["comment"] = {"source": "test"}
+    atoms[2].info["comment"] = "note"
+    dataset = AtomsDataset.from_atoms(atoms)
+
+    extxyz_to_database(file, tmp_path / "vasp_ref_db")
+    assert read_dataset(tmp_path / "vasp_ref_db").get_info("config_type").tolist() == [
+        at.info["config_type"] for at in atoms
+    ]
+
+    dataset.save(tmp_path / "train_db")
+    loaded = AtomsDataset.load(tmp_path / "train_db")
+    assert not loaded.positions.flags.owndata  # memory-mapped, not copied
+    assert loaded.info["REF_virial"][0] is None
+    assert loaded.info["comment"][1:3] == [{"source": "test"}, "note"]
+    for at, at_loaded in zip(atoms, loaded):
+        assert at == at_loaded
+        assert np.allclose(at.arrays["REF_forces"], at_loaded.arrays["REF_forces"])
+        assert at.info["REF_energy"] == at_loaded.info["REF_energy"]
+        assert at.info["data_type"] == at_loaded.info["data_type"]
+
+    # the binary copy is preferred over the extxyz file of a previous database
+    dataset[:3].write(tmp_path / "train.extxyz")
+    assert len(read_previous_dataset(tmp_path, "train.extxyz")) == len(atoms)
+    assert read_previous_dataset(tmp_path, "test.extxyz") is None
+
+    database_to_extxyz(tmp_path / "train_db", tmp_path / "converted.extxyz")
+    assert len(read(tmp_path / "converted.extxyz", index=":")) == len(atoms)
+
+
+def test_incremental_database(test_dir, tmp_path, monkeypatch):
+    from autoplex.data.common.dataset import DatabaseManifest, read_previous_dataset
+    from autoplex.data.common.jobs import preprocess_data
+
+    atoms = read(test_dir / "fitting" / "ref_files" / "vasp_ref.extxyz", index=":")
+    # regularisation also deletes the virial of dimers
+    atoms[-1].info["config_type"] = "dimer"
+    file = tmp_path / "vasp_ref.extxyz"
+    write(file, atoms)
+    isolated_atom_energies = {
+        int(at.numbers[0]): at.info["REF_energy"]
+        for at in atoms
+        if at.info["config_type"] == "IsolatedAtom"
+    }
+
+    def run_iterations(name, **kwargs):
+        pre_database_dir = None
+        for i in range(3):
+            job_dir = tmp_path / f"{name}_{i}"
+            job_dir.mkdir()
+            monkeypatch.chdir(job_dir)
+            pre_database_dir = preprocess_data.original(
+                vasp_ref_dir=str(file),
+                test_ratio=0.0,
+                regularization=True,
+                isolated_atom_energies=isolated_atom_energies,
+                pre_database_dir=pre_database_dir,
+                **kwargs,
+            )
+        return pre_database_dir
+
+    rewritten_dir = run_iterations("rewritten")
+    incremental_dir = run_iterations("incremental", incremental_database=True)
+
+    def assert_same_frames(frames, other_frames):
+        assert len(other_frames) == len(frames)
+        for at, other in zip(frames, other_frames):
+            assert at == other
+            assert at.info.keys() == other.info.keys()
+            for key, value in at.info.items():
+                assert np.array_equal(value, other.info[key])
+            assert at.arrays.keys() == other.arrays.keys()
+            for key, value in at.arrays.items():
+                assert np.array_equal(value, other.arrays[key])
+            assert (at.calc is None) == (other.calc is None)
+            if at.calc is not None:
+                assert at.calc.results.keys() == other.calc.results.keys()
+                for key, value in at.calc.results.items():
+                    assert np.array_equal(value, other.calc.results[key])
+
+    for file_name in ("train.extxyz", "test.extxyz"):
+        rewritten = read(rewritten_dir / file_name, index=":")
+        # the merged files are only written when they are needed, e.g. for fitting
+        assert not (incremental_dir / file_name).exists()
+        read_previous_dataset(incremental_dir, file_name).write(tmp_path / file_name)
+        incremental = read(tmp_path / file_name, index=":")
+        assert_same_frames(rewritten, incremental)
+
+    # isolated atoms and dimers are changed beyond their sigma values
+    train = read(rewritten_dir / "train.extxyz", index=":")
+    assert any(
+        at.info["config_type"] == "IsolatedAtom" and at.calc is None for at in train
+    )
+    assert any(
+        at.info["config_type"] == "dimer" and "REF_virial" not in at.info
+        for at in train
+    )
+
+    # every iteration only stores its own frames
+    manifest = DatabaseManifest.load(incremental_dir)
+    assert [segment["n_frames"] for segment in manifest.sets["train"]["segments"]] == [
+        10,
+        10,
+        10,
+    ]
+    assert not (incremental_dir / "train_segment_1_db").exists()
+
+    (tmp_path / "fit").mkdir()
+    manifest.write_extxyz(tmp_path / "fit")
+    assert_same_frames(
+        read(rewritten_dir / "train.extxyz", index=":"),
+        read(tmp_path / "fit" / "train.extxyz", index=":"),
+    )
+
+    # the database tree can be moved, e.g. to another job root
+    for i in range(3):
+        shutil.copytree(
+            tmp_path / f"incremental_{i}", tmp_path / "moved" / f"incremental_{i}"
+        )
+        shutil.rmtree(tmp_path / f"incremental_{i}")
+    moved = read_previous_dataset(tmp_path / "moved" / "incremental_2", "train.extxyz")
+    moved.write(tmp_path / "moved_train.extxyz")
+    assert_same_frames(
+        read(rewritten_dir / "train.extxyz", index=":"),
+        read(tmp_path / "moved_train.extxyz", index=":"),
+    )
@@ -3,15 +3,24 @@ import numpy as np
 import matplotlib.pyplot as plt
 from pymatgen.core.structure import Structure
 from autoplex.data.common.utils import (
+    DescriptorCache,
+    DescriptorEngine,
+    build_structure_table,
+    calc_enthalpies,
+    calc_cur_scores,
+    cur_select,
     energy_plot,
     force_plot,
     plot_energy_forces,
     filter_outlier_energy,
     filter_outlier_forces,
+    flat_histogram_log_weights,
     mc_rattle,
+    parallel_calc_descriptor_vec,
     random_vary_angle,
     scale_cell,
-    std_rattle
+    std_rattle,
+    weighted_sample_without_replacement,
 )
 
 
@@ -83,6 +92,30 @@ def test_random_vary_angle():
         assert np.allclose((struct.lattice.matrix).all(), (structure.lattice.matrix).all(), atol=0.5)
 
 
+
+def test_check_distances():
+    from ase.build import bulk
+    from pymatgen.io.ase import AseAtomsAdaptor
+
+    from autoplex.data.common.utils import check_distances
+
+    atoms = bulk("Si", cubic=True) * (3, 3, 3)
+    structure = AseAtomsAdaptor.get_structure(atoms)
+    assert check_distances(atoms, min_distance=2.3)
+    assert check_distances(structure, min_distance=2.3)
+    assert not check_distances(structure, min_distance=2.4)
+
+    # a small cell whose lattice vectors are shorter than min_distance
+    assert check_distances(bulk("Cu", a=1.4, cubic=True)[:1], min_distance=1.5)
+
+    rng = np.random.default_rng(0)
+    for _ in range(5):
+        rattled = atoms.copy()
+        rattled.positions += rng.normal(scale=0.3, size=rattled.positions.shape)
+        distances = rattled.get_all_distances(mic=True)
+        np.fill_diagonal(distances, np.inf)
+        assert check_distances(rattled, 1.8) == bool(distances.min() >= 1.8)
+
 # adapt to check for each input possible e.g. inputting range/manual scale_factors?
 def test_scale_cell():
     structure = Structure(
@@ -105,6 +138,151 @@ def test_scale_cell():
                            atol=0.1 * np.array(structure.lattice.abc))
 
 
+def test_calc_cur_scores_streamed_kernel():
+    rng = np.random.default_rng(42)
+    descs = rng.random((30, 60))
+    descs /= np.linalg.norm(descs, axis=0)
+
+    np.random.seed(42)
+    dense_scores = calc_cur_scores(descs, kernel_exp=4, num=5)
+    np.random.seed(42)
+    # budget far below the 60 x 60 kernel, forcing blocks of only a few rows
+    streamed_scores = calc_cur_scores(descs, kernel_exp=4, num=5, memory_budget=1e-7)
+
+    assert len(dense_scores) == 60
+    assert np.isclose(np.sum(dense_scores), 1.0)
+    assert np.allclose(dense_scores, streamed_scores, atol=1e-8)
+
+
+def test_descriptor_engine():
+    from ase.build import bulk
+
+    descriptor = ("soap l_max=3 n_max=3 atom_sigma=0.5 cutoff=4.0 n_species=1 species_Z={14} "
+                  "cutoff_transition_width=1.0 average=True")
+    atoms = [bulk("Si", a=a) for a in np.linspace(5.2, 5.6, 7)]
+
+    with DescriptorEngine(descriptor, num_processes=2, chunksize=3) as engine:
+        descs = engine.calc(atoms)
+        # the same worker pool is reused by a second call
+        descs_again = engine.calc(atoms[:2])
+
+    assert len(descs) == 7
+    for at, desc in zip(atoms, descs):
+        ref = parallel_calc_descriptor_vec(at.copy(), descriptor).info["descriptor_vec"]
+        assert np.allclose(desc, ref)
+    assert np.allclose(descs_again[1], descs[1])
+
+
+def test_cur_select_keeps_calculator():
+    from ase.build import bulk
+    from ase.calculators.singlepoint import SinglePointCalculator
+
+    descriptor = ("soap l_max=3 n_max=3 atom_sigma=0.5 cutoff=4.0 n_species=1 species_Z={14} "
+                  "cutoff_transition_width=1.0 average=True")
+    atoms = [bulk("Si", a=a) for a in np.linspace(5.2, 5.6, 5)]
+    for i, at in enumerate(atoms):
+        at.calc = SinglePointCalculator(at, energy=-float(i), forces=np.zeros((2, 3)))
+
+    selected = cur_select(atoms, descriptor, kernel_exp=4, select_nums=3, stochastic=False)
+
+    assert len(selected) == 3
+    for at in selected:
+        original = next(a for a in atoms if np.allclose(a.cell, at.cell))
+        assert at is not original
+        assert at.get_potential_energy() == original.get_potential_energy()
+        assert np.allclose(at.get_forces(), 0.0)
+
+
+def test_structure_table_enthalpies():
+    from ase.build import bulk
+    from ase.units import GPa
+
+    atoms = [bulk("Si", a=5.4), bulk("NaCl", "rocksalt", a=5.6), bulk("Si", a=5.6) * (2, 1, 1)]
+    for i, atom in enumerate(atoms):
+        atom.info["REF_energy"] = -3.0 * len(atom) + 0.1 * i
+    isolated_atom_energies = {11: -1.0, 14: -0.5, 17: -0.3}
+    pressures = [0.0, 1.0, 10.0]
+
+    table = build_structure_table(atoms, energy_label="REF_energy")
+    assert table["species_counts"][1, 11] == 1
+    assert table["species_counts"][2, 14] == 4
+    assert np.allclose(table["volume"], [atom.get_volume() for atom in atoms])
+
+    ref = [
+        (atom.info["REF_energy"] - sum(isolated_atom_energies[z] for z in atom.get_atomic_numbers())
+         + atom.get_volume() * p * GPa) / len(atom)
+        for atom, p in zip(atoms, pressures)
+    ]
+    assert np.allclose(calc_enthalpies(table, isolated_atom_energies, pressures), ref)
+
+
+def test_flat_histogram_sampling():
+    rng = np.random.default_rng(0)
+    enthalpies = rng.normal(size=200)
+    kt = 0.3
+
+    # reference: the per-structure loop the weights replace
+    histo = np.histogram(enthalpies)
+    ref = []
+    for H in enthalpies:
+        bin_i = min(np.searchsorted(histo[1][1:], H, side="right"), len(histo[0]) - 1)
+        ref.append(np.exp(-(H - enthalpies.min()) / kt) / histo[0][bin_i])
+    log_weights = flat_histogram_log_weights(enthalpies, kt)
+    assert np.allclose(np.exp(log_weights), ref)
+
+    np.random.seed(42)
+    selected = weighted_sample_without_replacement(log_weights, 50)
+    assert len(selected) == 50
+    assert len(set(selected)) == 50
+    assert len(weighted_sample_without_replacement(log_weights, 500)) == 200
+
+    # an item carrying almost all the weight is drawn first
+    log_weights = np.zeros(10)
+    log_weights[3] = 50.0
+    assert weighted_sample_without_replacement(log_weights, 3)[0] == 3
+
+
+def test_descriptor_cache(tmp_path):
+    from ase.build import bulk
+
+    descriptor = ("soap l_max=3 n_max=3 atom_sigma=0.5 cutoff=4.0 n_species=1 species_Z={14} "
+                  "cutoff_transition_width=1.0 average=True")
+    atoms = [bulk("Si", a=a) for a in np.linspace(5.2, 5.6, 4)]
+
+    with DescriptorEngine(descriptor, num_processes=2) as engine:
+        ref = engine.calc(atoms)
+
+    cache = DescriptorCache(tmp_path, descriptor)
+    assert cache.get(atoms) == [None] * 4
+
+    with DescriptorEngine(descriptor, num_processes=2, cache=cache) as engine:
+        descs = engine.calc(atoms[:2])
+        descs = engine.calc(atoms)
+
+    for desc, desc_ref in zip(descs, ref):
+        assert np.allclose(desc, desc_ref)
+    # a new cache object on the same directory sees the stored vectors
+    cached = DescriptorCache(tmp_path, descriptor).get([atom.copy() for atom in atoms])
+    for desc, desc_ref in zip(cached, ref):
+        assert np.allclose(desc, desc_ref)
+    # lookups do not rewrite the index
+    index_state = cache.index_file.stat().st_mtime_ns, cache.index_file.read_text()
+    cache.get(atoms)
+    assert (cache.index_file.stat().st_mtime_ns, cache.index_file.read_text()) == index_state
+
+    # shards that are not in the index, e.g. of an interrupted job, are removed
+    orphan = cache.path / "orphan.npy"
+    np.save(orphan, np.zeros(4))
+    cache.put(atoms[:1], ref[:1])
+    assert not orphan.exists()
+    assert all(desc is not None for desc in cache.get(atoms))
+
+    # a cache that cannot hold a single shard evicts everything
+    tiny_cache = DescriptorCache(tmp_path, descriptor, max_size=1e-9)
+    tiny_cache.put(atoms[:1], ref[:1])
+    assert tiny_cache.get(atoms) == [None] * 4
+
+
 def test_energy_forces(clean_dir, test_dir):
     parent_dir = os.getcwd()
     os.chdir(test_dir / "data" / "ref_data")
@@ -354,6 +354,21 @@ def test_output_from_scratch_wo_buildcell_option(memory_jobstore, clean_dir):
     assert len(read(job_rss.output.resolve(memory_jobstore), index=":")) == 3
 
 
+def test_batched_generation(memory_jobstore, clean_dir):
+    from ase.io import read
+    job_rss = RandomizedStructure(struct_number=6,
+                                  tag='SiO2',
+                                  buildcell_option={'VARVOL': 20,
+                                                    'SYMMOPS': '1-2'},
+                                  num_processes=2,
+                                  batched_generation=True).make()
+
+    responses = run_locally(job_rss, ensure_success=True, create_folders=True, store=memory_jobstore)
+    atoms = read(job_rss.output.resolve(memory_jobstore), index=":")
+    assert [atom.info["unique_starting_index"] for atom in atoms] == list(range(6))
+    assert not any(file.startswith("tmp.") for file in os.listdir(responses[job_rss.uuid][1].output.rsplit("/", 1)[0]))
+
+
 def test_fragment_buildcell(test_dir, memory_jobstore, clean_dir):
     from ase.io import read
     import numpy as np
@@ -395,4 +410,15 @@ def test_output_from_cell_seed(test_dir, memory_jobstore, clean_dir):
                                   num_processes=3).make()
 
     responses = run_locally(job_rss, ensure_success=True, create_folders=True, store=memory_jobstore)
-    assert len(read(job_rss.output.resolve(memory_jobstore), index=":")) == 3
\ No newline at end of file
+    assert len(read(job_rss.output.resolve(memory_jobstore), index=":")) == 3
+
+def test_native_generation_fails(memory_jobstore, clean_dir):
+    job_rss = RandomizedStructure(struct_number=4,
+                                  tag='Si',
+                                  buildcell_option={'GENERATOR': 'native',
+                                                    'NATOM': '{8,10}',
+                                                    'MINSEP': 50},
+                                  num_processes=2).make()
+
+    responses = run_locally(job_rss, create_folders=True, store=memory_jobstore)
+    assert job_rss.uuid not in responses or responses[job_rss.uuid][1].output is None
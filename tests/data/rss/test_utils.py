@@ -22,6 +22,629 @@ def test_hookean(test_dir, memory_jobstore):
     f_constrained = atoms.get_forces()
 
     assert np.all(
-        np.isclose(f[0] - f_constrained[0],
-                   np.array([-0.62623775, 3.50041634, 7.94378925]))
-    )
\ No newline at end of file
+        np.isclose(
+            f[0] - f_constrained[0], np.array([-0.62623775, 3.50041634, 7.94378925])
+        )
+    )
+
+
+def test_hookean_pair_repulsion():
+    from ase.build import bulk
+    from ase.calculators.emt import EMT
+
+    from autoplex.data.rss.utils import HookeanPairRepulsion, set_rss_constraints
+
+    atoms = bulk("Cu", a=3.6, cubic=True) * (2, 2, 2)
+    atoms.numbers[::3] = 28
+    atoms.rattle(0.4, seed=1)
+    hookean_paras = {(29, 29): (100, 2.4), (28, 29): (50, 2.3), (28, 28): (0, 2.0)}
+
+    atoms_pairs = atoms.copy()
+    pair_list = []
+    for i in range(len(atoms)):
+        for j in range(i + 1, len(atoms)):
+            pair = tuple(sorted(atoms.numbers[[i, j]]))
+            if pair in hookean_paras and hookean_paras[pair][0] != 0:
+                pair_list.append(HookeanRepulsion(i, j, *hookean_paras[pair]))
+    atoms_pairs.set_constraint(pair_list)
+    atoms_pairs.calc = EMT()
+
+    set_rss_constraints(
+        atoms,
+        hookean_repul=True,
+        hookean_paras={
+            "(29, 28)": (50, 2.3),
+            **{k: v for k, v in hookean_paras.items() if k != (28, 29)},
+        },
+        keep_symmetry=False,
+    )
+    atoms.calc = EMT()
+    (constraint,) = atoms.constraints
+    assert isinstance(constraint, HookeanPairRepulsion)
+    assert constraint.used is False
+
+    assert np.allclose(atoms.get_forces(), atoms_pairs.get_forces())
+    assert constraint.used
+    assert np.isclose(
+        atoms.get_potential_energy(apply_constraint=True),
+        atoms_pairs.get_potential_energy(apply_constraint=True),
+    )
+    assert atoms.get_potential_energy(apply_constraint=True) > (
+        atoms.get_potential_energy(apply_constraint=False)
+    )
+    # the constraint follows the species of the atoms
+    assert len(atoms[:10].constraints) == 1
+
+
+def test_minimize_structures_persistent_workers(tmp_path, monkeypatch):
+    from ase.build import bulk
+    from ase.calculators.emt import EMT
+    from pymatgen.io.ase import AseAtomsAdaptor
+
+    import autoplex.data.rss.utils as rss_utils
+
+    def load_emt(*args, **kwargs):
+        # record every model load of every worker process
+        (tmp_path / f"load_{os.getpid()}_{len(os.listdir(tmp_path))}").touch()
+        return EMT()
+
+    monkeypatch.setattr(rss_utils, "load_mlip_calculator", load_emt)
+    monkeypatch.chdir(tmp_path)
+
+    structures = [
+        AseAtomsAdaptor.get_structure(bulk("Cu", a=a, cubic=True))
+        for a in np.linspace(3.5, 3.7, 6)
+    ]
+    results = rss_utils.minimize_structures(
+        mlip_type="GAP",
+        mlip_path=[str(tmp_path)],
+        iteration_index="0_",
+        structures=structures,
+        scalar_exp_pressure=0,
+        max_steps=50,
+        num_processes_rss=2,
+        keep_symmetry=False,
+    )
+
+    assert len(results) == 6
+    assert len(list(tmp_path.glob("load_*"))) <= 2
+    for i in range(6):
+        traj = read(tmp_path / f"RSS_relax_results_traj_0_{i}.extxyz", index=":")
+        assert traj[-1].info["RSS_applied_pressure"] == 0
+
+
+def test_minimize_structures_broken_potential(tmp_path, monkeypatch):
+    import pytest
+    from ase.build import bulk
+    from pymatgen.io.ase import AseAtomsAdaptor
+
+    import autoplex.data.rss.utils as rss_utils
+
+    def load_broken_potential(*args, **kwargs):
+        raise RuntimeError("broken potential")
+
+    monkeypatch.setattr(rss_utils, "load_mlip_calculator", load_broken_potential)
+    monkeypatch.chdir(tmp_path)
+
+    structures = [
+        AseAtomsAdaptor.get_structure(bulk("Cu", a=a, cubic=True))
+        for a in np.linspace(3.5, 3.7, 4)
+    ]
+    with pytest.raises(RuntimeError, match="broken potential"):
+        rss_utils.minimize_structures(
+            mlip_type="GAP",
+            mlip_path=[str(tmp_path)],
+            iteration_index="0_",
+            structures=structures,
+            num_processes_rss=2,
+        )
+
+
+def test_relax_structures_batched_matches_fire(tmp_path, monkeypatch):
+    from ase.build import bulk
+    from ase.calculators.emt import EMT
+    from ase.constraints import UnitCellFilter
+    from ase.optimize import FIRE
+    from ase.units import GPa
+
+    from autoplex.data.rss.utils import (
+        CalculatorBatchEvaluator,
+        relax_structures_batched,
+    )
+
+    monkeypatch.chdir(tmp_path)
+    atoms = [
+        bulk("Cu", a=3.7, cubic=True),
+        bulk("Cu", a=3.5) * (2, 2, 1),
+        bulk("Cu", a=3.6, cubic=True) * (1, 1, 2),
+    ]
+    for i, at in enumerate(atoms):
+        at.rattle(0.05, seed=i)
+        at.info["unique_starting_index"] = f"0_{i}"
+        at.info["RSS_applied_pressure"] = 1.0 + i
+
+    references = []
+    for at in atoms:
+        cell_filter = UnitCellFilter(
+            at.copy(), scalar_pressure=at.info["RSS_applied_pressure"] * GPa
+        )
+        cell_filter.atoms.calc = EMT()
+        optimizer = FIRE(cell_filter, logfile=None)
+        frames = []
+        optimizer.attach(
+            lambda frames=frames, cell_filter=cell_filter: frames.append(
+                cell_filter.atoms.copy()
+            )
+        )
+        optimizer.run(fmax=1e-8, steps=10)
+        references.append(frames)
+
+    results = relax_structures_batched(
+        atoms,
+        CalculatorBatchEvaluator(EMT()),
+        batch_size=2,  # the third structure enters when the first two retire
+        max_steps=10,
+        force_tol=1e-8,
+    )
+
+    assert results == [None, None, None]
+    for i, frames in enumerate(references):
+        traj = read(tmp_path / f"RSS_relax_results_traj_0_{i}.extxyz", index=":")
+        assert len(traj) == len(frames) == 11
+        assert all(at.info["minim_stat"] == "unconverged" for at in traj)
+        assert traj[-1].info["RSS_applied_pressure"] == 1.0 + i
+        for at, frame in zip(traj, frames):
+            assert np.allclose(at.positions, frame.positions)
+            assert np.allclose(at.cell, frame.cell)
+
+
+def test_mace_batch_relaxation(test_dir, tmp_path, monkeypatch):
+    from ase.build import bulk
+    from mace.calculators import MACECalculator
+    from pymatgen.io.ase import AseAtomsAdaptor
+
+    from autoplex.data.rss.utils import load_batch_evaluator, minimize_structures
+
+    mlip_path = str(test_dir / "fitting" / "MACE")
+    evaluator = load_batch_evaluator("MACE", mlip_path)
+    calculator = MACECalculator(
+        model_paths=os.path.join(mlip_path, "checkpoints/MACE_model_run-123.model"),
+        device="cpu",
+    )
+
+    atoms = [bulk("Si", a=5.3), bulk("Si", a=5.5, cubic=True), bulk("Si", a=5.4) * 2]
+    for i, at in enumerate(atoms):
+        at.rattle(0.05, seed=i)
+    results = evaluator(atoms)
+    for at, result in zip(atoms, results):
+        at.calc = calculator
+        assert np.isclose(result["energy"], at.get_potential_energy(), atol=1e-4)
+        assert np.allclose(result["forces"], at.get_forces(), atol=1e-4)
+        assert np.allclose(result["stress"], at.get_stress(), atol=1e-5)
+
+    monkeypatch.chdir(tmp_path)
+    minimize_structures(
+        mlip_type="MACE",
+        mlip_path=[mlip_path],
+        iteration_index="0_",
+        structures=[AseAtomsAdaptor.get_structure(at) for at in atoms],
+        scalar_exp_pressure=1,
+        max_steps=20,
+        keep_symmetry=False,
+        batch_size=2,
+    )
+    for i in range(3):
+        traj = read(tmp_path / f"RSS_relax_results_traj_0_{i}.extxyz", index=":")
+        assert 1 < len(traj) <= 21
+        assert traj[-1].info["minim_stat"] in ("converged", "unconverged")
+        assert "RSS_applied_pressure" in traj[-1].info
+        assert "enthalpy" in traj[-1].info
+
+
+def test_minimize_structures_shared_queue(tmp_path, monkeypatch):
+    from ase.build import bulk
+    from ase.calculators.emt import EMT
+    from pymatgen.io.ase import AseAtomsAdaptor
+
+    import autoplex.data.rss.utils as rss_utils
+
+    monkeypatch.setattr(
+        rss_utils, "load_mlip_calculator", lambda *args, **kwargs: EMT()
+    )
+    monkeypatch.chdir(tmp_path)
+
+    structures = [
+        AseAtomsAdaptor.get_structure(bulk("Cu", a=a, cubic=True))
+        for a in np.linspace(3.5, 3.7, 6)
+    ]
+    queue = rss_utils.FileTaskQueue.create(
+        tmp_path / "queue", rss_utils.prepare_rss_atoms(structures[1:], "1_", 1)
+    )
+
+    rss_kwargs = {
+        "mlip_type": "GAP",
+        "mlip_path": [str(tmp_path)],
+        "iteration_index": "1_",
+        "scalar_exp_pressure": 0,
+        "max_steps": 50,
+        "num_processes_rss": 2,
+        "keep_symmetry": False,
+        "task_queue": str(tmp_path / "queue"),
+    }
+    results = rss_utils.minimize_structures(structures=structures[:1], **rss_kwargs)
+
+    assert len(results) == 6
+    assert sorted(queue.results()) == [f"{i:08d}.pkl" for i in range(5)]
+    assert not os.listdir(queue.pending_dir)
+    assert not os.listdir(queue.claimed_dir)
+    for i in range(6):
+        assert (tmp_path / f"RSS_relax_results_traj_1_{i}.extxyz").exists()
+
+    # a job that starts after the queue is drained only relaxes its own structures
+    assert rss_utils.minimize_structures(structures=[], **rss_kwargs) == []
+
+
+def test_minimize_structures_failure_releases_queue(tmp_path, monkeypatch):
+    import pytest
+    from ase.build import bulk
+    from ase.calculators.emt import EMT
+    from pymatgen.io.ase import AseAtomsAdaptor
+
+    import autoplex.data.rss.utils as rss_utils
+
+    def load_broken_potential(*args, **kwargs):
+        raise RuntimeError("broken potential")
+
+    monkeypatch.setattr(rss_utils, "load_mlip_calculator", load_broken_potential)
+    monkeypatch.chdir(tmp_path)
+
+    structures = [
+        AseAtomsAdaptor.get_structure(bulk("Cu", a=a, cubic=True))
+        for a in np.linspace(3.5, 3.7, 6)
+    ]
+    queue = rss_utils.FileTaskQueue.create(
+        tmp_path / "queue", rss_utils.prepare_rss_atoms(structures, "1_", 0)
+    )
+
+    with pytest.raises(RuntimeError, match="broken potential"):
+        rss_utils.minimize_structures(
+            mlip_type="GAP",
+            mlip_path=[str(tmp_path)],
+            iteration_index="1_",
+            structures=[],
+            num_processes_rss=2,
+            task_queue=str(tmp_path / "queue"),
+        )
+
+    # the claimed tasks are handed back to the other jobs
+    assert not os.listdir(queue.claimed_dir)
+    assert len(os.listdir(queue.pending_dir)) == 6
+
+    # a batched relaxation completes every task as soon as it has finished
+    class FailingEvaluator(rss_utils.CalculatorBatchEvaluator):
+        n_calls = 0
+
+        def __call__(self, atoms):
+            self.n_calls += 1
+            if self.n_calls > 3:
+                raise RuntimeError("broken potential")
+            return super().__call__(atoms)
+
+    monkeypatch.setattr(
+        rss_utils,
+        "load_batch_evaluator",
+        lambda *args, **kwargs: FailingEvaluator(EMT()),
+    )
+    structures = [
+        AseAtomsAdaptor.get_structure(bulk("Cu", a=a, cubic=True))
+        for a in (3.59, 3.3, 3.4, 3.5)
+    ]
+    queue = rss_utils.FileTaskQueue.create(
+        tmp_path / "batch_queue", rss_utils.prepare_rss_atoms(structures, "2_", 0)
+    )
+    with pytest.raises(RuntimeError, match="broken potential"):
+        rss_utils.minimize_structures(
+            mlip_type="GAP",
+            mlip_path=[str(tmp_path)],
+            iteration_index="2_",
+            structures=[],
+            batch_size=2,
+            scalar_exp_pressure=0,
+            keep_symmetry=False,
+            task_queue=str(tmp_path / "batch_queue"),
+        )
+
+    assert len(os.listdir(queue.done_dir)) == 1
+    assert not os.listdir(queue.claimed_dir)
+    assert len(os.listdir(queue.pending_dir)) == 3
+
+
+def test_rss_trajectory_writer(tmp_path, monkeypatch):
+    from ase.build import bulk
+    from ase.calculators.emt import EMT
+    from pymatgen.io.ase import AseAtomsAdaptor
+
+    import autoplex.data.rss.utils as rss_utils
+    from autoplex.data.common.utils import handle_rss_trajectory, read_rss_trajectory
+
+    monkeypatch.chdir(tmp_path)
+    enthalpies = [5.0, 3.0, -1.0, 2.0, 4.0, 1.0, 0.0, 3.0, 2.0, 1.0]
+
+    def write(file_name, **kwargs):
+        writer = rss_utils.RSSTrajectoryWriter(file_name, **kwargs)
+        for enthalpy in enthalpies:
+            frame = bulk("Cu")
+            frame.info.update({"energy": enthalpy, "enthalpy": enthalpy})
+            writer.append(frame)
+        assert len(writer) == len(enthalpies)
+        return writer.close(converged=True), frame
+
+    path, last_frame = write("every_4.traj", interval=4)
+    assert path == str(tmp_path / "every_4.traj")
+    # the last frame is labelled as in 'finalize_rss_trajectory'
+    assert last_frame.info["config_type"] == "converged_minimum"
+    assert "minim_stat" not in last_frame.info
+    traj = read_rss_trajectory(path)
+    assert [at.info["RSS_minim_iter"] for at in traj] == [0, 4, 8, 9]
+    assert all(at.info["minim_stat"] == "converged" for at in traj)
+
+    path, last_frame = write("last_3.traj", keep_last=3)
+    assert last_frame.info["config_type"] == "converged_minimum"
+    traj = read_rss_trajectory(path)
+    assert [at.info["RSS_minim_iter"] for at in traj] == [2, 7, 8, 9]
+    assert traj[0].info["enthalpy"] == -1.0
+
+    monkeypatch.setattr(
+        rss_utils, "load_mlip_calculator", lambda *args, **kwargs: EMT()
+    )
+    results = rss_utils.minimize_structures(
+        mlip_type="GAP",
+        mlip_path=[str(tmp_path)],
+        iteration_index="0_",
+        structures=[AseAtomsAdaptor.get_structure(bulk("Cu", a=3.7, cubic=True))],
+        scalar_exp_pressure=0,
+        max_steps=50,
+        keep_symmetry=False,
+        stream_traj=True,
+        traj_interval=2,
+    )
+    assert results == [str(tmp_path / "RSS_relax_results_traj_0_0.traj")]
+    atoms, pressures = handle_rss_trajectory(results, remove_traj_files=False)
+    assert atoms[0][-1].info["minim_stat"] == "converged"
+    assert all(at.info["RSS_minim_iter"] % 2 == 0 for at in atoms[0][:-1])
+    assert pressures[0][0] == 0
+
+
+def test_early_abort(tmp_path, monkeypatch):
+    from ase.build import bulk
+    from ase.calculators.emt import EMT
+    from pymatgen.io.ase import AseAtomsAdaptor
+
+    import autoplex.data.rss.utils as rss_utils
+
+    atoms = bulk("Cu", a=3.6, cubic=True)
+    atoms.calc = EMT()
+    atoms.info["RSS_applied_pressure"] = 0.2
+
+    record = rss_utils.EnthalpyRecord()
+    rss_utils.EarlyAbortMonitor(enthalpy_record=record).record_minimum(
+        atoms, -1.0 * len(atoms)
+    )
+    monitor = rss_utils.EarlyAbortMonitor(
+        enthalpy_margin=0.5, stagnation_steps=3, min_steps=2, enthalpy_record=record
+    )
+    assert monitor.check(atoms, 0.0) is None  # enthalpy criterion not active yet
+    assert monitor.check(atoms, 0.0) is None
+    assert "above the best minimum" in monitor.check(atoms, 0.0)
+
+    # minima at other pressures or of other records are not compared
+    compressed = atoms.copy()
+    compressed.calc = EMT()
+    compressed.info["RSS_applied_pressure"] = 5.0
+    monitor = rss_utils.EarlyAbortMonitor(
+        enthalpy_margin=0.5, min_steps=0, enthalpy_record=record
+    )
+    assert monitor.check(compressed, 0.0) is None
+    assert (
+        rss_utils.EarlyAbortMonitor(enthalpy_margin=0.5, min_steps=0).check(atoms, 0.0)
+        is None
+    )
+
+    monitor = rss_utils.EarlyAbortMonitor(stagnation_steps=2, min_steps=0)
+    atoms.rattle(0.05, seed=0)
+    assert [monitor.check(atoms, -10.0) for _ in range(2)] == [None, None]
+    assert "stagnated" in monitor.check(atoms, -10.0)
+
+    squeezed = bulk("Cu", a=2.0, cubic=True)
+    squeezed.calc = EMT()
+    assert "interatomic distance" in rss_utils.EarlyAbortMonitor(
+        min_distance=1.5
+    ).check(squeezed, 0.0)
+
+    monkeypatch.setattr(
+        rss_utils, "load_mlip_calculator", lambda *args, **kwargs: EMT()
+    )
+    monkeypatch.chdir(tmp_path)
+    results = rss_utils.minimize_structures(
+        mlip_type="GAP",
+        mlip_path=[str(tmp_path)],
+        iteration_index="0_",
+        structures=[AseAtomsAdaptor.get_structure(bulk("Cu", a=4.2, cubic=True))],
+        scalar_exp_pressure=0,
+        keep_symmetry=False,
+        early_abort={"volume_range": (8.0, 14.0)},
+    )
+    assert results == [None]
+    traj = read(tmp_path / "RSS_relax_results_traj_0_0.extxyz", index=":")
+    assert len(traj) == 1
+    assert traj[-1].info["minim_stat"] == "aborted"
+    assert "out of bounds" in traj[-1].info["RSS_abort_reason"]
+
+    # the minima of the enthalpy criterion are shared between the workers
+    results = rss_utils.minimize_structures(
+        mlip_type="GAP",
+        mlip_path=[str(tmp_path)],
+        iteration_index="1_",
+        structures=[
+            AseAtomsAdaptor.get_structure(bulk("Cu", a=a, cubic=True))
+            for a in (3.6, 3.65)
+        ],
+        scalar_exp_pressure=0,
+        max_steps=50,
+        keep_symmetry=False,
+        num_processes_rss=2,
+        early_abort={"enthalpy_margin": 1.0},
+    )
+    assert all(result is not None for result in results)
+
+
+def test_duplicate_minima(tmp_path, monkeypatch):
+    import json
+
+    from ase.build import bulk
+    from ase.calculators.emt import EMT
+    from pymatgen.io.ase import AseAtomsAdaptor
+
+    import autoplex.data.rss.utils as rss_utils
+
+    index = rss_utils.MinimaIndex()
+    atoms = bulk("Cu", a=3.6, cubic=True)
+    assert index.add(atoms, -1.0, "0_0") is None
+    shifted = atoms.copy()
+    shifted.translate([0.3, 0.1, 0.2])
+    shifted.wrap()
+    assert index.add(shifted, -1.001, "0_1") == "0_0"
+    assert index.add(bulk("Cu", a=3.6), -0.25, "0_2") == "0_0"  # primitive cell
+    assert index.find(bulk("Cu", a=3.0, cubic=True), -1.0) is None
+    assert index.summary() == {
+        "n_unique_minima": 1,
+        "n_duplicates": 2,
+        "hits_per_minimum": {"0_0": 2},
+    }
+
+    monkeypatch.setattr(
+        rss_utils, "load_mlip_calculator", lambda *args, **kwargs: EMT()
+    )
+    monkeypatch.chdir(tmp_path)
+    structures = [
+        AseAtomsAdaptor.get_structure(bulk("Cu", a=a, cubic=True))
+        for a in (3.5, 3.7, 3.75)
+    ]
+    for batch_size in (None, 1):
+        results = rss_utils.minimize_structures(
+            mlip_type="GAP",
+            mlip_path=[str(tmp_path)],
+            iteration_index="0_",
+            structures=structures,
+            output_file_name=f"RSS_{batch_size}",
+            scalar_exp_pressure=0,
+            keep_symmetry=False,
+            batch_size=batch_size,
+            duplicate_detection={"check_interval": 1},
+        )
+        assert results[0] is not None
+        assert results[1:] == [None, None]
+        traj = read(tmp_path / f"RSS_{batch_size}_traj_0_2.extxyz", index=":")
+        assert traj[-1].info["minim_stat"] == "aborted"
+        assert traj[-1].info["RSS_abort_reason"] == "duplicate of minimum 0_0"
+        with open(tmp_path / f"RSS_{batch_size}_minima.json") as file:
+            summary = json.load(file)
+        assert summary["n_unique_minima"] == 1
+        assert summary["hits_per_minimum"] == {"0_0": 2}
+
+
+def test_random_cell_generator():
+    import pytest
+    from ase.neighborlist import neighbor_list
+
+    from autoplex.data.rss.utils import RandomCellGenerator
+
+    seed = "\n".join(
+        [
+            "#SLACK=0.25",
+            "#OVERLAP=0.1",
+            "#COMPACT",
+            "#MINSEP=1.5 Si-Si=1.76 Si-O=1.408 O-O=1.056",
+            "#SPECIES=Si%NUM=1,O%NUM=2",
+            "#TARGVOL=30-40",
+            "#NFORM=4-6",
+        ]
+    )
+    generator = RandomCellGenerator(seed)
+    rng = np.random.default_rng(0)
+    minsep = {("O", "O"): 1.056, ("O", "Si"): 1.408, ("Si", "Si"): 1.76}
+    for _ in range(10):
+        atoms = generator.generate(rng)
+        n_form = len(atoms) // 3
+        assert 4 <= n_form <= 6
+        assert atoms.get_chemical_formula(empirical=True) == "O2Si"
+        assert 30 * n_form <= atoms.get_volume() + 1e-8 <= 40 * n_form + 1e-7
+        symbols = np.array(atoms.get_chemical_symbols())
+        i, j, d = neighbor_list("ijd", atoms, 1.76)
+        limits = [
+            0.75 * minsep[tuple(sorted(pair))] for pair in zip(symbols[i], symbols[j])
+        ]
+        assert np.all(d >= limits)
+
+    # two symmetry operations give inversion symmetric structures
+    atoms = RandomCellGenerator(seed.replace("NFORM=4-6", "SYMMOPS=2")).generate(rng)
+    scaled = atoms.get_scaled_positions()
+    symbols = np.array(atoms.get_chemical_symbols())
+    for position, symbol in zip(-scaled, symbols):
+        diff = scaled - position
+        diff -= np.round(diff)
+        assert np.any((np.linalg.norm(diff, axis=1) < 1e-6) & (symbols == symbol))
+
+    # fragments are placed intact
+    fragment_seed = "\n".join(
+        [
+            "%BLOCK POSITIONS_ABS",
+            "O 0.0 0.0 0.119 # 0 % NUM=1",
+            "H 0.0 0.763 -0.477 # 0",
+            "H 0.0 -0.763 -0.477 # 0",
+            "%ENDBLOCK POSITIONS_ABS",
+            "#MINSEP=2.0",
+            "#TARGVOL=32",
+            "#NFORM=8",
+            "#OVERLAP=0.1",
+        ]
+    )
+    atoms = RandomCellGenerator(fragment_seed).generate(rng)
+    assert atoms.get_chemical_formula() == "H16O8"
+    i, j = neighbor_list("ij", atoms, 1.2)
+    assert len(i) == 32  # two O-H bonds per molecule, counted from both sides
+
+    # sets of values and NATOM, as used in the RSS documentation
+    natom_seed = "\n".join(
+        ["#SPECIES=Si%NUM=1", "#NFORM=1", "#MINSEP=2.0", "#NATOM={6,8,10}"]
+    )
+    natoms = {len(RandomCellGenerator(natom_seed).generate(rng)) for _ in range(20)}
+    assert natoms == {6, 8, 10}
+    nform_seed = "\n".join(
+        [
+            "#SPECIES=Si%NUM=1,O%NUM=2",
+            "#NFORM={2,4}",
+            "#TARGVOL=40-50",
+            "#SLACK=0.25",
+            "#MINSEP=1.5 Si-Si=2.7-3.0 Si-O=1.3-1.6 O-O=2.28-2.58",
+            "#ABFIX=False",
+            "#OCTET=False",
+        ]
+    )
+    natoms = {len(RandomCellGenerator(nform_seed).generate(rng)) for _ in range(20)}
+    assert natoms == {6, 12}
+
+    # VARVOL_RANGE scales the volume per formula unit, as in the RSS flow tests
+    varvol_seed = natom_seed + "\n#VARVOL=20\n#VARVOL_RANGE=0.75 1.25"
+    volumes = [
+        atoms.get_volume() / len(atoms)
+        for atoms in (RandomCellGenerator(varvol_seed).generate(rng) for _ in range(20))
+    ]
+    assert 15 <= min(volumes) < 20 < max(volumes) <= 25
+
+    with pytest.raises(ValueError, match="SYSTEM"):
+        RandomCellGenerator(natom_seed + "\n#SYSTEM=Cubi")
+    with pytest.raises(ValueError, match="NFORM"):
+        RandomCellGenerator(nform_seed.replace("{2,4}", "{2,4"))
+    with pytest.raises(ValueError, match="multiple"):
+        RandomCellGenerator(nform_seed + "\n#NATOM={4,5}")
@@ -27,8 +27,116 @@ def test_gap_auto_delta_fit_maker(test_dir, memory_jobstore, clean_dir):
     )
 
     assert Path(gapfit.output["mlip_path"][0].resolve(memory_jobstore)).exists()
+
+
+
+def test_gap_auto_delta_subsample_fit_maker(test_dir, memory_jobstore, clean_dir):
+    from ase.io import read
+
+    database_dir = test_dir / "fitting/rss_training_dataset/"
+
+    gapfit = MLIPFitMaker(
+        auto_delta=True,
+        auto_delta_subsample=10,
+        glue_xml=False,
+        apply_data_preprocessing=False,
+    ).make(
+        twob={"delta": 2.0, "cutoff": 4},
+        threeb={"n_sparse": 10},
+        database_dir=database_dir,
+        general={"two_body": True,
+                 "three_body": True}
+        )
+
+    _ = run_locally(
+        gapfit, ensure_success=True, create_folders=True, store=memory_jobstore
+    )
+
+    mlip_path = Path(gapfit.output["mlip_path"][0].resolve(memory_jobstore))
+    assert mlip_path.exists()
+    # only the final fit is evaluated on the full training set
+    assert len(read(mlip_path / "auto_delta_subsample.extxyz", ":")) < len(
+        read(mlip_path / "quip_train.extxyz", ":")
+    )
+    assert len(read(mlip_path / "quip_auto_delta_subsample.extxyz", ":")) == len(
+        read(mlip_path / "auto_delta_subsample.extxyz", ":")
+    )
     
     
+def test_gap_concurrent_fit_maker(test_dir, memory_jobstore, clean_dir, tmp_path):
+    import shutil
+
+    database_dir = tmp_path / "database"
+    for variant in ("", "phonon", "rattled"):
+        (database_dir / variant).mkdir(parents=True, exist_ok=True)
+        for file_name in ("train.extxyz", "test.extxyz"):
+            shutil.copy(
+                test_dir / "fitting/rss_training_dataset" / file_name,
+                database_dir / variant / file_name,
+            )
+
+    gapfit = MLIPFitMaker(
+        auto_delta=True,
+        concurrent_fits=True,
+        glue_xml=False,
+        apply_data_preprocessing=False,
+        num_processes_fit=3,
+    ).make(
+        twob={"delta": 2.0, "cutoff": 4},
+        threeb={"n_sparse": 10},
+        database_dir=database_dir,
+        general={"two_body": True,
+                 "three_body": True}
+        )
+
+    _ = run_locally(
+        gapfit, ensure_success=True, create_folders=True, store=memory_jobstore
+    )
+
+    mlip_paths = [Path(path) for path in gapfit.output["mlip_path"].resolve(memory_jobstore)]
+    assert [path.name for path in mlip_paths[1:]] == ["phonon", "rattled"]
+    assert mlip_paths[1].parent == mlip_paths[0]
+    for mlip_path in mlip_paths:
+        assert (mlip_path / "gap_file.xml").exists()
+        assert (mlip_path / "quip_test.extxyz").exists()
+        assert (mlip_path / "std_gap_out.log").exists()
+    assert gapfit.output["test_error"].resolve(memory_jobstore) > 0
+
+
+def test_gap_fit_cache(test_dir, memory_jobstore, clean_dir, tmp_path):
+    database_dir = test_dir / "fitting/rss_training_dataset/"
+
+    def make_fit():
+        return MLIPFitMaker(
+            auto_delta=False,
+            glue_xml=False,
+            apply_data_preprocessing=False,
+            fit_cache_dir=str(tmp_path / "fit_cache"),
+        ).make(
+            twob={"delta": 2.0, "cutoff": 4},
+            database_dir=database_dir,
+            general={"two_body": True, "three_body": False, "soap": False}
+        )
+
+    first_fit = make_fit()
+    run_locally(first_fit, ensure_success=True, create_folders=True, store=memory_jobstore)
+    second_fit = make_fit()
+    run_locally(second_fit, ensure_success=True, create_folders=True, store=memory_jobstore)
+
+    first_path = Path(first_fit.output["mlip_path"][0].resolve(memory_jobstore))
+    second_path = Path(second_fit.output["mlip_path"][0].resolve(memory_jobstore))
+    assert first_path != second_path
+    assert (second_path / "gap_file.xml").read_text() == (first_path / "gap_file.xml").read_text()
+    # the second job is restored from the cache instead of running gap_fit
+    assert not (second_path / "std_gap_out.log").stat().st_mtime > (
+        first_path / "std_gap_out.log"
+    ).stat().st_mtime
+    for key in ("train_error", "test_error"):
+        assert first_fit.output[key].resolve(memory_jobstore) == second_fit.output[
+            key
+        ].resolve(memory_jobstore)
+
+
 def test_gap_fixed_delta_fit_maker(test_dir, memory_jobstore, clean_dir):
 
     database_dir = test_dir / "fitting/rss_training_dataset/"
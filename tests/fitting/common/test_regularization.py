@@ -4,12 +4,17 @@ from ase.atoms import Atom
 from ase.io import read
 
 from autoplex.fitting.common.regularization import (
+    LowerHullFacetIndex,
     calculate_hull_nd,
     get_convex_hull,
     get_e_distance_to_hull,
     get_e_distance_to_hull_nd,
+    get_e_distances_to_hull,
+    get_e_distances_to_hull_nd,
     get_intersect,
     get_mole_frac,
+    get_stoichiometry_volume_points,
+    get_volume_energy_points,
     label_stoichiometry_volume,
     piecewise_linear,
     point_in_triangle_2D,
@@ -251,3 +256,72 @@ def test_regularization_for_three_element_system(test_dir, memory_jobstore, clea
         energy_name="energy",
     )
     assert atoms_modi[2].info["energy_sigma"] == 1e-3
+
+
+def test_batched_distances_to_hull(test_dir):
+    """Tests that batched hull distances match the per-structure ones."""
+    import numpy as np
+
+    atoms = read(test_dir / "fitting" / "ref_files" / "quip_train.extxyz", ":")
+    hull, _ = get_convex_hull(atoms, energy_name="REF_energy")
+    distances = get_e_distances_to_hull(
+        hull, get_volume_energy_points(atoms, energy_name="REF_energy")
+    )
+    reference = [
+        get_e_distance_to_hull(hull, atom, energy_name="REF_energy") for atom in atoms
+    ]
+    assert np.allclose(distances, reference)
+    assert np.isclose(distances[0], 0.01096457)
+
+    atoms = read(test_dir / "fitting" / "ref_files" / "test_regularization.extxyz", ":")
+    isolated_atom_energies = {3: 0.1, 15: 0.2, 16: 0.3}
+    hull = calculate_hull_nd(
+        label_stoichiometry_volume(
+            atoms, isolated_atom_energies, "energy", element_order=[3, 15, 16]
+        )
+    )
+    points = get_stoichiometry_volume_points(
+        atoms, isolated_atom_energies, "energy", element_order=[3, 15, 16]
+    )
+    distances = get_e_distances_to_hull_nd(hull, points)
+
+    # the lower hull is the upper envelope of the planes of its facets
+    equations = hull.equations[hull.good]
+    equations = equations[np.abs(equations[:, -2]) > 1e-12]
+    plane_energies = -(
+        equations[:, -1] + points[:, :-1] @ equations[:, :-2].T
+    ) / equations[:, -2]
+    assert np.allclose(distances, points[:, -1] - plane_energies.max(axis=1))
+    assert np.isclose(
+        distances[5],
+        get_e_distance_to_hull_nd(
+            hull, atoms[5], isolated_atom_energies, "energy", element_order=[3, 15, 16]
+        ),
+    )
+
+
+def test_lower_hull_facet_index():
+    """Tests the facet lookup against a scan over all lower-hull facets."""
+    import numpy as np
+
+    rng = np.random.default_rng(1)
+    # ternary mole fractions, volume and a convex-ish energy
+    fractions = rng.dirichlet(np.ones(3), size=2000)[:, 1:]
+    volumes = rng.uniform(10.0, 30.0, size=2000)
+    energies = (
+        (fractions**2).sum(axis=1) + 0.01 * (volumes - 20.0) ** 2 + rng.normal(0, 0.05, 2000)
+    )
+    points = np.column_stack([fractions, volumes, energies])
+    hull = calculate_hull_nd(points)
+
+    index = LowerHullFacetIndex(hull)
+    scan = LowerHullFacetIndex(hull, n_candidates=1)
+    assert np.allclose(index.energy(points[:, :-1]), scan.energy(points[:, :-1]))
+
+    distances = get_e_distances_to_hull_nd(hull, points)
+    assert hull.facet_index is not None
+    assert np.all(distances > -1e-8)
+    # the vertices of the lower hull lie on it, the first hull point is the test point
+    vertices = np.unique(hull.simplices[hull.good]) - 1
+    assert np.allclose(distances[vertices[vertices >= 0]], 0.0, atol=1e-8)
+    assert np.isnan(index.energy([[5.0, 5.0, 20.0]])[0])
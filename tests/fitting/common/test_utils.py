@@ -8,7 +8,8 @@ from autoplex.fitting.common.utils import (
     prepare_fit_environment,
     calculate_delta_2b,
     stratified_dataset_split,
-    compute_num_of_descriptor
+    compute_num_of_descriptor,
+    count_num_of_descriptors,
 )
 
 def test_stratified_split(test_dir):
@@ -234,6 +235,18 @@ def test_data_distillation(test_dir):
             assert True
 
 
+def test_data_distillation_missing_forces(test_dir, tmp_path):
+    import pytest
+    from ase.io import write
+
+    atoms = read(test_dir / "fitting" / "ref_files" / "vasp_ref.extxyz", ":")
+    del atoms[0].arrays["REF_forces"]
+    write(tmp_path / "vasp_ref.extxyz", atoms)
+
+    with pytest.raises(KeyError, match="REF_forces"):
+        data_distillation(tmp_path / "vasp_ref.extxyz", 35.0, force_label="REF_forces")
+
+
 def test_calculate_delta_2b(test_dir):
     atoms=read(test_dir / "fitting" / "rss_training_dataset"/ "train.extxyz",':')
     
@@ -249,6 +262,19 @@ def test_calculate_num_of_descriptor(test_dir):
     assert num_3b == 2573
 
 
+def test_count_num_of_descriptors(test_dir):
+    atoms = read(test_dir / "fitting" / "rss_training_dataset" / "train.extxyz", ":")
+    assert count_num_of_descriptors(atoms, nb=2, cutoff=4, num_processes=1).sum() == 2370
+    assert count_num_of_descriptors(atoms, nb=3, cutoff=3.25).sum() == 2573
+
+    atoms += read(test_dir / "fitting" / "ref_files" / "vasp_ref.extxyz", ":")
+    for nb, cutoff in ((2, 4.0), (2, 6.0), (3, 3.25), (3, 5.0)):
+        counts = count_num_of_descriptors(atoms, nb=nb, cutoff=cutoff, num_processes=2)
+        assert counts.tolist() == [
+            compute_num_of_descriptor(atom=at, nb=nb, cutoff=cutoff) for at in atoms
+        ]
+
+
 def test_prepare_fit_environment(test_dir, clean_dir):
     prepare = prepare_fit_environment(
         database_dir=(test_dir / "fitting" / "ref_files"),
@@ -257,3 +283,110 @@ def test_prepare_fit_environment(test_dir, clean_dir):
     )
 
     assert os.path.isdir(prepare)
+
+
+def test_run_ase_gap(test_dir, tmp_path):
+    import shutil
+    import subprocess
+
+    import numpy as np
+
+    from autoplex.fitting.common.utils import (
+        CustomPotential,
+        extract_gap_label,
+        run_ase_gap,
+    )
+
+    # gap_fit writes an index file next to its input
+    data_path = tmp_path / "vasp_ref.extxyz"
+    shutil.copy(test_dir / "fitting" / "ref_files" / "vasp_ref.extxyz", data_path)
+    xml_file = tmp_path / "gap_file.xml"
+    subprocess.run(
+        [
+            "gap_fit",
+            f"at_file={data_path}",
+            "gap={distance_2b cutoff=4.0 n_sparse=10 covariance_type=ard_se delta=1 "
+            "theta_uniform=1.0 sparse_method=uniform}",
+            "default_sigma={0.01 0.1 0.1 0}",
+            "energy_parameter_name=REF_energy",
+            "force_parameter_name=REF_forces",
+            "virial_parameter_name=REF_virial",
+            "e0_method=average",
+            f"gp_file={xml_file}",
+        ],
+        cwd=tmp_path,
+        check=True,
+        capture_output=True,
+    )
+
+    run_ase_gap(2, str(data_path), str(xml_file), str(tmp_path / "quip_train.extxyz"))
+
+    pot = CustomPotential(
+        args_str="Potential xml_label=" + extract_gap_label(str(xml_file)),
+        param_filename=str(xml_file),
+    )
+    atoms = read(data_path, ":")
+    atoms_eval = read(tmp_path / "quip_train.extxyz", ":")
+    assert len(atoms_eval) == len(atoms)
+    for atom, atom_eval in zip(atoms, atoms_eval):
+        atom.calc = pot
+        assert np.isclose(atom_eval.get_potential_energy(), atom.get_potential_energy())
+        assert np.allclose(atom_eval.get_forces(), atom.get_forces())
+        assert np.allclose(atom_eval.arrays["force"], atom.get_forces())
+        assert atom_eval.info["config_type"] == atom.info["config_type"]
+        # the stress is only written if CustomPotential adds it, as before
+        assert ("stress" in atom_eval.calc.results) == ("stress" in atom.info)
+
+
+def test_fit_cache(test_dir, tmp_path):
+    from autoplex.fitting.common.utils import FitCache, fit_cache_key
+
+    data_dir = test_dir / "fitting" / "rss_training_dataset"
+    data_files = {
+        "train.extxyz": data_dir / "train.extxyz",
+        "test.extxyz": data_dir / "test.extxyz",
+    }
+    key = fit_cache_key(data_files, "GAP", {"twob": {"cutoff": 4.0}})
+    assert key == fit_cache_key(data_files, "GAP", {"twob": {"cutoff": 4.0}})
+    assert key != fit_cache_key(data_files, "GAP", {"twob": {"cutoff": 5.0}})
+    assert key != fit_cache_key(
+        {"train.extxyz": data_dir / "test.extxyz", "test.extxyz": data_dir / "test.extxyz"},
+        "GAP",
+        {"twob": {"cutoff": 4.0}},
+    )
+
+    cache = FitCache(tmp_path / "cache", max_size=2e-6)  # about 2 kB
+    job_dir = tmp_path / "job"
+    (job_dir / "phonon").mkdir(parents=True)
+    (job_dir / "gap_file.xml").write_text("main")
+    (job_dir / "phonon" / "gap_file.xml").write_text("phonon")
+    (job_dir / "train.extxyz").write_text("x" * 1200)
+    result = {"mlip_path": [job_dir, job_dir / "phonon"], "train_error": 0.1, "test_error": 0.2}
+
+    assert cache.get(key, tmp_path / "new_job") is None
+    cache.put(key, job_dir, result)
+    restored = cache.get(key, tmp_path / "new_job")
+    assert restored == {
+        "mlip_path": [tmp_path / "new_job", tmp_path / "new_job" / "phonon"],
+        "train_error": 0.1,
+        "test_error": 0.2,
+    }
+    assert (tmp_path / "new_job" / "phonon" / "gap_file.xml").read_text() == "phonon"
+    # lookups do not rewrite the index and a second fit with the same key is not copied
+    index_state = cache.index_file.stat().st_mtime_ns
+    cache.get(key, tmp_path / "new_job")
+    assert cache.index_file.stat().st_mtime_ns == index_state
+    (job_dir / "gap_file.xml").write_text("second")
+    cache.put(key, job_dir, result)
+    assert (tmp_path / "cache" / key / "gap_file.xml").read_text() == "main"
+    # leftovers of interrupted jobs are removed
+    (tmp_path / "cache" / "leftover.tmp").mkdir()
+    cache.put(key, job_dir, result)
+    assert not (tmp_path / "cache" / "leftover.tmp").exists()
+
+    # a second, larger entry evicts the least recently used one
+    (job_dir / "train.extxyz").write_text("x" * 1500)
+    cache.put("other", job_dir, result)
+    assert cache.get(key, tmp_path / "third_job") is None
+    assert not (tmp_path / "cache" / key).exists()
+    assert cache.get("other", tmp_path / "third_job") is not None